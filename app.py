@@ -3,11 +3,13 @@ import pandas as pd
 import os
 from pathlib import Path
 from utils.auth import show_login_form, show_registration_form, require_auth, logout
-from utils.db import init_db, get_user_accounts
+from utils.db import init_db, get_user_accounts, rerun_scope
 from pages.home import show_home_page
+from pages.overview import show_overview_page
 from pages.accounts import show_accounts_page
 from pages.posts import show_posts_page
 from pages.comments import show_comments_page
+from pages.search import show_search_page
 from pages.settings import show_settings_page
 from config import PAGE_TITLE, PAGE_ICON, LAYOUT, INITIAL_SIDEBAR_STATE
 
@@ -120,6 +122,10 @@ def main():
                     st.session_state["selected_account"] = None
                     st.session_state["selected_post"] = None
                     
+                if st.button("🗂️ All Accounts", use_container_width=True):
+                    st.session_state["page"] = "overview"
+                    st.session_state["selected_post"] = None
+                    
                 if st.button("📱 Accounts", use_container_width=True):
                     st.session_state["page"] = "accounts"
                     st.session_state["selected_account"] = None
@@ -132,6 +138,10 @@ def main():
                 if st.button("💬 Comments", use_container_width=True):
                     st.session_state["page"] = "comments"
                     
+                if st.button("🔎 Search", use_container_width=True):
+                    st.session_state["page"] = "search"
+                    st.session_state["selected_post"] = None
+                    
                 if st.button("⚙️ Settings", use_container_width=True):
                     st.session_state["page"] = "settings"
                     st.session_state["selected_account"] = None
@@ -177,12 +187,16 @@ def main():
                 # Show the selected page
                 if st.session_state["page"] == "home":
                     show_home_page()
+                elif st.session_state["page"] == "overview":
+                    show_overview_page()
                 elif st.session_state["page"] == "accounts":
                     show_accounts_page()
                 elif st.session_state["page"] == "posts":
                     show_posts_page()
                 elif st.session_state["page"] == "comments":
                     show_comments_page()
+                elif st.session_state["page"] == "search":
+                    show_search_page()
                 elif st.session_state["page"] == "settings":
                     show_settings_page()
             except Exception as e:
@@ -193,4 +207,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # One DB unit of work per rerun: shared connection, memoized account lookups
+    with rerun_scope():
+        main()
@@ -0,0 +1,2 @@
+# Benchmarks run from the repository root, e.g. `python -m benchmarks.account_lookup`.
+# They use the app's settings (.streamlit/secrets.toml) but their own scratch data.
@@ -0,0 +1,130 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import sqlalchemy as sa
+from migrations import load_migrations
+from utils.db import FacebookAccount
+
+INDEX_NAME = "uq_facebook_accounts_user_page"
+
+# The account lookups the app makes on every rerun and on every account add
+LOOKUPS = {
+    "get_user_accounts": lambda user_id, page_id: (
+        sa.select(FacebookAccount).where(FacebookAccount.user_id == user_id)
+    ),
+    "add_facebook_account": lambda user_id, page_id: (
+        sa.select(FacebookAccount).where((FacebookAccount.user_id == user_id) & (FacebookAccount.page_id == page_id))
+    )
+}
+
+# Plan text that means a lookup reads the whole table
+FULL_SCANS = {"sqlite": "SCAN facebook_accounts", "postgresql": "Seq Scan"}
+
+
+def seed(connection, users, pages_per_user, chunk=10000):
+    """Fill an empty, migrated database with users * pages_per_user accounts"""
+    connection.execute(sa.text("INSERT INTO users (id, username, email) VALUES (:id, :name, :email)"), [
+        {"id": user_id, "name": f"user{user_id}", "email": f"user{user_id}@example.com"}
+        for user_id in range(1, users + 1)
+    ])
+    rows = (
+        {"user_id": user_id, "page_id": str(1000000 + user_id * pages_per_user + page), "name": f"Page {page}"}
+        for user_id in range(1, users + 1)
+        for page in range(pages_per_user)
+    )
+    insert = sa.text(
+        "INSERT INTO facebook_accounts (user_id, page_id, account_name, access_token) "
+        "VALUES (:user_id, :page_id, :name, 'token')"
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == chunk:
+            connection.execute(insert, batch)
+            batch = []
+    if batch:
+        connection.execute(insert, batch)
+    connection.execute(sa.text("ANALYZE"))
+
+
+def explain(connection, statement):
+    """The query plan of statement as one string"""
+    sql = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    if connection.dialect.name == "sqlite":
+        return "\n".join(row[3] for row in connection.execute(sa.text(f"EXPLAIN QUERY PLAN {sql}")))
+    return "\n".join(row[0] for row in connection.execute(sa.text(f"EXPLAIN {sql}")))
+
+
+def lookup_plans(connection, user_id, page_id):
+    """Plan of each lookup, and whether it avoids a full table scan"""
+    full_scan = FULL_SCANS.get(connection.dialect.name, "Seq Scan")
+    plans = {}
+    for name, lookup in LOOKUPS.items():
+        plan = explain(connection, lookup(user_id, page_id))
+        plans[name] = (plan, full_scan not in plan and INDEX_NAME in plan)
+    return plans
+
+
+def time_lookups(connection, users, pages_per_user, repeat):
+    """Average seconds per lookup, over repeat lookups spread across the users"""
+    timings = {}
+    for name, lookup in LOOKUPS.items():
+        started = time.perf_counter()
+        for i in range(repeat):
+            user_id = 1 + i * 7919 % users
+            page_id = str(1000000 + user_id * pages_per_user)
+            connection.execute(lookup(user_id, page_id)).all()
+        timings[name] = (time.perf_counter() - started) / repeat
+    return timings
+
+
+def run(url, users, pages_per_user, repeat):
+    engine = sa.create_engine(url)
+    failed = False
+    with engine.connect() as connection:
+        with connection.begin():
+            for _, _, migration in load_migrations():
+                migration.upgrade(connection)
+            started = time.perf_counter()
+            seed(connection, users, pages_per_user)
+        print(f"Seeded {users * pages_per_user:,} accounts for {users:,} users in {time.perf_counter() - started:.1f}s")
+        
+        user_id = users // 2
+        for name, (plan, indexed) in lookup_plans(connection, user_id, str(1000000 + user_id * pages_per_user)).items():
+            print(f"{name}: {'uses ' + INDEX_NAME if indexed else 'FULL SCAN'}\n    " + plan.replace("\n", "\n    "))
+            failed = failed or not indexed
+        
+        indexed = time_lookups(connection, users, pages_per_user, repeat)
+        connection.execute(sa.text(f"DROP INDEX {INDEX_NAME}"))
+        connection.commit()
+        scanned = time_lookups(connection, users, pages_per_user, max(repeat // 100, 1))
+        for name in LOOKUPS:
+            print(
+                f"{name}: {indexed[name] * 1e6:,.0f}us with the index, {scanned[name] * 1e6:,.0f}us without "
+                f"({scanned[name] / indexed[name]:,.0f}x)"
+            )
+    engine.dispose()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.account_lookup",
+        description="Seed a large facebook_accounts table and check that account lookups use the index"
+    )
+    parser.add_argument("--url", help="empty database to use (default: a temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--pages-per-user", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=2000, help="lookups timed per query")
+    args = parser.parse_args()
+    
+    if args.url:
+        return run(args.url, args.users, args.pages_per_user, args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        return run(f"sqlite:///{os.path.join(directory, 'accounts.db')}", args.users, args.pages_per_user, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+import pandas as pd
+from utils.fb_api import format_comment_data
+from tests.fakes import make_comments
+
+
+def format_comment_data_before(comments):
+    """format_comment_data as it was: element-wise date parsing and a Python lambda per message"""
+    df = pd.DataFrame(comments)
+    df["created_time"] = pd.to_datetime(df["created_time"]).dt.strftime("%Y-%m-%d %H:%M")
+    df["short_message"] = df["message"].apply(lambda x: str(x)[:50] + "..." if isinstance(x, str) and len(str(x)) > 50 else str(x))
+    return df
+
+
+def select_before(comments, picked):
+    """Comment picker as it was: labels from iterrows, selection by searching the label list"""
+    df = format_comment_data_before(comments)
+    options = [f"{row['created_time']} - {row['from_name']}: {row['short_message']}" for _, row in df.iterrows()]
+    options.insert(0, "Select a comment to manage")
+    return comments[options.index(options[picked + 1]) - 1].id
+
+
+def select_after(comments, picked):
+    """Comment picker as pages/comments.py builds it now: vectorized labels keyed by id"""
+    df = format_comment_data(comments)
+    labels = dict(zip(df["id"], df["created_time"] + " - " + df["from_name"] + ": " + df["short_message"]))
+    # The selectbox returns the id itself; labels are only looked up for display
+    return list(labels)[picked]
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.format_data",
+        description="Time formatting comments and building the comment picker, before and after vectorizing"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+    
+    print(f"{'comments':>10} {'format before':>14} {'format after':>13} {'picker before':>14} {'picker after':>13} {'speedup':>8}")
+    for size in args.sizes:
+        comments = make_comments(size)
+        format_before, before = best_of(args.repeat, format_comment_data_before, comments)
+        format_after, after = best_of(args.repeat, format_comment_data, comments)
+        picker_before, picked_before = best_of(args.repeat, select_before, comments, size - 1)
+        picker_after, picked_after = best_of(args.repeat, select_after, comments, size - 1)
+        
+        # Same selection and timestamps either way
+        if picked_before != picked_after or not before["created_time"].equals(after["created_time"]):
+            print(f"Results differ at {size} comments", file=sys.stderr)
+            return 1
+        print(
+            f"{size:>10,} {format_before:>13.3f}s {format_after:>12.3f}s "
+            f"{picker_before:>13.3f}s {picker_after:>12.3f}s {picker_before / picker_after:>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from utils import passwords
+from config import BCRYPT_ROUNDS
+
+
+def use_workers(workers):
+    """Switch the password module to a pool of the given size (0 checks on the calling thread)"""
+    if passwords._pool is not None:
+        passwords._pool.shutdown()
+    passwords._pool = None
+    passwords.PASSWORD_WORKERS = workers
+    passwords._slots = threading.BoundedSemaphore(max(workers, 1) * passwords.PENDING_PER_WORKER)
+    if workers:
+        # Start the worker processes before timing, as a running app would have
+        passwords._get_pool().map(int, range(workers))
+
+
+def run(logins, threads, password_hash):
+    """Logins per second, the slowest one and how many were turned away, with threads checking at once"""
+    def login(_):
+        started = time.perf_counter()
+        try:
+            assert passwords.check_password("correct horse", password_hash)
+        except TimeoutError:
+            return None
+        return time.perf_counter() - started
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    done = [latency for latency in latencies if latency is not None]
+    return len(done) / elapsed, max(done, default=0), logins - len(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.login_throughput",
+        description="Concurrent password checks per second against the size of the hashing pool"
+    )
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost of the stored hash")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16, help="logins in progress at once")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+    
+    password_hash = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(args.rounds)).decode("utf-8")
+    print(f"{args.logins} logins, {args.threads} at once, bcrypt cost {args.rounds}, {os.cpu_count()} CPUs")
+    for workers in sorted(set(args.workers)):
+        use_workers(workers)
+        per_second, slowest, rejected = run(args.logins, args.threads, password_hash)
+        label = f"{workers} worker(s)" if workers else "inline"
+        print(f"{label:>12}: {per_second:6.1f} logins/s, slowest {slowest:.2f}s, {rejected} turned away")
+    use_workers(0)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+import pandas as pd
+from utils.fb_api import parse_comment, parse_posts
+
+
+def graph_comments(count):
+    """Comment objects as Graph returns them for COMMENT_FIELDS"""
+    return [
+        {
+            "id": f"2_{i}",
+            "message": f"comment {i}",
+            "created_time": "2024-01-01T00:00:00+0000",
+            "from": {"name": f"user {i % 997}", "id": str(i % 997)},
+            "comment_count": i % 5,
+            **({"attachment": {"type": "photo"}} if i % 7 == 0 else {})
+        }
+        for i in range(count)
+    ]
+
+
+def graph_posts(count):
+    """Post objects as Graph returns them for the "list" profile"""
+    return [
+        {
+            "id": f"1_{i}",
+            "message": f"post {i}",
+            "created_time": "2024-01-01T00:00:00+0000",
+            "permalink_url": f"https://www.facebook.com/1/posts/{i}",
+            "shares": {"count": i % 3},
+            "reactions": {"data": [], "summary": {"total_count": i % 11}},
+            "comments": {"data": [], "summary": {"total_count": i % 13}}
+        }
+        for i in range(count)
+    ]
+
+
+def parse_comment_dict(comment):
+    """parse_comment as it was: a fresh dict per comment"""
+    return {
+        "id": comment.get("id"),
+        "message": comment.get("message", ""),
+        "created_time": comment.get("created_time"),
+        "from_name": comment.get("from", {}).get("name", "Unknown") if comment.get("from") else "Unknown",
+        "from_id": comment.get("from", {}).get("id", "") if comment.get("from") else "",
+        "replies": comment.get("comment_count", 0),
+        "has_attachment": "attachment" in comment
+    }
+
+
+def parse_post_dict(post):
+    """parse_post as it was for the "list" profile: a fresh dict per post"""
+    return {
+        "id": post.get("id"),
+        "message": post.get("message", ""),
+        "created_time": post.get("created_time"),
+        "permalink_url": post.get("permalink_url"),
+        "shares": post.get("shares", {}).get("count", 0) if post.get("shares") else 0,
+        "reactions": post.get("reactions", {}).get("summary", {}).get("total_count", 0) if post.get("reactions") else 0,
+        "comments": post.get("comments", {}).get("summary", {}).get("total_count", 0) if post.get("comments") else 0
+    }
+
+
+def measure(parse, items):
+    """Seconds to parse, bytes the parsed list keeps and peak bytes while parsing, and the result
+
+    Timing and memory come from separate runs, since tracing slows allocation down.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    parse(items)
+    seconds = time.perf_counter() - started
+    
+    gc.collect()
+    tracemalloc.start()
+    records = parse(items)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, retained, peak, records
+
+
+APPROACHES = {
+    "comments": (
+        graph_comments,
+        ("dicts", lambda items: [parse_comment_dict(item) for item in items]),
+        ("records", lambda items: [parse_comment(item) for item in items])
+    ),
+    "posts": (
+        graph_posts,
+        ("dicts", lambda items: [parse_post_dict(item) for item in items]),
+        ("records", lambda items: parse_posts(items, "list"))
+    )
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.records_memory",
+        description="Compare per-item dicts with the NamedTuple records for parsed posts and comments"
+    )
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+    
+    print(f"{'':>18} {'parse':>8} {'retained':>10} {'peak':>10} {'DataFrame':>10}")
+    for kind, (make, *approaches) in APPROACHES.items():
+        items = make(args.count)
+        results = {}
+        for name, parse in approaches:
+            seconds, retained, peak, records = measure(parse, items)
+            started = time.perf_counter()
+            frame = pd.DataFrame(records)
+            frame_seconds = time.perf_counter() - started
+            results[name] = frame
+            print(
+                f"{args.count:,} {kind} {name:>7} {seconds:>7.3f}s {retained / 2 ** 20:>7.1f}MiB "
+                f"{peak / 2 ** 20:>7.1f}MiB {frame_seconds:>9.3f}s"
+            )
+            del records, frame
+        records = results["records"]
+        if not results["dicts"][records.columns].equals(records):
+            print(f"Parsed {kind} differ", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 
 # Database configuration - using PostgreSQL URL directly
@@ -17,6 +18,81 @@ INITIAL_SIDEBAR_STATE = "expanded"
 # Facebook API configuration
 FACEBOOK_API_VERSION = st.secrets["facebook"]["api_version"]
 
+# Sync configuration - minimum seconds between automatic syncs of the same feed
+SYNC_INTERVAL = 60
+
+# Minimum seconds between fetches of the newest insights days; missing older days are always fetched
+INSIGHTS_SYNC_INTERVAL = 3600
+
+# Graph API read cache - TTL in seconds per endpoint and maximum number of entries
+CACHE_TTLS = {
+    "posts": 60,
+    "comments": 30,
+    "object": 300,
+    "insights": 900
+}
+CACHE_MAX_ENTRIES = 512
+
+# Multi-account fetching - worker threads, concurrent calls per access token and overall deadline in seconds
+FETCH_MAX_WORKERS = 8
+FETCH_PER_TOKEN_LIMIT = 2
+FETCH_DEADLINE = 30
+
+# Graph API rate limiting - calls per second per app/page bucket, usage percent at which
+# to start slowing down, retries for throttled/transient errors, backoff base and the
+# longest we are willing to block a page render waiting for budget (seconds)
+RATE_LIMIT_CALLS_PER_SECOND = 10
+RATE_LIMIT_SLOWDOWN_AT = 75
+RATE_LIMIT_MAX_RETRIES = 3
+RATE_LIMIT_BACKOFF_BASE = 1.0
+RATE_LIMIT_MAX_WAIT = 30
+
+# Session tokens - verified tokens cached per process (each until it expires) and how many
+# seconds a process may go without picking up logouts and password changes made elsewhere
+TOKEN_CACHE_MAX_ENTRIES = 1024
+TOKEN_REVOCATION_REFRESH = 5
+
+# Async Graph backend - shared keep-alive connection pool size and idle timeout in seconds
+ASYNC_POOL_SIZE = 100
+ASYNC_KEEPALIVE = 60
+
+# Background sync worker (`python -m worker`) - idle seconds between queue polls, how long a
+# leased job stays reserved, how often new accounts get jobs, jobs leased per poll, seconds
+# between runs of each job kind, newest posts whose comments are kept current, insights days
+# kept current (the dashboard compares up to 2 x 90 days) and the base of the retry backoff
+WORKER_POLL_INTERVAL = 5
+WORKER_LEASE_SECONDS = 300
+WORKER_SCHEDULE_INTERVAL = 60
+WORKER_BATCH_SIZE = 4
+WORKER_INTERVALS = {
+    "posts": SYNC_INTERVAL,
+    "comments": SYNC_INTERVAL * 5,
+    "insights": INSIGHTS_SYNC_INTERVAL
+}
+WORKER_COMMENT_POSTS = 10
+WORKER_INSIGHTS_DAYS = 180
+WORKER_RETRY_BASE = 30
+
+# Webhook receiver (`python -m webhooks serve`) - largest accepted request body in bytes,
+# events written per DB transaction, longest an event waits for its batch (seconds) and
+# how many hours delivered event keys are kept to drop redeliveries
+WEBHOOK_MAX_BODY = 1024 * 1024
+WEBHOOK_BATCH_SIZE = 500
+WEBHOOK_FLUSH_INTERVAL = 1.0
+WEBHOOK_DEDUPE_HOURS = 24
+
+# Scheduled post dispatcher (`python -m dispatcher`) - longest sleep between queue polls,
+# how far ahead posts are claimed and held until their exact time, posts claimed per poll,
+# seconds a claim outlives the lookahead, parallel publishes, attempts before a post is
+# marked failed and the base of the retry backoff (seconds)
+DISPATCH_POLL_INTERVAL = 1
+DISPATCH_LOOKAHEAD = 30
+DISPATCH_BATCH_SIZE = 100
+DISPATCH_LEASE_SECONDS = 300
+DISPATCH_WORKERS = 8
+DISPATCH_MAX_ATTEMPTS = 5
+DISPATCH_RETRY_BASE = 30
+
 # Function to get fallback values for local development
 def get_secret(section, key, default_value=None):
     """Get a secret from streamlit secrets or use default value"""
@@ -26,3 +102,39 @@ def get_secret(section, key, default_value=None):
         if default_value is not None:
             return default_value
         raise
+
+
+# Graph client used for multi-account fetches: "sdk" (facebook-sdk threads) or "async" (aiohttp)
+GRAPH_BACKEND = get_secret("facebook", "backend", "sdk")
+
+# Database connection pool - set in the [postgres] secrets section. With pgbouncer = true
+# the app keeps no pool of its own and leaves pooling to PgBouncer.
+DB_POOL_SIZE = get_secret("postgres", "pool_size", 5)
+DB_MAX_OVERFLOW = get_secret("postgres", "max_overflow", 10)
+DB_POOL_TIMEOUT = get_secret("postgres", "pool_timeout", 30)
+DB_POOL_RECYCLE = get_secret("postgres", "pool_recycle", 1800)
+DB_POOL_PRE_PING = get_secret("postgres", "pool_pre_ping", True)
+DB_PGBOUNCER = get_secret("postgres", "pgbouncer", False)
+# Apply pending schema migrations when the app starts. Turn off in production and run
+# `python -m migrations` at deploy time instead; the app then refuses to start on an old schema.
+DB_AUTO_MIGRATE = get_secret("postgres", "auto_migrate", True)
+# Where Graph syncing happens: "inline" while pages render, or "worker" when `python -m worker`
+# processes keep the local store current and pages only read it
+SYNC_MODE = get_secret("sync", "mode", "inline")
+# Page Webhooks - the app secret signs every delivery; the verify token answers Facebook's
+# subscription handshake. Both are set in the [facebook] secrets section.
+FACEBOOK_APP_SECRET = get_secret("facebook", "app_secret", "")
+WEBHOOK_VERIFY_TOKEN = get_secret("facebook", "webhook_verify_token", "")
+WEBHOOK_HOST = get_secret("facebook", "webhook_host", "0.0.0.0")
+WEBHOOK_PORT = get_secret("facebook", "webhook_port", 8502)
+# Password hashing - bcrypt work factor (hashes stored with another cost are redone at the
+# user's next login), processes that hash off the script threads (0 hashes inline) and how
+# many seconds a login waits for one when all are busy. Set in the [auth] secrets section.
+BCRYPT_ROUNDS = get_secret("auth", "bcrypt_rounds", 12)
+PASSWORD_WORKERS = get_secret("auth", "hash_workers", min(4, os.cpu_count() or 1))
+PASSWORD_QUEUE_TIMEOUT = get_secret("auth", "hash_queue_timeout", 10)
+# Where Graph API reads are cached: "memory" (each process), "sqlite" (a file shared by the
+# processes of one host, at url) or "redis" (shared by every replica, url like
+# redis://host:6379/0). Set in the [cache] secrets section.
+CACHE_BACKEND = get_secret("cache", "backend", "memory")
+CACHE_URL = get_secret("cache", "url", "")
@@ -0,0 +1,145 @@
+import argparse
+import datetime
+import heapq
+import logging
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.db import (
+    init_db, claim_scheduled_posts, start_publishing, finish_scheduled_post, get_publish_latency, parse_graph_time
+)
+from utils.fb_api import get_account_api, create_post, fetch_page_posts, invalidate_cache
+from config import (
+    DISPATCH_POLL_INTERVAL, DISPATCH_BATCH_SIZE, DISPATCH_WORKERS, DISPATCH_MAX_ATTEMPTS, DISPATCH_RETRY_BASE
+)
+
+logger = logging.getLogger("dispatcher")
+
+# Newest page posts searched for the result of an earlier attempt, and how far before
+# that attempt a match may have been created (clock skew between us and Facebook)
+RECONCILE_POSTS = 25
+RECONCILE_SKEW = 60
+
+# Seconds between latency summaries in the log
+LATENCY_REPORT_INTERVAL = 300
+
+
+def find_published(api, post):
+    """Id of a page post an earlier attempt at publishing post created, if any
+
+    Graph takes no idempotency key, so a call that timed out or a dispatcher
+    that died after publishing leaves no record of the new post's id. Before
+    trying again we look for a post with the same message created since the
+    previous attempt. Errors propagate, so an unanswered check retries later
+    instead of risking a second post.
+    """
+    invalidate_cache(f"posts:{post['page_id']}")
+    recent, _ = fetch_page_posts(api, post["page_id"], max_items=RECONCILE_POSTS, profile="detail")
+    since = post["attempted_at"] - datetime.timedelta(seconds=RECONCILE_SKEW)
+    for candidate in recent:
+        if candidate.message == post["message"] and parse_graph_time(candidate.created_time) >= since:
+            return candidate.id
+    return None
+
+
+def publish(post, dispatcher_id):
+    """Publish one claimed post and record the outcome"""
+    try:
+        api, account = get_account_api(post["account_id"], post["user_id"])
+        if not api or not account:
+            post_id, error = None, "Account not found or access token missing"
+        elif post["attempted_at"] and (post_id := find_published(api, post)):
+            error = None
+            logger.info("Scheduled post %s was already published as %s", post["id"], post_id)
+        elif not start_publishing(post["id"], dispatcher_id):
+            logger.info("Scheduled post %s was cancelled or claimed elsewhere", post["id"])
+            return
+        else:
+            post_id, error = create_post(api, post["page_id"], post["message"], link=post["link"])
+    except Exception as e:
+        logger.exception("Scheduled post %s failed", post["id"])
+        post_id, error = None, str(e)
+
+    if post_id:
+        finish_scheduled_post(post["id"], dispatcher_id, post_id=post_id)
+        lateness = (datetime.datetime.utcnow() - post["publish_at"]).total_seconds()
+        logger.info("Published scheduled post %s as %s, %.2fs after its time", post["id"], post_id, lateness)
+        return
+
+    # Every failed round counts, including the ones that failed before reaching Graph
+    attempts = post["attempts"] + 1
+    if attempts < DISPATCH_MAX_ATTEMPTS:
+        retry_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=DISPATCH_RETRY_BASE * 2 ** post["attempts"])
+        finish_scheduled_post(post["id"], dispatcher_id, error=error, retry_at=retry_at, attempts=attempts)
+        logger.warning("Scheduled post %s failed, retrying at %s: %s", post["id"], retry_at, error)
+    else:
+        finish_scheduled_post(post["id"], dispatcher_id, error=error, attempts=attempts)
+        logger.error("Scheduled post %s failed for good: %s", post["id"], error)
+
+
+def dispatch(dispatcher_id, once=False):
+    """Claim posts coming due and publish each at its time, until interrupted
+
+    Claimed posts wait in a heap ordered by due time; the loop sleeps until
+    the earliest is due, or at most DISPATCH_POLL_INTERVAL so posts
+    scheduled meanwhile are picked up. With once, return when nothing is
+    due within the lookahead.
+    """
+    held = []
+    last_report = time.monotonic()
+    with ThreadPoolExecutor(max_workers=DISPATCH_WORKERS) as executor:
+        while True:
+            claimed = []
+            if len(held) < DISPATCH_BATCH_SIZE:
+                claimed = claim_scheduled_posts(dispatcher_id, limit=DISPATCH_BATCH_SIZE - len(held))
+                for post in claimed:
+                    heapq.heappush(held, (post["due_at"], post["id"], post))
+
+            now = datetime.datetime.utcnow()
+            while held and held[0][0] <= now:
+                _, _, post = heapq.heappop(held)
+                executor.submit(publish, post, dispatcher_id)
+
+            if once and not held and not claimed:
+                return
+
+            if time.monotonic() - last_report >= LATENCY_REPORT_INTERVAL:
+                latency = get_publish_latency(now - datetime.timedelta(seconds=LATENCY_REPORT_INTERVAL))
+                if latency["count"]:
+                    logger.info(
+                        "Published %d post(s) in the last %ds: p50 %.2fs, p95 %.2fs, max %.2fs late",
+                        latency["count"], LATENCY_REPORT_INTERVAL, latency["p50"], latency["p95"], latency["max"]
+                    )
+                last_report = time.monotonic()
+
+            wait = DISPATCH_POLL_INTERVAL
+            if held:
+                wait = min(wait, (held[0][0] - datetime.datetime.utcnow()).total_seconds())
+            if wait > 0:
+                time.sleep(wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m dispatcher", description="Publish scheduled posts on time")
+    parser.add_argument("--id", default=f"{socket.gethostname()}:{os.getpid()}", help="dispatcher name shown on claimed posts")
+    parser.add_argument("--once", action="store_true", help="exit once nothing is due within the lookahead")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    if not init_db():
+        logger.error("Database is not ready; run `python -m migrations` first")
+        return 1
+
+    logger.info("Dispatcher %s started", args.id)
+    try:
+        dispatch(args.id, once=args.once)
+    except KeyboardInterrupt:
+        logger.info("Dispatcher %s stopped", args.id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
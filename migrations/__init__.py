@@ -0,0 +1,75 @@
+import datetime
+import importlib
+import pkgutil
+import sqlalchemy as sa
+from utils.db import engine, SchemaVersion
+
+# Migration scripts live next to this file as vNNNN_<name>.py, each with an
+# upgrade(connection) function. They are applied in version order at deploy
+# time with `python -m migrations`; the app itself only checks the version.
+# Scripts spell out the tables they create rather than importing the models,
+# so each one keeps creating the schema of its own version.
+
+# Arbitrary key for the Postgres advisory lock that serializes concurrent upgrades
+MIGRATION_LOCK_ID = 4242001
+
+
+def load_migrations():
+    """All migration modules as (version, name, module), in version order"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        prefix, _, name = info.name.partition("_")
+        if not (prefix.startswith("v") and prefix[1:].isdigit()):
+            continue
+        module = importlib.import_module(f"{__name__}.{info.name}")
+        migrations.append((int(prefix[1:]), name, module))
+    migrations.sort(key=lambda migration: migration[0])
+    return migrations
+
+
+def latest_version():
+    """Version the code expects the database to be at"""
+    migrations = load_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def current_version(connection):
+    """Highest applied version, 0 for a database that has never been migrated"""
+    if not sa.inspect(connection).has_table(SchemaVersion.__tablename__):
+        return 0
+    return connection.execute(sa.select(sa.func.max(SchemaVersion.version))).scalar() or 0
+
+
+def pending_migrations(connection):
+    version = current_version(connection)
+    return [migration for migration in load_migrations() if migration[0] > version]
+
+
+def upgrade(target=None, log=print):
+    """Apply pending migrations up to target (default: latest), one transaction each"""
+    applied = []
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(sa.text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+        try:
+            SchemaVersion.__table__.create(connection, checkfirst=True)
+            pending = pending_migrations(connection)
+            connection.commit()
+            
+            for version, name, module in pending:
+                if target is not None and version > target:
+                    break
+                log(f"Applying {version:04d} {name}...")
+                with connection.begin():
+                    module.upgrade(connection)
+                    connection.execute(sa.insert(SchemaVersion).values(
+                        version=version, name=name, applied_at=datetime.datetime.utcnow()
+                    ))
+                applied.append(version)
+        finally:
+            if connection.dialect.name == "postgresql":
+                connection.execute(sa.text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                connection.commit()
+    return applied
+
@@ -0,0 +1,29 @@
+import argparse
+import sys
+from migrations import upgrade, load_migrations, current_version
+from utils.db import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Manage the database schema")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("status", help="show applied and pending migrations")
+    upgrade_parser = subcommands.add_parser("upgrade", help="apply pending migrations (default)")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="stop at this version")
+    args = parser.parse_args()
+    
+    if args.command == "status":
+        with engine.connect() as connection:
+            version = current_version(connection)
+        print(f"Database is at version {version}")
+        for number, name, _ in load_migrations():
+            print(f"  [{'x' if number <= version else ' '}] {number:04d} {name}")
+        return 0
+    
+    applied = upgrade(target=getattr(args, "to", None))
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import sqlalchemy as sa
+
+# The schema as the app created it on startup before migrations existed. It is
+# spelled out here instead of taken from the models, so later changes to the
+# models are made by later migrations only.
+metadata = sa.MetaData()
+
+sa.Table(
+    "users", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("username", sa.String, unique=True, index=True),
+    sa.Column("password_hash", sa.String),
+    sa.Column("email", sa.String, unique=True, index=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Column("updated_at", sa.DateTime, server_default=sa.func.now())
+)
+
+sa.Table(
+    "facebook_accounts", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+    sa.Column("account_name", sa.String),
+    sa.Column("page_id", sa.String),
+    sa.Column("access_token", sa.String),
+    sa.Column("expires_at", sa.DateTime, nullable=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Column("updated_at", sa.DateTime, server_default=sa.func.now())
+)
+
+sa.Table(
+    "facebook_posts", metadata,
+    sa.Column("id", sa.String, primary_key=True),
+    sa.Column("page_id", sa.String, nullable=False),
+    sa.Column("message", sa.Text),
+    sa.Column("created_time", sa.DateTime),
+    sa.Column("permalink_url", sa.String, nullable=True),
+    sa.Column("shares", sa.Integer),
+    sa.Column("reactions", sa.Integer),
+    sa.Column("comments", sa.Integer),
+    sa.Column("synced_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Index("ix_facebook_posts_page_created", "page_id", "created_time")
+)
+
+sa.Table(
+    "facebook_comments", metadata,
+    sa.Column("id", sa.String, primary_key=True),
+    sa.Column("post_id", sa.String, nullable=False),
+    sa.Column("page_id", sa.String, nullable=False, index=True),
+    sa.Column("message", sa.Text),
+    sa.Column("created_time", sa.DateTime),
+    sa.Column("from_name", sa.String),
+    sa.Column("from_id", sa.String),
+    sa.Column("replies", sa.Integer),
+    sa.Column("has_attachment", sa.Boolean),
+    sa.Column("synced_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Index("ix_facebook_comments_post_created", "post_id", "created_time")
+)
+
+sa.Table(
+    "engagement_snapshots", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("page_id", sa.String, nullable=False),
+    sa.Column("post_id", sa.String, nullable=False),
+    sa.Column("reactions", sa.Integer),
+    sa.Column("comments", sa.Integer),
+    sa.Column("shares", sa.Integer),
+    sa.Column("captured_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Index("ix_engagement_snapshots_page_captured", "page_id", "captured_at")
+)
+
+sa.Table(
+    "sync_state", metadata,
+    sa.Column("key", sa.String, primary_key=True),
+    sa.Column("high_water", sa.DateTime, nullable=True),
+    sa.Column("backfill_cursor", sa.String, nullable=True),
+    sa.Column("synced_at", sa.DateTime, nullable=True)
+)
+
+sa.Table(
+    "page_insights", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("page_id", sa.String, nullable=False),
+    sa.Column("metric", sa.String, nullable=False),
+    sa.Column("period", sa.String, nullable=False),
+    sa.Column("end_time", sa.DateTime, nullable=False),
+    sa.Column("value", sa.BigInteger),
+    sa.UniqueConstraint("page_id", "metric", "period", "end_time", name="uq_page_insights_point")
+)
+
+
+def upgrade(connection):
+    """Baseline: the tables the app used to create on startup. Existing databases already have them."""
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,19 @@
+import sqlalchemy as sa
+
+INDEX_NAME = "uq_facebook_accounts_user_page"
+
+facebook_accounts = sa.table("facebook_accounts", sa.column("user_id"), sa.column("page_id"))
+
+
+def upgrade(connection):
+    """Unique (user_id, page_id) index on facebook_accounts"""
+    duplicates = connection.execute(
+        sa.select(facebook_accounts.c.user_id, facebook_accounts.c.page_id, sa.func.count())
+        .group_by(facebook_accounts.c.user_id, facebook_accounts.c.page_id)
+        .having(sa.func.count() > 1)
+    ).all()
+    if duplicates:
+        listed = ", ".join(f"user {user_id} page {page_id} ({count}x)" for user_id, page_id, count in duplicates[:10])
+        raise RuntimeError(f"Remove duplicate facebook_accounts rows before upgrading: {listed}")
+    
+    connection.execute(sa.text(f"CREATE UNIQUE INDEX {INDEX_NAME} ON facebook_accounts (user_id, page_id)"))
@@ -0,0 +1,28 @@
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+sync_jobs = sa.Table(
+    "sync_jobs", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("account_id", sa.Integer, sa.ForeignKey("facebook_accounts.id", ondelete="CASCADE"), nullable=False),
+    sa.Column("kind", sa.String, nullable=False),
+    sa.Column("run_at", sa.DateTime, nullable=False),
+    sa.Column("leased_by", sa.String, nullable=True),
+    sa.Column("leased_until", sa.DateTime, nullable=True),
+    sa.Column("attempts", sa.Integer, nullable=False),
+    sa.Column("last_error", sa.String, nullable=True),
+    sa.Column("finished_at", sa.DateTime, nullable=True),
+    sa.UniqueConstraint("account_id", "kind", name="uq_sync_jobs_account_kind"),
+    sa.Index("ix_sync_jobs_run_at", "run_at")
+)
+# Only referenced by the foreign key
+sa.Table("facebook_accounts", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+
+def upgrade(connection):
+    """Background sync: per-account priority and the sync_jobs work queue"""
+    connection.execute(sa.text(
+        "ALTER TABLE facebook_accounts ADD COLUMN sync_priority INTEGER NOT NULL DEFAULT 0"
+    ))
+    sync_jobs.create(connection)
@@ -0,0 +1,12 @@
+import sqlalchemy as sa
+
+webhook_events = sa.Table(
+    "webhook_events", sa.MetaData(),
+    sa.Column("key", sa.String, primary_key=True),
+    sa.Column("received_at", sa.DateTime, nullable=False, index=True)
+)
+
+
+def upgrade(connection):
+    """Keys of applied Page Webhooks events, for dropping redeliveries"""
+    webhook_events.create(connection)
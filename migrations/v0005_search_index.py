@@ -0,0 +1,46 @@
+import sqlalchemy as sa
+
+# Text search configuration and FTS5 table per searched table, as utils.db had them
+SEARCH_CONFIG = "simple"
+SEARCH_TABLES = {"facebook_posts": "post_search", "facebook_comments": "comment_search"}
+
+
+def _create_gin_index(connection, table):
+    # Same expression as utils.db._text_match, or the planner will not use the index
+    connection.execute(sa.text(
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} "
+        f"USING gin (to_tsvector('{SEARCH_CONFIG}'::regconfig, message))"
+    ))
+
+
+def _create_fts5_table(connection, table, search_table):
+    # External content table keyed by the base table's rowid: it stores only the
+    # index, and the triggers mirror every insert, message edit and delete
+    connection.execute(sa.text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5("
+        f"message, content='{table}', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')"
+    ))
+    connection.execute(sa.text(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {search_table}(rowid, message) VALUES (new.rowid, new.message); END"
+    ))
+    connection.execute(sa.text(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {search_table}({search_table}, rowid, message) VALUES ('delete', old.rowid, old.message); END"
+    ))
+    connection.execute(sa.text(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF message ON {table} BEGIN "
+        f"INSERT INTO {search_table}({search_table}, rowid, message) VALUES ('delete', old.rowid, old.message); "
+        f"INSERT INTO {search_table}(rowid, message) VALUES (new.rowid, new.message); END"
+    ))
+    # Index the rows synced before this migration
+    connection.execute(sa.text(f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')"))
+
+
+def upgrade(connection):
+    """Full-text search indexes over stored post and comment messages"""
+    for table, search_table in SEARCH_TABLES.items():
+        if connection.dialect.name == "postgresql":
+            _create_gin_index(connection, table)
+        else:
+            _create_fts5_table(connection, table, search_table)
@@ -0,0 +1,19 @@
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+token_revocations = sa.Table(
+    "token_revocations", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    sa.Column("token_hash", sa.String, nullable=True),
+    sa.Column("revoked_at", sa.DateTime, nullable=False),
+    sa.Column("expires_at", sa.DateTime, nullable=False, index=True)
+)
+# Only referenced by the foreign key
+sa.Table("users", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+
+def upgrade(connection):
+    """Server-side revocation of session tokens on logout and password change"""
+    token_revocations.create(connection)
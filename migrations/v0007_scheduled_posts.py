@@ -0,0 +1,32 @@
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+scheduled_posts = sa.Table(
+    "scheduled_posts", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("account_id", sa.Integer, sa.ForeignKey("facebook_accounts.id", ondelete="CASCADE"), nullable=False),
+    sa.Column("page_id", sa.String, nullable=False),
+    sa.Column("message", sa.Text, nullable=False),
+    sa.Column("link", sa.String, nullable=True),
+    sa.Column("publish_at", sa.DateTime, nullable=False),
+    sa.Column("due_at", sa.DateTime, nullable=False),
+    sa.Column("idempotency_key", sa.String, nullable=False, unique=True),
+    sa.Column("status", sa.String, nullable=False),
+    sa.Column("claimed_by", sa.String, nullable=True),
+    sa.Column("claimed_until", sa.DateTime, nullable=True),
+    sa.Column("attempts", sa.Integer, nullable=False),
+    sa.Column("attempted_at", sa.DateTime, nullable=True),
+    sa.Column("post_id", sa.String, nullable=True),
+    sa.Column("published_at", sa.DateTime, nullable=True),
+    sa.Column("last_error", sa.String, nullable=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Index("ix_scheduled_posts_status_due", "status", "due_at")
+)
+# Only referenced by the foreign key
+sa.Table("facebook_accounts", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+
+def upgrade(connection):
+    """Queue of posts to publish at a set time, drained by `python -m dispatcher`"""
+    scheduled_posts.create(connection)
@@ -0,0 +1,17 @@
+import sqlalchemy as sa
+
+metadata = sa.MetaData()
+
+comment_sync_requests = sa.Table(
+    "comment_sync_requests", metadata,
+    sa.Column("account_id", sa.Integer, sa.ForeignKey("facebook_accounts.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("post_id", sa.String, primary_key=True),
+    sa.Column("requested_at", sa.DateTime, nullable=False)
+)
+# Only referenced by the foreign key
+sa.Table("facebook_accounts", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+
+def upgrade(connection):
+    """Posts whose comments the UI asked the background worker to sync"""
+    comment_sync_requests.create(connection)
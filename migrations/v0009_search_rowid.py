@@ -0,0 +1,48 @@
+import sqlalchemy as sa
+
+# FTS5 tables of migration 0005 and the tables they index
+SEARCH_TABLES = {"facebook_posts": "post_search", "facebook_comments": "comment_search"}
+TOKENIZE = "unicode61 remove_diacritics 2"
+
+
+def _rekey_fts5_table(connection, table, search_table):
+    # The base tables have string primary keys, so their implicit rowids are not
+    # stable: VACUUM may renumber them and leave the index pointing at other rows.
+    # search_rowid is an explicit key the index can keep; new rows take the next one.
+    connection.execute(sa.text(f"ALTER TABLE {table} ADD COLUMN search_rowid INTEGER"))
+    connection.execute(sa.text(f"UPDATE {table} SET search_rowid = rowid"))
+    connection.execute(sa.text(f"CREATE UNIQUE INDEX ix_{table}_search_rowid ON {table} (search_rowid)"))
+    
+    for event in ("insert", "delete", "update"):
+        connection.execute(sa.text(f"DROP TRIGGER IF EXISTS {table}_search_{event}"))
+    connection.execute(sa.text(f"DROP TABLE IF EXISTS {search_table}"))
+    
+    connection.execute(sa.text(
+        f"CREATE VIRTUAL TABLE {search_table} USING fts5("
+        f"message, content='{table}', content_rowid='search_rowid', tokenize='{TOKENIZE}')"
+    ))
+    connection.execute(sa.text(
+        f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+        f"UPDATE {table} SET search_rowid = (SELECT COALESCE(MAX(search_rowid), 0) + 1 FROM {table}) "
+        f"WHERE rowid = new.rowid; "
+        f"INSERT INTO {search_table}(rowid, message) SELECT search_rowid, message FROM {table} WHERE rowid = new.rowid; END"
+    ))
+    connection.execute(sa.text(
+        f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {search_table}({search_table}, rowid, message) VALUES ('delete', old.search_rowid, old.message); END"
+    ))
+    connection.execute(sa.text(
+        f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF message ON {table} BEGIN "
+        f"INSERT INTO {search_table}({search_table}, rowid, message) VALUES ('delete', old.search_rowid, old.message); "
+        f"INSERT INTO {search_table}(rowid, message) VALUES (new.search_rowid, new.message); END"
+    ))
+    connection.execute(sa.text(f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')"))
+
+
+def upgrade(connection):
+    """Key the SQLite full-text indexes on a column VACUUM cannot renumber"""
+    if connection.dialect.name == "postgresql":
+        # The GIN indexes of migration 0005 index the rows themselves
+        return
+    for table, search_table in SEARCH_TABLES.items():
+        _rekey_fts5_table(connection, table, search_table)
@@ -77,6 +77,11 @@ def show_accounts_page():
                                 value=selected_account.expires_at if selected_account.expires_at else None,
                                 min_value=datetime.now().date()
                             )
+                            sync_priority = st.number_input(
+                                "Background Sync Priority (higher syncs first)",
+                                value=selected_account.sync_priority or 0,
+                                step=1
+                            )
                             
                             submit = st.form_submit_button("Update Account")
                             
@@ -89,7 +94,8 @@ def show_accounts_page():
                                     selected_account.id,
                                     account_name=account_name,
                                     access_token=access_token if access_token else None,
-                                    expires_at=expires_at
+                                    expires_at=expires_at,
+                                    sync_priority=int(sync_priority)
                                 )
                                 
                                 if success:
@@ -1,10 +1,36 @@
 import streamlit as st
-import pandas as pd
+from utils.db import (
+    query_stored_posts, get_stored_post, query_stored_comments,
+    update_stored_comment, delete_stored_comment
+)
 from utils.fb_api import (
-    get_account_api, get_page_posts, format_post_data,
-    get_post_comments, format_comment_data,
-    reply_to_comment, edit_comment, delete_comment
+    get_account_api, get_post_details, format_post_data, format_comment_data,
+    reply_to_comment, edit_comment, delete_comment,
+    bulk_hide_comments, bulk_delete_comments, bulk_reply_to_comments
+)
+from utils.sync import (
+    sync_page_posts, iter_sync_post_comments, refresh_comments, queue_unsynced_comments, background_sync,
+    ensure_stored_posts, ensure_stored_comments
 )
+from utils.render import paged_table
+
+# Columns of the comments table
+COMMENT_COLUMNS = ["created_time", "from_name", "short_message", "replies"]
+
+# Orders offered for the post picker and the comments table, the first being the default
+PICKER_SORTS = {"created_time": "Date", "comments": "Comments"}
+COMMENT_SORTS = {"created_time": "Date", "from_name": "Author", "replies": "Replies"}
+
+
+def show_bulk_results(results, action):
+    """Summarize the per-comment outcome of a bulk action"""
+    failed = {comment_id: error for comment_id, (_, error) in results.items() if error}
+    succeeded = len(results) - len(failed)
+    
+    if succeeded:
+        st.success(f"{succeeded} comment(s) {action}.")
+    for comment_id, error in failed.items():
+        st.error(f"{comment_id}: {error}")
 
 
 def show_comments_page():
@@ -27,36 +53,46 @@ def show_comments_page():
     
     # Step 1: Select a post
     if not st.session_state.get("selected_post"):
-        # Fetch and display posts first
-        with st.spinner("Loading posts..."):
-            posts = get_page_posts(api, account.page_id, limit=25)
-            df_posts = format_post_data(posts)
+        # Pull new posts into the local store, then render from it
+        if not background_sync():
+            with st.spinner("Syncing posts..."):
+                sync_page_posts(api, account.page_id, profile="comment_picker")
         
-        if df_posts.empty:
-            st.info("No posts found for this account.")
-            return
+        def query_posts(offset, limit, sort, descending, search):
+            if not background_sync():
+                # Keep the next page stored as well, so paging goes on while Graph has older posts
+                ensure_stored_posts(api, account.page_id, offset + 2 * limit, profile="comment_picker")
+            return query_stored_posts(account.page_id, offset, limit, sort, descending, search)
         
         st.markdown("### Select a Post to View Comments")
         
-        # Display the posts in a table
-        st.dataframe(
-            df_posts[["created_time", "short_message", "comments"]],
-            use_container_width=True,
-            hide_index=True
+        posts, df_posts = paged_table(
+            f"comment_posts_{account.id}",
+            query_posts,
+            format_post_data,
+            ["created_time", "short_message", "comments"],
+            st.session_state["preferences"]["posts_per_page"],
+            PICKER_SORTS,
+            empty_message="No posts found for this account."
         )
         
-        # Add functionality to select a post
-        post_options = [f"{row['created_time']} - {row['short_message']} ({row['comments']} comments)" for _, row in df_posts.iterrows()]
-        post_options.insert(0, "Select a post")
+        if df_posts.empty:
+            return
+        
+        # Add functionality to select a post, keyed by post id
+        post_labels = dict(zip(
+            df_posts["id"],
+            df_posts["created_time"] + " - " + df_posts["short_message"]
+            + " (" + df_posts["comments"].fillna(0).astype(int).astype(str) + " comments)"
+        ))
         
-        selected_post_option = st.selectbox(
+        selected_post_id = st.selectbox(
             "Select a post to manage comments",
-            options=post_options
+            options=[None, *post_labels],
+            format_func=lambda post_id: post_labels[post_id] if post_id else "Select a post"
         )
         
-        if selected_post_option != "Select a post":
-            selected_index = post_options.index(selected_post_option) - 1
-            selected_post_id = posts[selected_index]["id"]
+        if selected_post_id:
             st.session_state["selected_post"] = selected_post_id
             st.experimental_rerun()
     
@@ -69,20 +105,17 @@ def show_comments_page():
             st.session_state.pop("selected_post")
             st.experimental_rerun()
         
-        # Fetch post details
+        # Fetch post details, preferring the local store
         try:
-            post_details = api.get_object(
-                id=selected_post_id,
-                fields="message,created_time,permalink_url"
-            )
+            post_details = get_stored_post(selected_post_id) or get_post_details(api, selected_post_id)
             
             # Display post info
-            st.markdown(f"**Post Date:** {post_details.get('created_time')}")
+            st.markdown(f"**Post Date:** {post_details.created_time}")
             st.markdown(f"**Post Message:**")
-            st.markdown(f"> {post_details.get('message', 'No message')}")
+            st.markdown(f"> {post_details.message or 'No message'}")
             
             # Add post permalink
-            permalink = post_details.get('permalink_url')
+            permalink = post_details.permalink_url
             if permalink:
                 st.markdown(f"[View Post on Facebook]({permalink})")
         
@@ -90,17 +123,34 @@ def show_comments_page():
             st.error(f"Error fetching post details: {str(e)}")
         
         # Add refresh button for comments
-        if st.button("🔄 Refresh Comments"):
-            st.experimental_rerun()
+        refresh = st.button("🔄 Refresh Comments")
+        if background_sync() and refresh:
+            refresh_comments(api, account, selected_post_id)
+        elif background_sync() and queue_unsynced_comments(account, selected_post_id):
+            st.info("The comments of this post are being synced in the background. Refresh the page in a moment.")
+        
+        def query_comments(offset, limit, sort, descending, search):
+            if not background_sync():
+                # Keep the next page stored as well, so paging goes on while Graph has older comments
+                ensure_stored_comments(api, account.page_id, selected_post_id, offset + 2 * limit)
+            return query_stored_comments(selected_post_id, offset, limit, sort, descending, search)
         
-        # Fetch comments
+        st.subheader("Comments")
+        
+        # Pull new comments into the local store, previewing the first page as it arrives
         with st.spinner("Loading comments..."):
-            comments = get_post_comments(api, selected_post_id)
-            df_comments = format_comment_data(comments)
+            comments, df_comments = paged_table(
+                f"comments_{selected_post_id}",
+                query_comments,
+                format_comment_data,
+                COMMENT_COLUMNS,
+                st.session_state["preferences"]["posts_per_page"],
+                COMMENT_SORTS,
+                stream=None if background_sync() else iter_sync_post_comments(api, account.page_id, selected_post_id, force=refresh),
+                empty_message="No comments found for this post."
+            )
         
         if df_comments.empty:
-            st.info("No comments found for this post.")
-            
             # Add a form to add a new comment/reply
             with st.form("add_comment_form"):
                 st.subheader("Add a comment")
@@ -117,40 +167,61 @@ def show_comments_page():
                             st.error(f"Failed to post comment: {error}")
                         else:
                             st.success("Comment posted successfully!")
+                            refresh_comments(api, account, selected_post_id)
                             st.experimental_rerun()
         else:
-            # Display comments
-            st.subheader(f"Comments ({len(comments)})")
-            
-            # Show comments in a table
-            st.dataframe(
-                df_comments[["created_time", "from_name", "short_message", "replies"]],
-                use_container_width=True,
-                hide_index=True
-            )
+            # Bulk moderation, sent to Graph as batch requests
+            with st.expander("Bulk Moderation"):
+                comment_labels = dict(zip(
+                    df_comments["id"],
+                    df_comments["created_time"] + " - " + df_comments["from_name"] + ": " + df_comments["short_message"]
+                ))
+                bulk_ids = st.multiselect(
+                    "Select comments",
+                    options=list(comment_labels.keys()),
+                    format_func=comment_labels.get
+                )
+                bulk_reply = st.text_area("Reply to all selected", height=80)
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    if st.button("Hide Selected", use_container_width=True, disabled=not bulk_ids):
+                        results = bulk_hide_comments(api, bulk_ids)
+                        show_bulk_results(results, "hidden")
+                
+                with col2:
+                    if st.button("Delete Selected", use_container_width=True, disabled=not bulk_ids):
+                        results = bulk_delete_comments(api, bulk_ids)
+                        for comment_id, (success, _) in results.items():
+                            if success:
+                                delete_stored_comment(comment_id)
+                        show_bulk_results(results, "deleted")
+                
+                with col3:
+                    if st.button("Reply to Selected", use_container_width=True, disabled=not bulk_ids or not bulk_reply):
+                        results = bulk_reply_to_comments(api, [(comment_id, bulk_reply) for comment_id in bulk_ids])
+                        show_bulk_results(results, "replied to")
+                        refresh_comments(api, account, selected_post_id)
             
             # Comment management
             st.markdown("### Manage Comments")
             
-            # Select a comment
-            comment_options = [f"{row['created_time']} - {row['from_name']}: {row['short_message']}" for _, row in df_comments.iterrows()]
-            comment_options.insert(0, "Select a comment to manage")
-            
-            selected_comment_option = st.selectbox(
+            # Select a comment, keyed by comment id (labels are shared with bulk moderation)
+            selected_comment_id = st.selectbox(
                 "Select a comment",
-                options=comment_options
+                options=[None, *comment_labels],
+                format_func=lambda comment_id: comment_labels[comment_id] if comment_id else "Select a comment to manage"
             )
             
-            if selected_comment_option != "Select a comment to manage":
-                selected_index = comment_options.index(selected_comment_option) - 1
-                selected_comment = comments[selected_index]
-                selected_comment_id = selected_comment["id"]
+            if selected_comment_id:
+                selected_comment = next(comment for comment in comments if comment.id == selected_comment_id)
                 
                 # Display comment details
-                st.markdown(f"**From:** {selected_comment['from_name']}")
-                st.markdown(f"**Date:** {selected_comment['created_time']}")
+                st.markdown(f"**From:** {selected_comment.from_name}")
+                st.markdown(f"**Date:** {selected_comment.created_time}")
                 st.markdown(f"**Message:**")
-                st.markdown(f"> {selected_comment['message']}")
+                st.markdown(f"> {selected_comment.message}")
                 
                 # Comment actions
                 st.markdown("### Actions")
@@ -164,7 +235,7 @@ def show_comments_page():
                 with col2:
                     if st.button("Edit (Admin Only)", use_container_width=True):
                         # Check if it's the page's comment
-                        if selected_comment.get("from_id") == account.page_id:
+                        if selected_comment.from_id == account.page_id:
                             st.session_state["edit_comment"] = selected_comment_id
                         else:
                             st.error("You can only edit comments made by your page.")
@@ -185,4 +256,55 @@ def show_comments_page():
                             if not reply_message:
                                 st.error("Please enter a reply message.")
                             else:
-                                reply_id, error = reply_to_comment(api, selected_comment_id, reply_
+                                reply_id, error = reply_to_comment(api, selected_comment_id, reply_message)
+                                
+                                if error:
+                                    st.error(f"Failed to post reply: {error}")
+                                else:
+                                    st.success("Reply posted successfully!")
+                                    st.session_state["reply_to_comment"] = None
+                                    refresh_comments(api, account, selected_post_id)
+                                    st.experimental_rerun()
+                
+                # Edit comment form
+                if st.session_state.get("edit_comment") == selected_comment_id:
+                    st.markdown("### Edit Comment")
+                    
+                    with st.form("edit_comment_form"):
+                        edited_message = st.text_area("Edit comment", value=selected_comment.message, height=100)
+                        submit = st.form_submit_button("Update Comment")
+                        
+                        if submit:
+                            success, error = edit_comment(api, selected_comment_id, edited_message)
+                            
+                            if success:
+                                st.success("Comment updated successfully!")
+                                st.session_state["edit_comment"] = None
+                                update_stored_comment(selected_comment_id, edited_message)
+                                st.experimental_rerun()
+                            else:
+                                st.error(f"Failed to update comment: {error}")
+                
+                # Delete comment confirmation
+                if st.session_state.get("delete_comment") == selected_comment_id:
+                    st.markdown("### Delete Comment")
+                    st.warning("Are you sure you want to delete this comment? This action cannot be undone.")
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        if st.button("Yes, Delete Comment", use_container_width=True):
+                            success, error = delete_comment(api, selected_comment_id)
+                            
+                            if success:
+                                st.success("Comment deleted successfully!")
+                                st.session_state["delete_comment"] = None
+                                delete_stored_comment(selected_comment_id)
+                                st.experimental_rerun()
+                            else:
+                                st.error(f"Failed to delete comment: {error}")
+                    
+                    with col2:
+                        if st.button("Cancel", use_container_width=True):
+                            st.session_state["delete_comment"] = None
+                            st.experimental_rerun()
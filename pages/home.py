@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from utils.db import get_user_accounts
-from utils.fb_api import get_account_api, get_page_posts, get_page_insights, format_post_data
+from utils.db import get_stored_posts, get_insights_totals, get_insights_series, get_sync_jobs
+from utils.fb_api import get_account_api, format_post_data, get_rate_limit_status
+from utils.sync import sync_page_posts, sync_page_insights, refresh_posts, background_sync
 
 
 def show_home_page():
@@ -26,10 +26,23 @@ def show_home_page():
     # Display page information
     st.subheader(f"Page: {account.account_name}")
     
+    # Show how much of the Graph API budget is used up
+    budget = get_rate_limit_status()
+    app_usage = budget.get("app", {}).get("usage", 0)
+    page_usage = budget.get(f"page:{account.page_id}", {}).get("usage", 0)
+    st.caption(f"Facebook API usage: app {app_usage:.0f}%, page {page_usage:.0f}%")
+    
+    if background_sync():
+        synced = [
+            f"{kind} {job.finished_at:%Y-%m-%d %H:%M} UTC"
+            for kind, job in get_sync_jobs(account.id).items() if job.finished_at
+        ]
+        st.caption("Last background sync: " + (", ".join(synced) if synced else "pending"))
+    
     # Add date range selector
     col1, col2 = st.columns(2)
     with col1:
-        days_options = {"Last 7 days": 7, "Last 14 days": 14, "Last 30 days": 30}
+        days_options = {"Last 7 days": 7, "Last 14 days": 14, "Last 30 days": 30, "Last 90 days": 90}
         selected_days = st.selectbox("Time period", options=list(days_options.keys()), index=2)
         days = days_options[selected_days]
     
@@ -38,9 +51,21 @@ def show_home_page():
         selected_period = st.selectbox("Aggregation", options=list(period_options.keys()), index=0)
         period = period_options[selected_period]
     
-    # Fetch insights data
-    with st.spinner("Loading page insights..."):
-        insights = get_page_insights(api, account.page_id, period=period, days=days)
+    # Backfill the missing insights days (twice the range, for the comparison), then read locally
+    if not background_sync():
+        with st.spinner("Loading page insights..."):
+            sync_page_insights(api, account.page_id, period=period, days=days * 2)
+    
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    insights = get_insights_totals(account.page_id, period, start, end)
+    previous = get_insights_totals(account.page_id, period, start - timedelta(days=days), start)
+    
+    def change(metric):
+        """Change against the previous period of the same length, if we have data for it"""
+        if metric not in previous:
+            return None
+        return f"{insights.get(metric, 0) - previous[metric]:+,}"
     
     if not insights:
         st.warning("Could not fetch page insights. This might be due to API permissions or rate limits.")
@@ -51,25 +76,29 @@ def show_home_page():
         with col1:
             st.metric(
                 label="Page Fans",
-                value=f"{insights.get('page_fans', 0):,}"
+                value=f"{insights.get('page_fans', 0):,}",
+                delta=change("page_fans")
             )
         
         with col2:
             st.metric(
                 label="New Fans",
-                value=f"{insights.get('page_fan_adds', 0):,}"
+                value=f"{insights.get('page_fan_adds', 0):,}",
+                delta=change("page_fan_adds")
             )
         
         with col3:
             st.metric(
                 label="Impressions",
-                value=f"{insights.get('page_impressions', 0):,}"
+                value=f"{insights.get('page_impressions', 0):,}",
+                delta=change("page_impressions")
             )
         
         with col4:
             st.metric(
                 label="Engagements",
-                value=f"{insights.get('page_post_engagements', 0):,}"
+                value=f"{insights.get('page_post_engagements', 0):,}",
+                delta=change("page_post_engagements")
             )
             
         # Create engagement rate
@@ -99,12 +128,26 @@ def show_home_page():
         fig.update_layout(height=250, margin=dict(l=10, r=10, t=30, b=10))
         
         st.plotly_chart(fig, use_container_width=True)
+        
+        # Impressions over time, straight from the local insights table
+        series = get_insights_series(account.page_id, "page_impressions", period, start, end)
+        if not series.empty:
+            fig = px.line(
+                series,
+                x="end_time",
+                y="value",
+                labels={"end_time": "Date", "value": "Impressions"},
+                title="Impressions over Time"
+            )
+            st.plotly_chart(fig, use_container_width=True)
     
     # Display recent posts
     st.subheader("Recent Posts")
     
     with st.spinner("Loading recent posts..."):
-        posts = get_page_posts(api, account.page_id, limit=10)
+        if not background_sync():
+            sync_page_posts(api, account.page_id, profile="dashboard")
+        posts = get_stored_posts(account.page_id, limit=10)
         df_posts = format_post_data(posts)
     
     if df_posts.empty:
@@ -131,4 +174,5 @@ def show_home_page():
         
     # Add a refresh button
     if st.button("🔄 Refresh Dashboard"):
+        refresh_posts(api, account, profile="dashboard")
         st.experimental_rerun()
@@ -0,0 +1,52 @@
+import streamlit as st
+import pandas as pd
+from utils.multi_fetch import fetch_all_accounts
+
+
+def show_overview_page():
+    """Display an overview of all of the user's Facebook accounts"""
+    st.header("🗂️ All Accounts")
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        days_options = {"Last 7 days": 7, "Last 14 days": 14, "Last 30 days": 30}
+        selected_days = st.selectbox("Time period", options=list(days_options.keys()), index=2)
+        days = days_options[selected_days]
+    
+    with col2:
+        refresh = st.button("🔄 Refresh Overview", use_container_width=True)
+    
+    overview = st.session_state.get("overview")
+    if refresh or not overview or overview["days"] != days:
+        with st.spinner("Loading all accounts..."):
+            results, complete = fetch_all_accounts(st.session_state["user_id"], days=days)
+        overview = {"days": days, "results": results, "complete": complete}
+        st.session_state["overview"] = overview
+    
+    results = overview["results"]
+    
+    if not results:
+        st.info("No accounts added yet. Go to Accounts page to add one.")
+        return
+    
+    if not overview["complete"]:
+        st.warning("Some accounts could not be loaded completely. Their rows show what was fetched.")
+    
+    rows = []
+    for result in results:
+        insights = result["insights"] or {}
+        posts = result["posts"] or []
+        rows.append({
+            "name": result["account"].account_name,
+            "page_id": result["account"].page_id,
+            "fans": insights.get("page_fans"),
+            "new_fans": insights.get("page_fan_adds"),
+            "impressions": insights.get("page_impressions"),
+            "engagements": insights.get("page_post_engagements"),
+            "recent_posts": len(posts) if result["posts"] is not None else None,
+            "recent_engagement": sum(post.reactions + post.comments + post.shares for post in posts),
+            "status": "; ".join(f"{kind}: {error}" for kind, error in result["errors"].items()) or "OK"
+        })
+    
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
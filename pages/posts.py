@@ -1,6 +1,29 @@
 import streamlit as st
 import pandas as pd
-from utils.fb_api import get_account_api, get_page_posts, format_post_data, create_post, edit_post, delete_post
+import datetime
+import uuid
+from utils.db import (
+    query_stored_posts, update_stored_post, delete_stored_post,
+    schedule_post, cancel_scheduled_post, get_scheduled_posts, get_publish_latency
+)
+from utils.fb_api import get_account_api, format_post_data, shorten_text, create_post, edit_post, delete_post
+from utils.sync import iter_sync_page_posts, ensure_stored_posts, refresh_posts, background_sync
+from utils.render import paged_table
+
+# Columns of the posts table
+POST_COLUMNS = ["created_time", "short_message", "reactions", "comments", "shares", "engagement"]
+
+# Columns of the scheduled posts table
+SCHEDULED_COLUMNS = ["publish_at", "message", "status", "last_error"]
+
+# Orders offered for the posts table, the first being the default
+POST_SORTS = {
+    "created_time": "Date",
+    "engagement": "Engagement",
+    "reactions": "Reactions",
+    "comments": "Comments",
+    "shares": "Shares"
+}
 
 
 def show_posts_page():
@@ -26,63 +49,60 @@ def show_posts_page():
     with tab1:
         st.subheader(f"Posts for {account.account_name}")
         
-        # Add filter and reload controls
-        col1, col2 = st.columns([3, 1])
+        refresh = st.button("🔄 Refresh Posts")
+        if background_sync() and refresh:
+            refresh_posts(api, account)
         
-        with col1:
-            post_limit = st.slider("Number of posts to load", min_value=5, max_value=100, value=25, step=5)
+        def query_posts(offset, limit, sort, descending, search):
+            if not background_sync():
+                # Keep the next page stored as well, so paging goes on while Graph has older posts
+                ensure_stored_posts(api, account.page_id, offset + 2 * limit)
+            return query_stored_posts(account.page_id, offset, limit, sort, descending, search)
         
-        with col2:
-            if st.button("🔄 Refresh Posts", use_container_width=True):
-                st.experimental_rerun()
-        
-        # Fetch and display posts
+        # Pull new posts into the local store, previewing the first page as it arrives
         with st.spinner("Loading posts..."):
-            posts = get_page_posts(api, account.page_id, limit=post_limit)
-            df_posts = format_post_data(posts)
-        
-        if df_posts.empty:
-            st.info("No posts found for this account.")
-        else:
-            # Display the posts in a table
-            st.dataframe(
-                df_posts[["created_time", "short_message", "reactions", "comments", "shares", "engagement"]],
-                use_container_width=True,
-                hide_index=True
+            posts, df_posts = paged_table(
+                f"posts_{account.id}",
+                query_posts,
+                format_post_data,
+                POST_COLUMNS,
+                st.session_state["preferences"]["posts_per_page"],
+                POST_SORTS,
+                stream=None if background_sync() else iter_sync_page_posts(api, account.page_id, force=refresh),
+                empty_message="No posts found for this account."
             )
+        
+        if not df_posts.empty:
+            # Add functionality to select a post for more details, keyed by post id
+            post_labels = dict(zip(df_posts["id"], df_posts["created_time"] + " - " + df_posts["short_message"]))
             
-            # Add functionality to select a post for more details
-            post_options = [f"{row['created_time']} - {row['short_message']}" for _, row in df_posts.iterrows()]
-            post_options.insert(0, "Select a post to view details")
-            
-            selected_post_option = st.selectbox(
+            selected_post_id = st.selectbox(
                 "Select a post to view or manage",
-                options=post_options
+                options=[None, *post_labels],
+                format_func=lambda post_id: post_labels[post_id] if post_id else "Select a post to view details"
             )
             
-            if selected_post_option != "Select a post to view details":
-                selected_index = post_options.index(selected_post_option) - 1
-                selected_post_id = posts[selected_index]["id"]
+            if selected_post_id:
                 st.session_state["selected_post"] = selected_post_id
                 
                 # Display post details
-                selected_post = posts[selected_index]
+                selected_post = next(post for post in posts if post.id == selected_post_id)
                 
                 st.markdown("### Post Details")
                 
                 # Display post content
-                st.markdown(f"**Posted on:** {selected_post['created_time']}")
+                st.markdown(f"**Posted on:** {selected_post.created_time}")
                 st.markdown(f"**Message:**")
-                st.markdown(f"> {selected_post['message']}")
+                st.markdown(f"> {selected_post.message}")
                 
                 # Display post stats
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Reactions", selected_post["reactions"])
+                    st.metric("Reactions", selected_post.reactions)
                 with col2:
-                    st.metric("Comments", selected_post["comments"])
+                    st.metric("Comments", selected_post.comments)
                 with col3:
-                    st.metric("Shares", selected_post["shares"])
+                    st.metric("Shares", selected_post.shares)
                 
                 # Post view/edit/delete options
                 st.markdown("### Post Actions")
@@ -91,7 +111,7 @@ def show_posts_page():
                 
                 with col1:
                     if st.button("View on Facebook", use_container_width=True):
-                        permalink_url = selected_post.get("permalink_url", "")
+                        permalink_url = selected_post.permalink_url or ""
                         if permalink_url:
                             st.markdown(f"[Open Post on Facebook]({permalink_url})")
                         else:
@@ -110,7 +130,7 @@ def show_posts_page():
                     st.markdown("### Edit Post")
                     
                     with st.form("edit_post_form"):
-                        edited_message = st.text_area("Edit Message", value=selected_post["message"], height=150)
+                        edited_message = st.text_area("Edit Message", value=selected_post.message, height=150)
                         submit = st.form_submit_button("Update Post")
                         
                         if submit:
@@ -119,6 +139,7 @@ def show_posts_page():
                             if success:
                                 st.success("Post updated successfully!")
                                 st.session_state.pop("edit_post", None)
+                                update_stored_post(selected_post_id, edited_message)
                                 st.experimental_rerun()
                             else:
                                 st.error(f"Failed to update post: {error}")
@@ -138,6 +159,7 @@ def show_posts_page():
                                 st.success("Post deleted successfully!")
                                 st.session_state.pop("delete_post", None)
                                 st.session_state.pop("selected_post", None)
+                                delete_stored_post(selected_post_id)
                                 st.experimental_rerun()
                             else:
                                 st.error(f"Failed to delete post: {error}")
@@ -151,16 +173,47 @@ def show_posts_page():
     with tab2:
         st.subheader(f"Create New Post for {account.account_name}")
         
+        # Outside the form, so ticking it shows the date and time inputs right away
+        schedule = st.checkbox("Schedule for later")
+        
         with st.form("create_post_form"):
             post_message = st.text_area("Post Message", height=200, placeholder="What's on your mind?")
             post_link = st.text_input("Link (optional)", placeholder="https://example.com")
             
+            if schedule:
+                col1, col2 = st.columns(2)
+                with col1:
+                    publish_date = st.date_input("Publish on (UTC)", min_value=datetime.datetime.utcnow().date())
+                with col2:
+                    publish_time = st.time_input("Publish at (UTC)", step=300)
+            
             # Submit button
-            submit = st.form_submit_button("Create Post")
+            submit = st.form_submit_button("Schedule Post" if schedule else "Create Post")
             
             if submit:
                 if not post_message:
                     st.error("Please enter a message for your post.")
+                elif schedule:
+                    publish_at = datetime.datetime.combine(publish_date, publish_time)
+                    if publish_at <= datetime.datetime.utcnow():
+                        st.error("Please pick a time in the future.")
+                    else:
+                        # One key per filled-in form, so submitting it twice queues the post once
+                        idempotency_key = st.session_state.setdefault("schedule_post_key", uuid.uuid4().hex)
+                        scheduled_id, error = schedule_post(
+                            account.id,
+                            account.page_id,
+                            post_message,
+                            publish_at,
+                            idempotency_key,
+                            link=post_link if post_link else None
+                        )
+                        
+                        if error:
+                            st.error(f"Failed to schedule post: {error}")
+                        else:
+                            st.session_state.pop("schedule_post_key", None)
+                            st.success(f"Post scheduled for {publish_at:%Y-%m-%d %H:%M} UTC.")
                 else:
                     # Create the post
                     post_id, error = create_post(
@@ -175,4 +228,48 @@ def show_posts_page():
                     else:
                         st.success("Post created successfully!")
                         st.session_state["selected_post"] = post_id
+                        refresh_posts(api, account)
                         st.experimental_rerun()
+        
+        # Posts waiting for `python -m dispatcher`, and the ones it gave up on
+        scheduled = get_scheduled_posts(account.id)
+        if scheduled:
+            st.markdown("### Scheduled Posts")
+            
+            df_scheduled = pd.DataFrame([{
+                "id": post.id,
+                "publish_at": f"{post.publish_at:%Y-%m-%d %H:%M}",
+                "message": post.message,
+                "status": post.status,
+                "last_error": post.last_error or ""
+            } for post in scheduled])
+            df_scheduled["message"] = shorten_text(df_scheduled["message"])
+            st.dataframe(df_scheduled[SCHEDULED_COLUMNS], use_container_width=True, hide_index=True)
+            
+            scheduled_labels = dict(zip(
+                df_scheduled["id"],
+                df_scheduled["publish_at"] + " - " + df_scheduled["message"]
+            ))
+            pending_ids = [post.id for post in scheduled if post.status == "pending"]
+            
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                cancel_id = st.selectbox(
+                    "Cancel a scheduled post",
+                    options=[None, *pending_ids],
+                    format_func=lambda scheduled_id: scheduled_labels[scheduled_id] if scheduled_id else "Select a post"
+                )
+            with col2:
+                if st.button("Cancel Post", use_container_width=True, disabled=not cancel_id):
+                    success, error = cancel_scheduled_post(cancel_id, account.id)
+                    if success:
+                        st.experimental_rerun()
+                    else:
+                        st.error(f"Failed to cancel post: {error}")
+        
+        latency = get_publish_latency(datetime.datetime.utcnow() - datetime.timedelta(days=1), account_id=account.id)
+        if latency["count"]:
+            st.caption(
+                f"Scheduled posts published in the last 24 hours: {latency['count']}, "
+                f"late by {latency['p50']:.1f}s (median), {latency['p95']:.1f}s (95th percentile)"
+            )
@@ -0,0 +1,80 @@
+import streamlit as st
+from utils.db import get_user_accounts, search_stored_messages
+from utils.fb_api import format_comment_data
+
+# Columns of the search results table
+RESULT_COLUMNS = ["created_time", "page", "from_name", "short_message"]
+
+
+def show_search_page():
+    """Display full-text search over the stored posts and comments of every account"""
+    st.header("🔎 Search")
+    
+    accounts = get_user_accounts(st.session_state["user_id"])
+    if not accounts:
+        st.info("Add a Facebook account on the Accounts page to search its posts and comments.")
+        return
+    
+    account_names = {account.page_id: account.account_name for account in accounts}
+    account_ids = {account.page_id: account.id for account in accounts}
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search = st.text_input("Search", placeholder="Words to find, e.g. refund broken screen")
+    with col2:
+        kind = st.radio("Search in", options=["comments", "posts"], format_func=str.capitalize, horizontal=True)
+    
+    page_ids = st.multiselect(
+        "Pages",
+        options=list(account_names),
+        default=list(account_names),
+        format_func=account_names.get
+    )
+    
+    if not search.strip():
+        st.info("Only posts and comments already synced from Facebook are searched.")
+        return
+    
+    # A new search starts over from the first page
+    view = (search, kind, tuple(page_ids))
+    paging = st.session_state.setdefault("search_paging", {"view": view, "page": 0})
+    if paging["view"] != view:
+        paging.update(view=view, page=0)
+    
+    page_size = st.session_state["preferences"]["posts_per_page"]
+    hits, more = search_stored_messages(page_ids, search, kind, limit=page_size, offset=paging["page"] * page_size)
+    
+    if not hits:
+        st.info("No matches found.")
+        return
+    
+    df_hits = format_comment_data(hits)
+    df_hits["page"] = df_hits["page_id"].map(account_names)
+    st.dataframe(df_hits[RESULT_COLUMNS], use_container_width=True, hide_index=True)
+    
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if st.button("← Previous", key="search_previous", disabled=paging["page"] == 0, use_container_width=True):
+            paging["page"] -= 1
+            st.experimental_rerun()
+    with col2:
+        st.caption(f"Page {paging['page'] + 1}")
+    with col3:
+        if st.button("Next →", key="search_next", disabled=not more, use_container_width=True):
+            paging["page"] += 1
+            st.experimental_rerun()
+    
+    # Jump to the comments of the post a match belongs to, keyed by match id
+    hit_labels = dict(zip(df_hits["id"], df_hits["created_time"] + " - " + df_hits["page"] + ": " + df_hits["short_message"]))
+    selected_id = st.selectbox(
+        "Open a match",
+        options=[None, *hit_labels],
+        format_func=lambda hit_id: hit_labels[hit_id] if hit_id else "Select a match"
+    )
+    
+    if selected_id and st.button("Open Post Comments"):
+        hit = next(hit for hit in hits if hit.id == selected_id)
+        st.session_state["selected_account"] = account_ids[hit.page_id]
+        st.session_state["selected_post"] = hit.post_id
+        st.session_state["page"] = "comments"
+        st.experimental_rerun()
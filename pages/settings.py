@@ -1,5 +1,8 @@
 import streamlit as st
+import pandas as pd
 from utils.auth import change_password, logout
+from utils.db import get_pool_metrics, get_rerun_stats
+from utils.fb_api import get_cache_stats, get_flight_stats, get_rate_limit_status
 
 
 def show_settings_page():
@@ -7,7 +10,7 @@ def show_settings_page():
     st.header("⚙️ Settings")
     
     # Create tabs for different settings sections
-    tab1, tab2 = st.tabs(["Account Settings", "App Preferences"])
+    tab1, tab2, tab3 = st.tabs(["Account Settings", "App Preferences", "System"])
     
     # Account Settings tab
     with tab1:
@@ -59,12 +62,12 @@ def show_settings_page():
             index=0
         )
         
-        # Posts per page setting
+        # Page size of the posts and comments tables
         posts_per_page = st.slider(
-            "Default posts to load",
+            "Rows per page (posts and comments)",
             min_value=5,
             max_value=100,
-            value=25,
+            value=st.session_state["preferences"]["posts_per_page"],
             step=5
         )
         
@@ -84,3 +87,59 @@ def show_settings_page():
                 "date_format": date_format
             }
             st.success("Preferences saved successfully!")
+    
+    # System tab
+    with tab3:
+        st.subheader("Database Connection Pool")
+        
+        pool = get_pool_metrics()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Checked Out", pool.get("checked_out", "n/a"))
+        with col2:
+            st.metric("Waits", pool["waits"])
+        with col3:
+            st.metric("Avg Checkout (ms)", f"{pool['avg_checkout_ms']:.2f}")
+        with col4:
+            st.metric("Timeouts", pool["timeouts"])
+        
+        st.json(pool, expanded=False)
+        
+        rerun = get_rerun_stats()
+        st.caption(
+            f"Queries so far this rerun: {rerun['current_queries']} · "
+            f"last rerun: {rerun['last_queries']} queries in {rerun['last_seconds']:.2f}s"
+        )
+        
+        st.subheader("Facebook API Cache")
+        
+        cache = get_cache_stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if cache["max_entries"] is None:
+                # Redis bounds its own size and is not counted
+                st.metric("Backend", cache["backend"])
+            else:
+                st.metric("Entries", f"{cache['entries']} / {cache['max_entries']}")
+        with col2:
+            st.metric("Hit Rate", f"{cache['hit_rate']:.0%}")
+        with col3:
+            st.metric("Invalidations", cache["invalidations"])
+        
+        flights = get_flight_stats()
+        st.caption(
+            f"Graph fetches: {flights['calls']} · "
+            f"identical concurrent reads served by one of them: {flights['coalesced']}"
+        )
+        
+        st.subheader("Facebook API Budget")
+        
+        budget = get_rate_limit_status()
+        if budget:
+            st.dataframe(
+                pd.DataFrame.from_dict(budget, orient="index").rename_axis("scope").reset_index(),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No Facebook API calls made yet.")
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import pytest
+from streamlit import config as streamlit_config
+
+# config.py reads st.secrets at import time, so point Streamlit at a throwaway
+# secrets file (with a SQLite database) before any app module is imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix="fb-content-manager-tests-")
+SECRETS = f"""
+[postgres]
+url = "sqlite:///{TEST_DIR}/app.db"
+
+[jwt]
+secret = "test-secret"
+algorithm = "HS256"
+expiration = 3600
+
+[facebook]
+api_version = "v18.0"
+app_secret = "test-app-secret"
+
+[auth]
+bcrypt_rounds = 4
+hash_workers = 0
+"""
+
+with open(os.path.join(TEST_DIR, "secrets.toml"), "w") as f:
+    f.write(SECRETS)
+streamlit_config.set_option("secrets.files", [os.path.join(TEST_DIR, "secrets.toml")])
+sys.path.insert(0, ROOT)
+
+from utils import db as app_db  # noqa: E402
+from utils import fb_api, fb_async  # noqa: E402
+from utils.rate_limit import RateLimitScheduler  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def schema():
+    import migrations
+    migrations.upgrade(log=lambda message: None)
+    assert app_db.init_db()
+
+
+@pytest.fixture
+def database(schema):
+    """Migrated database, emptied again after the test"""
+    yield app_db
+    with app_db.engine.begin() as connection:
+        for table in reversed(app_db.Base.metadata.sorted_tables):
+            if table.name != "schema_version":
+                connection.execute(table.delete())
+
+
+@pytest.fixture(autouse=True)
+def graph_state(monkeypatch):
+    """Fresh Graph cache and a scheduler that never makes tests wait for budget"""
+    scheduler = RateLimitScheduler(rate=10000, backoff_base=0.01)
+    monkeypatch.setattr(fb_api, "graph_scheduler", scheduler)
+    monkeypatch.setattr(fb_async, "graph_scheduler", scheduler)
+    fb_api.graph_cache.clear()
+    yield scheduler
+    fb_api.graph_cache.clear()
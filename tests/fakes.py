@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import facebook
+from utils.records import Comment
+
+
+def make_post(page_id, index):
+    return {
+        "id": f"{page_id}_{index}",
+        "message": f"post {index}",
+        "created_time": f"2024-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}+0000",
+        "shares": {"count": index % 3},
+        "reactions": {"data": [], "summary": {"total_count": index % 5}},
+        "comments": {"data": [], "summary": {"total_count": index % 7}}
+    }
+
+
+def make_comment(post_id, index):
+    return {
+        "id": f"{post_id.split('_')[-1]}_{index}",
+        "message": f"comment {index}",
+        "created_time": f"2024-01-01T01:{index // 60 % 60:02d}:{index % 60:02d}+0000",
+        "from": {"name": f"user {index}", "id": str(index)},
+        "comment_count": 0
+    }
+
+
+def make_comments(count):
+    """Synthetic comments as the local store returns them, a third with long messages"""
+    return [
+        Comment(
+            f"1_{i}",
+            ("a fairly long comment that goes on well past the fifty characters shown " * (i % 3 == 0)) + f"comment {i}",
+            f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00+0000",
+            f"user {i % 997}",
+            str(i % 997),
+            i % 5,
+            i % 7 == 0
+        )
+        for i in range(count)
+    ]
+
+
+class FakeGraphAPI:
+    """Stands in for facebook.GraphAPI, serving connections from memory
+
+    Connections page like Graph does, with an opaque "after" cursor and a
+    "next" link while items remain. pages_served counts the HTTP pages a
+    real client would have requested; delay makes every call that slow.
+    """
+
+    access_token = "fake-token"
+    version = "v18.0"
+
+    def __init__(self, connections=None, delay=0):
+        self.connections = connections or {}
+        self.objects = {}
+        self.delay = delay
+        self.pages_served = 0
+        self.calls = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._next_id = 1000
+
+    def _serve(self):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+    def get_connections(self, id, connection_name, **args):
+        items = self.connections.get((id, connection_name), [])
+        # Read the state before the (simulated) network wait, like a server snapshot
+        start = int(args.get("after") or 0)
+        data = [dict(item) for item in items[start:start + int(args.get("limit", 25))]]
+        self._serve()
+        with self._lock:
+            self.pages_served += 1
+        
+        response = {"data": data}
+        end = start + len(data)
+        if end < len(items):
+            response["paging"] = {"cursors": {"after": str(end)}, "next": f"https://graph.facebook.com/{id}/{connection_name}?after={end}"}
+        return response
+
+    def get_object(self, id, **args):
+        obj = self.objects.get(id)
+        self._serve()
+        if obj is None:
+            raise facebook.GraphAPIError({"error": {"message": "Unsupported get request", "code": 100}})
+        return dict(obj)
+
+    def request(self, path, args=None, post_args=None, files=None, method=None):
+        """Answer a batch request by running its GET operations against the fake"""
+        with self._lock:
+            self.batches += 1
+        responses = []
+        for operation in json.loads(post_args["batch"]):
+            url = urlparse(operation["relative_url"])
+            object_id, _, connection_name = url.path.partition("/")
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                if connection_name:
+                    body = self.get_connections(object_id, connection_name, **params)
+                else:
+                    body = self.get_object(object_id, **params)
+            except facebook.GraphAPIError as e:
+                responses.append({"code": 400, "body": json.dumps({"error": {"message": str(e), "code": e.code}})})
+                continue
+            responses.append({"code": 200, "body": json.dumps(body)})
+        return responses
+
+    def put_object(self, parent_object, connection_name, **data):
+        self._serve()
+        if connection_name:
+            with self._lock:
+                self._next_id += 1
+                new_id = f"{parent_object}_{self._next_id}"
+            return {"id": new_id}
+        self.objects[parent_object] = dict(self.objects.get(parent_object, {}), **data)
+        return {"success": True}
+
+    def delete_object(self, id):
+        self._serve()
+        self.objects.pop(id, None)
+        return {"success": True}
+
+
+class GraphStubServer:
+    """Local HTTP server that answers like the Graph API, for the async client
+
+    GET <id>/<connection> pages through connections the same way
+    FakeGraphAPI does; GET <id>/insights returns insights; POST and DELETE
+    succeed. Every request path is recorded in requests and every client
+    port in client_ports, so tests can check that connections are reused.
+    """
+
+    def __init__(self, connections=None, insights=None, delay=0):
+        self.connections = connections or {}
+        self.insights = insights or {"data": []}
+        self.delay = delay
+        self.requests = []
+        self.client_ports = set()
+        self.errors = {}
+        self._server = None
+
+    def start(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def _reply(self, body, status=200):
+                encoded = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+            
+            def _path(self):
+                stub.client_ports.add(self.client_address[1])
+                url = urlparse(self.path)
+                path = url.path.strip("/")
+                stub.requests.append((self.command, path))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                return path, {key: values[0] for key, values in parse_qs(url.query).items()}
+            
+            def do_GET(self):
+                path, params = self._path()
+                if path in stub.errors:
+                    self._reply({"error": stub.errors[path]}, 400)
+                    return
+                object_id, _, connection_name = path.partition("/")
+                if connection_name == "insights":
+                    self._reply(stub.insights)
+                    return
+                
+                items = stub.connections.get((object_id, connection_name), [])
+                start = int(params.get("after") or 0)
+                data = items[start:start + int(params.get("limit", 25))]
+                body = {"data": data}
+                if start + len(data) < len(items):
+                    body["paging"] = {"cursors": {"after": str(start + len(data))}, "next": self.path}
+                self._reply(body)
+            
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                path, _ = self._path()
+                self._reply({"id": f"{path.split('/')[0]}_new"})
+            
+            def do_DELETE(self):
+                self._path()
+                self._reply({"success": True})
+        
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,18 @@
+import sqlalchemy as sa
+from migrations import load_migrations
+from benchmarks.account_lookup import seed, lookup_plans
+
+
+def test_account_lookups_use_the_user_page_index(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/accounts.db")
+    with engine.connect() as connection:
+        with connection.begin():
+            for _, _, migration in load_migrations():
+                migration.upgrade(connection)
+            seed(connection, users=2000, pages_per_user=3)
+        
+        plans = lookup_plans(connection, 1000, "1003000")
+    engine.dispose()
+    
+    for name, (plan, indexed) in plans.items():
+        assert indexed, f"{name} does not use the index: {plan}"
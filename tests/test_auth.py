@@ -0,0 +1,98 @@
+import datetime
+import time
+import jwt
+import pytest
+from utils import auth
+from utils.db import create_user
+from config import JWT_SECRET, JWT_ALGORITHM
+
+
+@pytest.fixture
+def user(database):
+    user, _ = create_user("auth", "password", "auth@example.com")
+    yield user
+    _forget_process_state()
+
+
+def _forget_process_state():
+    """Start over like another process would: nothing verified, no revocations known"""
+    auth.verified_tokens.clear()
+    auth._revoked_tokens.clear()
+    auth._revoked_users.clear()
+    auth._revocations_checked = None
+
+
+def _token_issued_at(user, issued_at):
+    payload = {
+        "user_id": user.id,
+        "username": user.username,
+        "iat": issued_at,
+        "exp": issued_at + datetime.timedelta(hours=1)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def test_reruns_skip_decoding_a_verified_token(user, monkeypatch):
+    _forget_process_state()
+    token = auth.create_jwt_token(user.id, user.username)
+    assert auth.verify_jwt_token(token)["user_id"] == user.id
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("decoded a cached token")
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert auth.verify_jwt_token(token)["user_id"] == user.id
+
+
+def test_invalid_and_expired_tokens_are_rejected(user):
+    _forget_process_state()
+    expired = _token_issued_at(user, datetime.datetime.utcnow() - datetime.timedelta(hours=2))
+    
+    assert auth.verify_jwt_token("not a token") is None
+    assert auth.verify_jwt_token(expired) is None
+
+
+def test_logout_revokes_the_token_in_every_process(user):
+    _forget_process_state()
+    now = datetime.datetime.utcnow()
+    token = _token_issued_at(user, now - datetime.timedelta(minutes=2))
+    other = _token_issued_at(user, now - datetime.timedelta(minutes=1))
+    assert auth.verify_jwt_token(token) and auth.verify_jwt_token(other)
+    
+    auth.revoke_token(token)
+    assert auth.verify_jwt_token(token) is None
+    assert auth.verify_jwt_token(other)
+    
+    _forget_process_state()
+    assert auth.verify_jwt_token(token) is None
+    assert auth.verify_jwt_token(other)
+
+
+def test_password_change_revokes_tokens_issued_before_it(user):
+    _forget_process_state()
+    old = _token_issued_at(user, datetime.datetime.utcnow() - datetime.timedelta(minutes=1))
+    assert auth.verify_jwt_token(old)
+    
+    assert auth.revoke_user_tokens(user.id) is None
+    # Revocations have whole-second precision, so a token from the same second is revoked too
+    time.sleep(1.1)
+    new = auth.create_jwt_token(user.id, user.username)
+    assert auth.verify_jwt_token(old) is None
+    assert auth.verify_jwt_token(new)
+    
+    _forget_process_state()
+    assert auth.verify_jwt_token(old) is None
+    assert auth.verify_jwt_token(new)
+
+
+def test_revocations_from_other_processes_arrive_after_the_refresh_interval(user, monkeypatch):
+    _forget_process_state()
+    token = _token_issued_at(user, datetime.datetime.utcnow() - datetime.timedelta(minutes=1))
+    assert auth.verify_jwt_token(token)
+    
+    # Revoked by another process: only the database knows
+    auth.revoke_user_tokens(user.id)
+    auth._revoked_users.clear()
+    assert auth.verify_jwt_token(token)
+    
+    monkeypatch.setattr(auth, "_revocations_checked", time.time() - auth.TOKEN_REVOCATION_REFRESH - 1)
+    assert auth.verify_jwt_token(token) is None
@@ -0,0 +1,54 @@
+import datetime
+import facebook
+import pytest
+from fakes import FakeGraphAPI
+from utils.db import create_user, add_facebook_account, schedule_post, claim_scheduled_posts, get_scheduled_posts
+from config import DISPATCH_MAX_ATTEMPTS
+import dispatcher
+
+DISPATCHER_ID = "test-dispatcher"
+
+
+class FailingGraphAPI(FakeGraphAPI):
+    def put_object(self, parent_object, connection_name, **data):
+        self._serve()
+        raise facebook.GraphAPIError({"error": {"message": "Service temporarily unavailable", "code": 2}})
+
+
+@pytest.fixture
+def account(database):
+    user, _ = create_user("dispatcher", "password", "dispatcher@example.com")
+    account, _ = add_facebook_account(user.id, "Page", "1", "token")
+    schedule_post(account.id, "1", "hello", datetime.datetime.utcnow(), "key")
+    return account
+
+
+def _run_rounds(account, rounds):
+    """Publish the post once per round, claiming it again however far its retry was put off"""
+    for _ in range(rounds):
+        claimed = claim_scheduled_posts(DISPATCHER_ID, lookahead=10 ** 6)
+        assert len(claimed) == 1
+        dispatcher.publish(claimed[0], DISPATCHER_ID)
+    return get_scheduled_posts(account.id, statuses=("pending", "failed", "published"))[0]
+
+
+def test_rounds_failing_before_graph_count_as_attempts(account, monkeypatch):
+    monkeypatch.setattr(dispatcher, "get_account_api", lambda account_id, user_id: (None, None))
+    
+    post = _run_rounds(account, DISPATCH_MAX_ATTEMPTS - 1)
+    assert (post.status, post.attempts) == ("pending", DISPATCH_MAX_ATTEMPTS - 1)
+    
+    post = _run_rounds(account, 1)
+    assert (post.status, post.attempts) == ("failed", DISPATCH_MAX_ATTEMPTS)
+    assert post.last_error == "Account not found or access token missing"
+    assert claim_scheduled_posts(DISPATCHER_ID, lookahead=10 ** 6) == []
+
+
+def test_rounds_reaching_graph_count_once(account, monkeypatch):
+    api = FailingGraphAPI()
+    monkeypatch.setattr(dispatcher, "get_account_api", lambda account_id, user_id: (api, account))
+    
+    post = _run_rounds(account, DISPATCH_MAX_ATTEMPTS)
+    
+    assert (post.status, post.attempts) == ("failed", DISPATCH_MAX_ATTEMPTS)
+    assert api.calls == DISPATCH_MAX_ATTEMPTS + (DISPATCH_MAX_ATTEMPTS - 1)
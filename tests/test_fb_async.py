@@ -0,0 +1,130 @@
+import socket
+import threading
+import time
+import pytest
+from fakes import GraphStubServer, make_post, make_comment
+from utils import fb_api, fb_async
+from utils.cache import SQLiteCache
+from utils.fb_async import SyncGraphClient
+
+INSIGHTS = {"data": [
+    {"name": "page_fans", "values": [{"value": 5}, {"value": 7}]},
+    {"name": "page_impressions", "values": [{"value": 3}, {"value": 4}]}
+]}
+
+
+@pytest.fixture
+def stub():
+    server = GraphStubServer({
+        **{(page_id, "posts"): [make_post(page_id, i) for i in range(300)] for page_id in ("1", "2", "3", "4")},
+        ("1_0", "comments"): [make_comment("1_0", i) for i in range(30)]
+    }, insights=INSIGHTS).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(stub):
+    return SyncGraphClient("stub-token", base_url=stub.url)
+
+
+def test_posts_follow_graph_paging(stub, client):
+    posts, cursor = client.get_page_posts("1", max_items=250)
+    
+    assert [post.id for post in posts] == [f"1_{i}" for i in range(250)]
+    assert cursor == "250"
+    assert len(stub.requests) == 3
+    
+    rest, cursor = client.get_page_posts("1", max_items=100, after=cursor)
+    assert [post.id for post in rest] == [f"1_{i}" for i in range(250, 300)]
+    assert cursor is None
+
+
+def test_comments_and_insights(client):
+    comments, cursor = client.get_post_comments("1_0", max_items=10)
+    
+    assert [comment.id for comment in comments] == [f"0_{i}" for i in range(10)]
+    assert cursor is not None
+    assert client.get_page_insights("1") == {"page_fans": 7, "page_impressions": 7}
+
+
+def test_reads_are_cached_and_writes_invalidate(stub, client):
+    client.get_page_posts("1", max_items=10)
+    client.get_page_posts("1", max_items=10)
+    assert len(stub.requests) == 1
+    
+    post_id, error = client.create_post("1", "hello")
+    assert (post_id, error) == ("1_new", None)
+    
+    client.get_page_posts("1", max_items=10)
+    assert stub.requests[-1] == ("GET", "1/posts")
+    assert len(stub.requests) == 3
+
+
+def test_fan_out_runs_concurrently_over_kept_alive_connections(stub, client):
+    stub.delay = 0.2
+    page_ids = ["1", "2", "3", "4"]
+    
+    started = time.perf_counter()
+    results = client.get_many_page_posts(page_ids, max_items=10)
+    elapsed = time.perf_counter() - started
+    
+    assert set(results) == set(page_ids)
+    assert all(error is None and len(posts) == 10 for (posts, _), error in results.values())
+    assert elapsed < 0.2 * len(page_ids)
+    
+    # A second round reuses the pooled connections instead of opening new ones
+    connections = len(stub.client_ports)
+    client.get_many_page_posts(page_ids, max_items=20)
+    assert len(stub.client_ports) == connections
+
+
+def test_errors_are_reported_per_object(stub, client):
+    stub.errors["2/posts"] = {"message": "Unsupported get request", "type": "GraphMethodException", "code": 100}
+    
+    results = client.get_many_page_posts(["1", "2"], max_items=5)
+    
+    assert results["1"][1] is None
+    assert results["2"][0] is None
+    assert "Unsupported get request" in results["2"][1]
+
+
+def test_shared_cache_is_used_off_the_event_loop(stub, client, tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path / "cache.db"))
+    threads = set()
+    for name in ("get", "set", "invalidate"):
+        def record(*args, method=getattr(cache, name)):
+            threads.add(threading.current_thread().name)
+            return method(*args)
+        monkeypatch.setattr(cache, name, record)
+    monkeypatch.setattr(fb_api, "graph_cache", cache)
+    monkeypatch.setattr(fb_async, "graph_cache", cache)
+    
+    client.get_page_posts("1", max_items=10)
+    client.get_page_posts("1", max_items=10)
+    client.create_post("1", "hello")
+    
+    assert len(stub.requests) == 2
+    assert threads and "graph-async" not in threads
+
+
+def test_comment_writes_drop_cached_post_lists(stub, client):
+    client.get_page_posts("1", max_items=10)
+    
+    assert client.delete_comment("0_3") == (True, None)
+    client.get_page_posts("1", max_items=10)
+    
+    assert stub.requests[-1] == ("GET", "1/posts")
+    assert len(stub.requests) == 3
+
+
+def test_unreachable_graph_is_reported_as_an_error():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    client = SyncGraphClient("stub-token", base_url=f"http://127.0.0.1:{port}/")
+    
+    post_id, error = client.create_post("1", "hello")
+    assert post_id is None
+    assert error.startswith("Connection failed")
+    assert client.delete_comment("0_3")[0] is False
@@ -0,0 +1,31 @@
+import pandas as pd
+from utils.fb_api import shorten_text, format_created_time, format_comment_data, format_post_data, parse_posts
+from fakes import make_post, make_comments
+
+
+def test_shorten_text_marks_only_cut_messages():
+    short = shorten_text(pd.Series(["short", "x" * 50, "y" * 51, None]))
+    
+    assert short.tolist() == ["short", "x" * 50, "y" * 50 + "...", ""]
+
+
+def test_format_created_time():
+    formatted = format_created_time(pd.Series(["2024-03-05T07:08:09+0000", None, "not a time"]))
+    
+    assert formatted.tolist() == ["2024-03-05 07:08", "", ""]
+
+
+def test_format_comment_data():
+    df = format_comment_data(make_comments(3))
+    
+    assert df["id"].tolist() == ["1_0", "1_1", "1_2"]
+    assert df["short_message"].tolist()[1:] == ["comment 1", "comment 2"]
+    assert df["short_message"][0].endswith("...")
+    assert df["created_time"][0] == "2024-01-01 00:00"
+
+
+def test_format_post_data_adds_engagement():
+    df = format_post_data(parse_posts([make_post("1", 4)], profile="dashboard"))
+    
+    assert df["engagement"].tolist() == [4 % 5 + 4 % 7 + 4 % 3]
+    assert df["short_message"].tolist() == ["post 4"]
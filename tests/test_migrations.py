@@ -0,0 +1,81 @@
+import pytest
+import sqlalchemy as sa
+import migrations
+from utils.db import Base
+
+# Full-text search tables (and their FTS5 shadow tables) are not described by the models,
+# nor is the column the SQLite ones are keyed on
+SEARCH_TABLES = ("post_search", "comment_search")
+SEARCH_KEY = "search_rowid"
+
+
+@pytest.fixture
+def connection(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/migrations.db")
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+
+def apply(connection, after=0):
+    for version, _, module in migrations.load_migrations():
+        if version > after:
+            with connection.begin():
+                module.upgrade(connection)
+
+
+def schema(inspector, tables):
+    indexes = {
+        (table, index["name"], tuple(index["column_names"]), bool(index["unique"]))
+        for table in tables
+        for index in inspector.get_indexes(table)
+        if SEARCH_KEY not in index["column_names"]
+    }
+    constraints = {
+        (table, constraint["name"], tuple(constraint["column_names"]))
+        for table in tables
+        for constraint in inspector.get_unique_constraints(table)
+    }
+    columns = {
+        (table, column["name"], column["nullable"])
+        for table in tables
+        for column in inspector.get_columns(table)
+        if column["name"] != SEARCH_KEY
+    }
+    return columns, indexes, constraints
+
+
+def test_migrations_build_the_schema_of_the_models(connection, tmp_path):
+    apply(connection)
+    
+    expected = sa.create_engine(f"sqlite:///{tmp_path}/models.db")
+    Base.metadata.create_all(expected)
+    tables = {table.name for table in Base.metadata.sorted_tables} - {"schema_version"}
+    
+    migrated = sa.inspect(connection)
+    assert {name for name in migrated.get_table_names() if not name.startswith(SEARCH_TABLES)} == tables
+    assert schema(migrated, tables) == schema(sa.inspect(expected), tables)
+    expected.dispose()
+
+
+def test_baseline_databases_upgrade(connection):
+    # A database the app created before migrations existed
+    migrations.load_migrations()[0][2].metadata.create_all(connection)
+    connection.commit()
+    
+    apply(connection)
+    
+    inspector = sa.inspect(connection)
+    assert "sync_priority" in {column["name"] for column in inspector.get_columns("facebook_accounts")}
+    assert "uq_facebook_accounts_user_page" in {index["name"] for index in inspector.get_indexes("facebook_accounts")}
+
+
+def test_duplicate_accounts_stop_the_unique_index(connection):
+    version, _, baseline = migrations.load_migrations()[0]
+    with connection.begin():
+        baseline.upgrade(connection)
+        for _ in range(2):
+            connection.execute(sa.text("INSERT INTO facebook_accounts (user_id, page_id) VALUES (1, '100')"))
+    
+    with pytest.raises(RuntimeError, match="user 1 page 100"):
+        apply(connection, after=version)
@@ -0,0 +1,98 @@
+from fakes import FakeGraphAPI, make_post, make_comment
+from utils import fb_api
+
+
+def fake_page(posts=0, comments=0):
+    return FakeGraphAPI({
+        ("1", "posts"): [make_post("1", i) for i in range(posts)],
+        ("1_0", "comments"): [make_comment("1_0", i) for i in range(comments)]
+    })
+
+
+def test_page_posts_fetch_only_what_is_asked_for():
+    api = fake_page(posts=5000)
+    
+    posts, cursor = fb_api.get_page_posts(api, "1", max_items=10)
+    
+    assert [post.id for post in posts] == [f"1_{i}" for i in range(10)]
+    assert api.pages_served == 1
+    assert cursor is not None
+
+
+def test_page_posts_larger_than_one_graph_page():
+    api = fake_page(posts=5000)
+    
+    posts, _ = fb_api.get_page_posts(api, "1", max_items=250)
+    
+    assert len(posts) == 250
+    # 100 + 100 + 50: the last request asks only for what is still missing
+    assert api.pages_served == 3
+
+
+def test_page_posts_resume_after_cursor():
+    api = fake_page(posts=30)
+    
+    first, cursor = fb_api.get_page_posts(api, "1", max_items=10)
+    second, cursor = fb_api.get_page_posts(api, "1", max_items=10, after=cursor)
+    
+    assert [post.id for post in second] == [f"1_{i}" for i in range(10, 20)]
+    assert not {post.id for post in first} & {post.id for post in second}
+    assert api.pages_served == 2
+
+
+def test_page_posts_end_without_cursor():
+    api = fake_page(posts=7)
+    
+    posts, cursor = fb_api.get_page_posts(api, "1", max_items=25)
+    
+    assert len(posts) == 7
+    assert cursor is None
+    assert api.pages_served == 1
+
+
+def test_iter_page_posts_stops_when_the_caller_does():
+    api = fake_page(posts=5000)
+    
+    pages = fb_api.iter_page_posts(api, "1", page_size=25)
+    next(pages)
+    next(pages)
+    
+    assert api.pages_served == 2
+
+
+def test_iter_page_posts_respects_max_items():
+    api = fake_page(posts=5000)
+    
+    posts = [post for page, _ in fb_api.iter_page_posts(api, "1", max_items=60, page_size=25) for post in page]
+    
+    assert len(posts) == 60
+    assert api.pages_served == 3
+
+
+def test_post_comments_fetch_only_what_is_asked_for():
+    api = fake_page(comments=1000)
+    
+    comments, cursor = fb_api.get_post_comments(api, "1_0", max_items=40)
+    more, cursor = fb_api.get_post_comments(api, "1_0", max_items=40, after=cursor)
+    
+    assert [comment.id for comment in comments + more] == [f"0_{i}" for i in range(80)]
+    assert comments[0].from_name == "user 0"
+    assert api.pages_served == 2
+    assert cursor is not None
+
+
+def test_comment_writes_drop_cached_post_lists():
+    api = fake_page(posts=10)
+    fb_api.get_page_posts(api, "1", max_items=10)
+    fb_api.get_page_posts(api, "1", max_items=10)
+    assert api.pages_served == 1
+    
+    # Comment ids start with their post's id, not the page's
+    reply_id, error = fb_api.reply_to_comment(api, "5_1", "thanks")
+    assert error is None
+    fb_api.get_page_posts(api, "1", max_items=10)
+    assert api.pages_served == 2
+    
+    assert fb_api.delete_comment(api, "7_2") == (True, None)
+    fb_api.get_page_posts(api, "1", max_items=10)
+    assert api.pages_served == 3
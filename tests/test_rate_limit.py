@@ -0,0 +1,28 @@
+import pytest
+from utils.rate_limit import RateLimitScheduler, RateLimitedError
+
+
+def test_rejected_calls_do_not_deepen_the_wait():
+    scheduler = RateLimitScheduler(rate=10, slowdown_at=75, max_wait=0)
+    scheduler.record_headers({"x-app-usage": '{"call_count": 99}'})
+    calls = []
+    
+    for _ in range(10):
+        scheduler.call(None, calls.append, 1)
+    with pytest.raises(RateLimitedError) as first:
+        scheduler.call(None, calls.append, 1)
+    for _ in range(300):
+        with pytest.raises(RateLimitedError) as last:
+            scheduler.call(None, calls.append, 1)
+    
+    # Nothing was sent, and each rejected call gave its token back
+    assert len(calls) == 10
+    assert last.value.retry_after <= first.value.retry_after
+
+
+def test_reserve_within_max_wait_takes_a_token():
+    scheduler = RateLimitScheduler(rate=1)
+    
+    assert scheduler.reserve("1", max_wait=5) == 0
+    assert 0 < scheduler.reserve("1", max_wait=5) <= 1
+    assert 1 < scheduler.reserve("1", max_wait=5) <= 2
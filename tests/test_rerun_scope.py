@@ -0,0 +1,48 @@
+import pytest
+from utils.db import (
+    rerun_scope, get_rerun_stats, pool_metrics, create_user, get_user_by_id,
+    get_user_accounts, add_facebook_account, update_facebook_account
+)
+from utils.fb_api import get_account_api
+
+
+@pytest.fixture
+def account(database):
+    user, error = create_user("rerun", "password", "rerun@example.com")
+    assert error is None
+    account, error = add_facebook_account(user.id, "Page", "100", "token")
+    assert error is None
+    return account
+
+
+def test_rerun_reads_each_row_once_over_one_connection(account):
+    checkouts = pool_metrics.snapshot()["checkouts"]
+    
+    with rerun_scope():
+        # Sidebar, page and get_account_api all ask for the same rows
+        get_user_by_id(account.user_id)
+        get_user_accounts(account.user_id)
+        get_user_accounts(account.user_id)
+        get_account_api(account.id, account.user_id)
+        get_user_by_id(account.user_id)
+        assert get_rerun_stats()["current_queries"] == 2
+    
+    assert pool_metrics.snapshot()["checkouts"] == checkouts + 1
+    assert get_rerun_stats()["last_queries"] == 2
+
+
+def test_writes_drop_memoized_reads(account):
+    with rerun_scope():
+        assert get_user_accounts(account.user_id)[0].account_name == "Page"
+        update_facebook_account(account.id, account_name="Renamed")
+        assert get_user_accounts(account.user_id)[0].account_name == "Renamed"
+
+
+def test_reads_outside_a_rerun_are_not_memoized(account):
+    checkouts = pool_metrics.snapshot()["checkouts"]
+    
+    get_user_accounts(account.user_id)
+    get_user_accounts(account.user_id)
+    
+    assert get_rerun_stats()["current_queries"] is None
+    assert pool_metrics.snapshot()["checkouts"] == checkouts + 2
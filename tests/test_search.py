@@ -0,0 +1,40 @@
+import sqlalchemy as sa
+from fakes import make_post
+from utils.fb_api import parse_posts
+from utils.db import upsert_posts, delete_stored_post, update_stored_post, search_stored_messages
+
+
+def vacuum(database):
+    """VACUUM, renumbering the implicit rowids of the posts as it is allowed to
+
+    Recent SQLite versions mostly keep them, so the renumbering is done by
+    hand, reversing their order so a stale index would find the wrong posts.
+    """
+    with database.engine.begin() as connection:
+        top = connection.execute(sa.text("SELECT MAX(rowid) FROM facebook_posts")).scalar()
+        connection.execute(sa.text("UPDATE facebook_posts SET rowid = -rowid"))
+        connection.execute(sa.text("UPDATE facebook_posts SET rowid = rowid + :top + 1"), {"top": top})
+    with database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(sa.text("VACUUM"))
+
+
+def test_search_results_survive_a_vacuum(database):
+    posts = parse_posts([dict(make_post("1", i), message=f"post {i} word{i}") for i in range(6)])
+    assert upsert_posts("1", posts) == (6, None)
+    # Gaps in the implicit rowids are what VACUUM closes up
+    for i in (0, 2):
+        delete_stored_post(f"1_{i}")
+    
+    vacuum(database)
+    
+    for i in (1, 3, 4, 5):
+        hits, _ = search_stored_messages(["1"], f"word{i}", kind="posts")
+        assert [hit.id for hit in hits] == [f"1_{i}"]
+    assert search_stored_messages(["1"], "word0", kind="posts") == ([], False)
+    
+    # Writes after the vacuum keep the index in step
+    upsert_posts("1", parse_posts([dict(make_post("1", 9), message="post 9 word9")]))
+    update_stored_post("1_3", "edited")
+    assert [hit.id for hit in search_stored_messages(["1"], "word9", kind="posts")[0]] == ["1_9"]
+    assert search_stored_messages(["1"], "word3", kind="posts") == ([], False)
+    assert [hit.id for hit in search_stored_messages(["1"], "edited", kind="posts")[0]] == ["1_3"]
@@ -0,0 +1,95 @@
+import threading
+import time
+import facebook
+import pytest
+from fakes import FakeGraphAPI, make_post
+from utils import fb_api
+from utils.cache import SingleFlight
+
+READERS = 20
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _read_at_once(read, count):
+    """Run read on count threads started together, returning (results, errors)"""
+    barrier = threading.Barrier(count)
+    results, errors = [], []
+    
+    def reader():
+        barrier.wait()
+        try:
+            results.append(read())
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=reader) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+@pytest.fixture
+def api():
+    api = FakeGraphAPI(delay=0.2)
+    api.objects["1_1"] = make_post("1", 1)
+    return api
+
+
+def test_concurrent_reads_share_one_graph_call(api):
+    results, errors = _read_at_once(lambda: fb_api.get_post_details(api, "1_1"), READERS)
+    
+    assert not errors
+    assert [post.message for post in results] == [make_post("1", 1)["message"]] * READERS
+    assert api.calls == 1
+    
+    fb_api.get_post_details(api, "1_1")
+    assert api.calls == 1
+
+
+def test_concurrent_readers_share_the_error(api):
+    _, errors = _read_at_once(lambda: fb_api.get_post_details(api, "1_2"), READERS)
+    
+    assert len(errors) == READERS
+    assert all(isinstance(error, facebook.GraphAPIError) for error in errors)
+    assert api.calls == 1
+
+
+def test_read_overlapping_a_write_is_not_cached(api):
+    reader = threading.Thread(target=fb_api.get_post_details, args=(api, "1_1"))
+    reader.start()
+    _wait_for(lambda: api.calls == 1)
+    
+    # The read already has the old message and is waiting on the network
+    api.delay = 0
+    assert fb_api.edit_post(api, "1_1", "edited") == (True, None)
+    reader.join()
+    
+    assert fb_api.get_post_details(api, "1_1").message == "edited"
+
+
+def test_forget_waits_for_a_result_being_stored():
+    flights = SingleFlight()
+    storing = threading.Event()
+    stored = []
+    
+    def store(value):
+        storing.set()
+        time.sleep(0.1)
+        stored.append(value)
+    
+    caller = threading.Thread(target=flights.do, args=("key", lambda: 1, ["tag"], store))
+    caller.start()
+    assert storing.wait(timeout=5)
+    flights.forget("tag")
+    
+    # Whatever store wrote is in place before forget returns, so an invalidation after it wins
+    assert stored == [1]
+    caller.join()
@@ -0,0 +1,106 @@
+import http.client
+import threading
+import pytest
+import webhooks
+from utils import webhooks as feed
+from utils.webhooks import FeedBatcher, sign_payload
+
+
+class Batcher:
+    def __init__(self):
+        self.events = []
+
+    def submit(self, events):
+        self.events.extend(events)
+
+    def stats(self):
+        return {"received": len(self.events)}
+
+
+@pytest.fixture
+def server():
+    server = webhooks.ThreadingHTTPServer(("127.0.0.1", 0), webhooks.WebhookHandler)
+    server.daemon_threads = True
+    server.batcher = Batcher()
+    server.recorder = None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(connection, body):
+    connection.request("POST", "/", body=body, headers={
+        "Content-Type": "application/json",
+        "X-Hub-Signature-256": sign_payload(body, webhooks.FACEBOOK_APP_SECRET)
+    })
+    response = connection.getresponse()
+    response.read()
+    return response
+
+
+def test_signed_deliveries_share_a_kept_alive_connection(server):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    body = b'{"object": "page", "entry": [{"id": "1", "changes": [{"field": "feed", "value": {"item": "status", "verb": "add", "post_id": "1_2"}}]}]}'
+    
+    first = post(connection, body)
+    second = post(connection, body)
+    
+    assert (first.status, second.status) == (200, 200)
+    assert not second.will_close
+    assert len(server.batcher.events) == 2
+
+
+def test_oversized_body_closes_the_connection(server, monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_MAX_BODY", 10)
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    
+    response = post(connection, b'{"object": "page", "entry": []}')
+    
+    assert response.status == 413
+    assert response.will_close
+    assert server.batcher.events == []
+
+
+def test_bad_signature_is_rejected(server):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    connection.request("POST", "/", body=b"{}", headers={"X-Hub-Signature-256": "sha256=00"})
+    
+    assert connection.getresponse().status == 403
+
+
+def test_stats_need_the_verify_token(server, monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_VERIFY_TOKEN", "verify-me")
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+    
+    statuses = []
+    for path in ("/stats", "/stats?hub.verify_token=wrong", "/stats?hub.verify_token=verify-me"):
+        connection.request("GET", path)
+        response = connection.getresponse()
+        statuses.append((response.status, response.read()))
+    
+    assert statuses == [(403, b""), (403, b""), (200, b'{"received": 0}')]
+
+
+def test_batch_is_kept_until_the_database_takes_it(monkeypatch):
+    written = []
+    calls = []
+    
+    def apply_feed_events(batch, coalesce):
+        calls.append(len(batch))
+        if len(calls) <= 2 * feed.FLUSH_ATTEMPTS:
+            return 0, "database is unavailable"
+        written.extend(batch)
+        return len(batch), None
+    monkeypatch.setattr(feed, "apply_feed_events", apply_feed_events)
+    monkeypatch.setattr(feed, "prune_webhook_events", lambda before: None)
+    monkeypatch.setattr(feed, "RETRY_BASE", 0.01)
+    
+    batcher = FeedBatcher(batch_size=10, flush_interval=0.01).start()
+    events = [(f"key{i}", "1", {"item": "status", "verb": "add", "post_id": f"1_{i}"}) for i in range(5)]
+    batcher.submit(events)
+    batcher.stop(timeout=5)
+    
+    assert written == events
+    stats = batcher.stats()
+    assert (stats["applied"], stats["errors"], stats["retrying"]) == (5, 2, 0)
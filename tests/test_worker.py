@@ -0,0 +1,71 @@
+import pytest
+from fakes import FakeGraphAPI, make_post, make_comment
+from utils import sync
+from utils.db import (
+    create_user, add_facebook_account, schedule_sync_jobs, get_sync_jobs, upsert_posts,
+    query_stored_comments, get_comment_sync_requests
+)
+from utils.fb_api import parse_posts
+import worker
+
+POSTS = 30
+
+
+@pytest.fixture
+def account(database, monkeypatch):
+    monkeypatch.setattr(sync, "background_sync", lambda: True)
+    user, _ = create_user("worker", "password", "worker@example.com")
+    account, _ = add_facebook_account(user.id, "Page", "1", "token")
+    schedule_sync_jobs()
+    upsert_posts("1", parse_posts([make_post("1", i) for i in range(POSTS)]))
+    return account
+
+
+@pytest.fixture
+def api():
+    return FakeGraphAPI({
+        (f"1_{i}", "comments"): [make_comment(f"1_{i}", n) for n in range(3)] for i in range(POSTS)
+    })
+
+
+def test_comments_job_syncs_the_newest_posts(account, api):
+    synced, error = worker.sync_comments_job(api, account)
+    
+    assert error is None
+    assert synced == 3 * worker.WORKER_COMMENT_POSTS
+    _, total = query_stored_comments("1_0")
+    assert total == 0
+
+
+def test_comments_job_fetches_first_pages_in_one_batch(account, api):
+    api.connections[("1_29", "comments")] = [make_comment("1_29", n) for n in range(60)]
+    
+    synced, error = worker.sync_comments_job(api, account)
+    
+    assert error is None
+    assert api.batches == 1
+    # Only the post with more comments than a batched page holds fetched on by itself
+    assert api.pages_served == worker.WORKER_COMMENT_POSTS + 2
+    _, total = query_stored_comments("1_29")
+    assert total == 60
+
+
+def test_opened_older_post_is_synced_by_the_next_job(account, api):
+    # The oldest stored post is outside the worker's regular comments sync
+    assert sync.queue_unsynced_comments(account, "1_0")
+    assert get_comment_sync_requests(account.id) == ["1_0"]
+    assert get_sync_jobs(account.id)["comments"].run_at is not None
+    
+    synced, error = worker.sync_comments_job(api, account)
+    
+    assert error is None
+    _, total = query_stored_comments("1_0")
+    assert total == 3
+    assert get_comment_sync_requests(account.id) == []
+    assert not sync.queue_unsynced_comments(account, "1_0")
+
+
+def test_refresh_queues_the_selected_post(account, api):
+    sync.refresh_comments(api, account, "1_5")
+    
+    assert get_comment_sync_requests(account.id) == ["1_5"]
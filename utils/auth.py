@@ -1,18 +1,88 @@
 import streamlit as st
 import jwt
-import bcrypt
 import datetime
-from utils.db import get_user_by_username, create_user, update_password
-from config import JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRATION
+import hashlib
+import threading
+import time
+from utils.cache import TTLCache
+from utils.db import (
+    get_user_by_username, get_user_by_id, create_user, update_password,
+    revoke_tokens, get_token_revocations
+)
+from utils.passwords import check_password, needs_rehash
+from config import (
+    JWT_SECRET, JWT_ALGORITHM, JWT_EXPIRATION, TOKEN_CACHE_MAX_ENTRIES, TOKEN_REVOCATION_REFRESH
+)
+
+# Payloads of the tokens this process has verified, keyed by token digest, each kept
+# until the token itself expires, so reruns skip the signature check
+verified_tokens = TTLCache(max_entries=TOKEN_CACHE_MAX_ENTRIES)
+
+# Revocations known to this process: digest -> expiry for single tokens, user id ->
+# latest revocation time for all of a user's tokens. Refreshed from the database
+# at most every TOKEN_REVOCATION_REFRESH seconds, so a click costs no query.
+_revoked_tokens = {}
+_revoked_users = {}
+_revocations_checked = None
+_revocations_lock = threading.Lock()
+
+# Overlap between revocation refreshes, covering rows committed late by a slow transaction
+REVOCATION_REFRESH_OVERLAP = 60
+
+
+def _token_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _epoch(value):
+    """Unix time of a naive UTC datetime"""
+    return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _remember_revocation(user_id, token_hash, revoked_at, expires_at):
+    if token_hash:
+        _revoked_tokens[token_hash] = _epoch(expires_at)
+    else:
+        _revoked_users[user_id] = max(_revoked_users.get(user_id, 0), _epoch(revoked_at))
+
+
+def _refresh_revocations():
+    """Pick up revocations made by other processes since the last refresh"""
+    global _revocations_checked
+    with _revocations_lock:
+        now = time.time()
+        if _revocations_checked is not None and now - _revocations_checked < TOKEN_REVOCATION_REFRESH:
+            return
+        
+        since = None
+        if _revocations_checked is not None:
+            since = datetime.datetime.utcfromtimestamp(_revocations_checked - REVOCATION_REFRESH_OVERLAP)
+        revocations, error = get_token_revocations(since)
+        # On a failed read, keep what is known and retry after the next interval
+        _revocations_checked = now
+        if error:
+            return
+        
+        for revocation in revocations:
+            _remember_revocation(*revocation)
+        for token_hash in [token_hash for token_hash, expires in _revoked_tokens.items() if expires < now]:
+            del _revoked_tokens[token_hash]
+
+
+def _is_revoked(digest, payload):
+    # Tokens from before "iat" was added count as issued at the epoch
+    return digest in _revoked_tokens or payload.get("iat", 0) <= _revoked_users.get(payload["user_id"], -1)
 
 
 def create_jwt_token(user_id, username):
     """Create a JWT token for the authenticated user"""
     try:
+        now = datetime.datetime.utcnow()
         payload = {
             "user_id": user_id,
             "username": username,
-            "exp": datetime.datetime.utcnow() + datetime.timedelta(seconds=JWT_EXPIRATION)
+            "iat": now,
+            "exp": now + datetime.timedelta(seconds=JWT_EXPIRATION)
         }
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         return token
@@ -22,17 +92,49 @@ def create_jwt_token(user_id, username):
 
 
 def verify_jwt_token(token):
-    """Verify the JWT token and return the payload if valid"""
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-    except Exception as e:
-        st.error(f"Error verifying JWT token: {str(e)}")
+    """Verify the JWT token and return the payload if valid and not revoked"""
+    digest = _token_digest(token)
+    found, payload = verified_tokens.get(digest)
+    
+    if not found:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+        except Exception as e:
+            st.error(f"Error verifying JWT token: {str(e)}")
+            return None
+        verified_tokens.set(digest, payload, payload.get("exp", time.time() + JWT_EXPIRATION) - time.time())
+    
+    _refresh_revocations()
+    if _is_revoked(digest, payload):
         return None
+    return payload
+
+
+def revoke_token(token):
+    """Invalidate one session token in every process, e.g. on logout"""
+    payload = verify_jwt_token(token)
+    if not payload:
+        return
+    
+    expires_at = datetime.datetime.utcfromtimestamp(payload["exp"])
+    revoked_at, error = revoke_tokens(payload["user_id"], expires_at, token_hash=_token_digest(token))
+    if not error:
+        with _revocations_lock:
+            _remember_revocation(payload["user_id"], _token_digest(token), revoked_at, expires_at)
+
+
+def revoke_user_tokens(user_id):
+    """Invalidate every session token issued to a user so far, e.g. on a password change"""
+    expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=JWT_EXPIRATION)
+    revoked_at, error = revoke_tokens(user_id, expires_at)
+    if not error:
+        with _revocations_lock:
+            _remember_revocation(user_id, None, revoked_at, expires_at)
+    return error
 
 
 def login(username, password):
@@ -44,11 +146,15 @@ def login(username, password):
     
     # Verify password
     try:
-        if not bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
+        if not check_password(password, user.password_hash):
             return False, "Invalid username or password"
     except Exception as e:
         return False, f"Authentication error: {str(e)}"
     
+    # Bring the stored hash to the configured cost while the plain password is at hand
+    if needs_rehash(user.password_hash):
+        update_password(user.id, password)
+    
     # Create JWT token
     token = create_jwt_token(user.id, user.username)
     
@@ -65,7 +171,10 @@ def login(username, password):
 
 
 def logout():
-    """Clear the user session"""
+    """Clear the user session and revoke its token"""
+    if st.session_state.get("token"):
+        revoke_token(st.session_state["token"])
+    
     for key in ["authenticated", "user_id", "username", "token"]:
         if key in st.session_state:
             del st.session_state[key]
@@ -122,11 +231,11 @@ def register_user(username, password, email):
 
 def change_password(user_id, current_password, new_password):
     """Change user password"""
-    user = get_user_by_username(st.session_state["username"])
+    user = get_user_by_id(user_id)
     
     # Verify current password
     try:
-        if not bcrypt.checkpw(current_password.encode('utf-8'), user.password_hash.encode('utf-8')):
+        if not check_password(current_password, user.password_hash):
             return False, "Current password is incorrect"
     except Exception as e:
         return False, f"Password verification error: {str(e)}"
@@ -140,6 +249,9 @@ def change_password(user_id, current_password, new_password):
     if not success:
         return False, error
     
+    # Sign out sessions elsewhere that were opened with the old password
+    revoke_user_tokens(user_id)
+    
     return True, None
 
 
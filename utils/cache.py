@@ -0,0 +1,437 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache backends share one interface: get(key) -> (found, value), set(key, value,
+# ttl, tags), invalidate(*tags), clear(), ttl_for(endpoint) and stats(). Keys are
+# tuples of JSON-compatible values. TTLCache keeps values in this process; the
+# shared backends store them as JSON, so every replica reads what one fetched.
+# Values that are not JSON-compatible are simply not shared.
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-endpoint TTL
+
+    Entries carry tags so writes can drop exactly the reads they affect.
+    """
+
+    def __init__(self, max_entries=512, ttls=None, default_ttl=60):
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key):
+        """Return (found, value) for key, dropping it if it has expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        tags = set(tags)
+        with self._lock:
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "backend": "memory"
+            }
+
+
+class _Flight:
+    def __init__(self, tags):
+        self.tags = frozenset(tags)
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Set by forget(); the lock orders it against storing the result
+        self.stale = False
+        self.lock = threading.Lock()
+
+
+class SingleFlight:
+    """Share one call among concurrent callers asking for the same key
+
+    The first caller runs the call; callers arriving while it runs wait
+    and get its result, or its exception. forget() detaches in-flight
+    calls by tag, so callers arriving after a write start a fresh call
+    instead of joining one that may return what the write changed. It
+    also marks them stale, so their result is never passed to store.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, call, tags=(), store=None):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(tags)
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = call()
+            if store is not None:
+                with flight.lock:
+                    if not flight.stale:
+                        store(flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def forget(self, *tags):
+        """Stop new callers from joining in-flight calls carrying any of the given tags
+
+        Returns once none of those calls can store its result anymore, so
+        an invalidation that follows cannot be undone by one of them.
+        """
+        tags = set(tags)
+        with self._lock:
+            keys = [key for key, flight in self._flights.items() if flight.tags & tags]
+            flights = [self._flights.pop(key) for key in keys]
+        for flight in flights:
+            with flight.lock:
+                flight.stale = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights)
+            }
+
+
+def _shared_key(key):
+    """Fixed-length string form of a tuple cache key"""
+    return hashlib.sha1(json.dumps(key, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _encode(value):
+    """JSON text of value, or None when it cannot be shared"""
+    try:
+        return json.dumps(value, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+
+class SQLiteCache:
+    """Cache in a SQLite file shared by the app processes of one host
+
+    Entries expire by wall-clock time, since the processes do not share a
+    monotonic clock. Expired entries, and the oldest ones beyond
+    max_entries, are pruned every PRUNE_EVERY writes. A failing database
+    reads as a miss and is counted in the stats.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, path, max_entries=512, ttls=None, default_ttl=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.errors = 0
+        
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))")
+            db.execute("CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key)")
+
+    def _connection(self):
+        # sqlite3 connections must stay on the thread that opened them
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key):
+        """Return (found, value) for key, dropping it if it has expired"""
+        try:
+            db = self._connection()
+            row = db.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (_shared_key(key),)).fetchone()
+        except sqlite3.Error:
+            self._count("errors")
+            row = None
+        
+        if row is None or row[1] <= time.time():
+            self._count("misses")
+            return False, None
+        self._count("hits")
+        return True, json.loads(row[0])
+
+    def set(self, key, value, ttl, tags=()):
+        data = _encode(value)
+        if data is None:
+            return
+        
+        key = _shared_key(key)
+        try:
+            with self._connection() as db:
+                db.execute("INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?)", (key, data, time.time() + ttl))
+                db.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+                db.executemany("INSERT OR IGNORE INTO cache_tags VALUES (?, ?)", [(tag, key) for tag in tags])
+        except sqlite3.Error:
+            self._count("errors")
+            return
+        
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired entries, then the soonest to expire beyond max_entries"""
+        try:
+            with self._connection() as db:
+                db.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+                evicted = db.execute(
+                    "DELETE FROM cache_entries WHERE key IN "
+                    "(SELECT key FROM cache_entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+                db.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)")
+            self._count("evictions", evicted)
+        except sqlite3.Error:
+            self._count("errors")
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        if not tags:
+            return 0
+        marks = ",".join("?" * len(tags))
+        try:
+            with self._connection() as db:
+                dropped = db.execute(
+                    f"DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_tags WHERE tag IN ({marks}))", tags
+                ).rowcount
+                db.execute(f"DELETE FROM cache_tags WHERE tag IN ({marks})", tags)
+        except sqlite3.Error:
+            self._count("errors")
+            return 0
+        self._count("invalidations", dropped)
+        return dropped
+
+    def clear(self):
+        with self._connection() as db:
+            db.execute("DELETE FROM cache_entries")
+            db.execute("DELETE FROM cache_tags")
+
+    def stats(self):
+        try:
+            entries = self._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+                "backend": "sqlite"
+            }
+
+
+class RedisCache:
+    """Cache in Redis (or anything speaking its protocol) shared by every replica
+
+    Entries expire through Redis TTLs and each tag is a set of the keys
+    carrying it. Redis' own maxmemory policy bounds the size. A failing
+    server reads as a miss and is counted in the stats. Needs the redis
+    package.
+    """
+
+    def __init__(self, url, ttls=None, default_ttl=60, prefix="fbcm:cache:"):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self._redis_error = redis.RedisError
+        self.prefix = prefix
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _tag_key(self, tag):
+        return f"{self.prefix}tag:{tag}"
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key):
+        """Return (found, value) for key"""
+        try:
+            data = self.client.get(self.prefix + _shared_key(key))
+        except self._redis_error:
+            self._count("errors")
+            data = None
+        
+        if data is None:
+            self._count("misses")
+            return False, None
+        self._count("hits")
+        return True, json.loads(data)
+
+    def set(self, key, value, ttl, tags=()):
+        data = _encode(value)
+        if data is None:
+            return
+        
+        key = self.prefix + _shared_key(key)
+        # Tag sets outlive their longest entry, so an invalidation always finds it
+        tag_ttl = max([ttl, self.default_ttl, *self.ttls.values()])
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(key, data, px=max(int(ttl * 1000), 1))
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), key)
+                pipe.expire(self._tag_key(tag), int(tag_ttl) + 1)
+            pipe.execute()
+        except self._redis_error:
+            self._count("errors")
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        if not tags:
+            return 0
+        try:
+            tag_keys = [self._tag_key(tag) for tag in tags]
+            pipe = self.client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            keys = set().union(*pipe.execute())
+            
+            pipe = self.client.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*keys)
+            pipe.delete(*tag_keys)
+            dropped = pipe.execute()[0] if keys else 0
+        except self._redis_error:
+            self._count("errors")
+            return 0
+        self._count("invalidations", dropped)
+        return dropped
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*", count=500):
+            self.client.delete(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": None,
+                "max_entries": None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": 0,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+                "backend": "redis"
+            }
+
+
+def create_cache(backend="memory", url="", max_entries=512, ttls=None, default_ttl=60):
+    """Cache backend by name: "memory" (per process), "sqlite" (file at url) or "redis" (url)"""
+    if backend == "sqlite":
+        return SQLiteCache(url, max_entries=max_entries, ttls=ttls, default_ttl=default_ttl)
+    if backend == "redis":
+        return RedisCache(url, ttls=ttls, default_ttl=default_ttl)
+    return TTLCache(max_entries=max_entries, ttls=ttls, default_ttl=default_ttl)
@@ -3,16 +3,184 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 import pandas as pd
 import streamlit as st
-from config import DATABASE_URL
-import bcrypt
+from config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_PGBOUNCER, DB_AUTO_MIGRATE,
+    WORKER_LEASE_SECONDS, DISPATCH_LOOKAHEAD, DISPATCH_LEASE_SECONDS
+)
+from utils.records import ListPost, Comment, SearchHit
+from utils.passwords import hash_password
 import datetime
+import threading
+import time
+from contextlib import contextmanager
 
 Base = declarative_base()
 
+
+class PoolMetrics:
+    """Counters about connection pool usage, for the admin panel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self.connects = 0
+        self.invalidations = 0
+
+    def record_checkout(self, seconds, waited, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.waits += int(waited)
+            self.timeouts += int(timed_out)
+            self.total_checkout_time += seconds
+            self.max_checkout_time = max(self.max_checkout_time, seconds)
+
+    def record_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self, *args):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_checkout_ms": 1000 * self.total_checkout_time / self.checkouts if self.checkouts else 0.0,
+                "max_checkout_ms": 1000 * self.max_checkout_time,
+                "connects": self.connects,
+                "invalidations": self.invalidations
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class RerunScope:
+    """Unit of work for one Streamlit script run: one connection, memoized reads, a query count"""
+
+    def __init__(self):
+        self.connection = None
+        self.queries = 0
+        self.memo = {}
+
+
+_rerun = threading.local()
+last_rerun_stats = {"queries": 0, "seconds": 0.0}
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    scope = getattr(_rerun, "scope", None)
+    if scope is not None:
+        scope.queries += 1
+
+
+@contextmanager
+def rerun_scope():
+    """Share one connection and memoize user/account reads for the duration of a rerun"""
+    scope = RerunScope()
+    started = time.perf_counter()
+    _rerun.scope = scope
+    try:
+        yield scope
+    finally:
+        _rerun.scope = None
+        SessionLocal.remove()
+        if scope.connection is not None:
+            scope.connection.close()
+        last_rerun_stats.update(queries=scope.queries, seconds=time.perf_counter() - started)
+
+
+def _scope_session():
+    """Bind this thread's session to the rerun's connection, checked out on first use"""
+    scope = getattr(_rerun, "scope", None)
+    if scope is not None and scope.connection is None:
+        scope.connection = engine.connect()
+        SessionLocal.remove()
+        SessionLocal.registry.set(SessionLocal.session_factory(bind=scope.connection))
+    return SessionLocal()
+
+
+def _memoized(key, load):
+    """Return load() once per rerun for key; outside a rerun always call load()"""
+    scope = getattr(_rerun, "scope", None)
+    if scope is None:
+        return load()
+    if key not in scope.memo:
+        scope.memo[key] = load()
+    return scope.memo[key]
+
+
+def _forget(kind):
+    """Drop memoized reads of one kind after a write changes them"""
+    scope = getattr(_rerun, "scope", None)
+    if scope is not None:
+        for key in [key for key in scope.memo if key[0] == kind]:
+            del scope.memo[key]
+
+
+def get_rerun_stats():
+    """Query count for the current rerun so far, and totals for the last finished one"""
+    scope = getattr(_rerun, "scope", None)
+    return {
+        "current_queries": scope.queries if scope is not None else None,
+        "last_queries": last_rerun_stats["queries"],
+        "last_seconds": last_rerun_stats["seconds"]
+    }
+
+
+class InstrumentedQueuePool(sa.pool.QueuePool):
+    """QueuePool that records how long checkouts take and whether they had to wait"""
+
+    def _do_get(self):
+        waited = self.checkedout() >= self.size() + DB_MAX_OVERFLOW
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa.exc.TimeoutError:
+            pool_metrics.record_checkout(time.perf_counter() - started, waited, timed_out=True)
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started, waited)
+        return connection
+
+
+def create_db_engine(url=DATABASE_URL):
+    """Create the engine with the pool settings from config"""
+    url = sa.engine.make_url(url)
+    
+    if DB_PGBOUNCER:
+        # PgBouncer pools for us; psycopg 3 must also not prepare statements,
+        # which break when consecutive transactions land on different server connections
+        connect_args = {"prepare_threshold": None} if url.drivername == "postgresql+psycopg" else {}
+        db_engine = sa.create_engine(url, poolclass=sa.pool.NullPool, connect_args=connect_args)
+    else:
+        db_engine = sa.create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING
+        )
+    
+    sa.event.listen(db_engine, "connect", pool_metrics.record_connect)
+    sa.event.listen(db_engine, "invalidate", pool_metrics.record_invalidation)
+    sa.event.listen(db_engine, "before_cursor_execute", _count_query)
+    return db_engine
+
+
 # Create database engine and session with better error handling
 try:
     # Connect to database using the URL from config
-    engine = sa.create_engine(DATABASE_URL)
+    engine = create_db_engine()
     SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 except Exception as e:
     st.error(f"Database connection error: {e}")
@@ -33,6 +201,10 @@ class User(Base):
 
 class FacebookAccount(Base):
     __tablename__ = "facebook_accounts"
+    __table_args__ = (
+        # Serves lookups by user_id alone (leftmost column) as well as by (user_id, page_id)
+        sa.Index("uq_facebook_accounts_user_page", "user_id", "page_id", unique=True),
+    )
 
     id = sa.Column(sa.Integer, primary_key=True, index=True)
     user_id = sa.Column(sa.Integer, sa.ForeignKey("users.id"))
@@ -40,23 +212,214 @@ class FacebookAccount(Base):
     page_id = sa.Column(sa.String)
     access_token = sa.Column(sa.String)
     expires_at = sa.Column(sa.DateTime, nullable=True)
+    # Background sync order: accounts with a higher priority are leased first
+    sync_priority = sa.Column(sa.Integer, nullable=False, default=0, server_default="0")
     created_at = sa.Column(sa.DateTime, server_default=sa.func.now())
     updated_at = sa.Column(sa.DateTime, server_default=sa.func.now(), onupdate=sa.func.now())
 
 
-# Database initialization function
+class FacebookPost(Base):
+    __tablename__ = "facebook_posts"
+    __table_args__ = (
+        sa.Index("ix_facebook_posts_page_created", "page_id", "created_time"),
+    )
+
+    id = sa.Column(sa.String, primary_key=True)
+    page_id = sa.Column(sa.String, nullable=False)
+    message = sa.Column(sa.Text, default="")
+    created_time = sa.Column(sa.DateTime)
+    permalink_url = sa.Column(sa.String, nullable=True)
+    shares = sa.Column(sa.Integer, default=0)
+    reactions = sa.Column(sa.Integer, default=0)
+    comments = sa.Column(sa.Integer, default=0)
+    synced_at = sa.Column(sa.DateTime, server_default=sa.func.now(), onupdate=sa.func.now())
+
+
+class FacebookComment(Base):
+    __tablename__ = "facebook_comments"
+    __table_args__ = (
+        sa.Index("ix_facebook_comments_post_created", "post_id", "created_time"),
+    )
+
+    id = sa.Column(sa.String, primary_key=True)
+    post_id = sa.Column(sa.String, nullable=False)
+    page_id = sa.Column(sa.String, nullable=False, index=True)
+    message = sa.Column(sa.Text, default="")
+    created_time = sa.Column(sa.DateTime)
+    from_name = sa.Column(sa.String, default="Unknown")
+    from_id = sa.Column(sa.String, default="")
+    replies = sa.Column(sa.Integer, default=0)
+    has_attachment = sa.Column(sa.Boolean, default=False)
+    synced_at = sa.Column(sa.DateTime, server_default=sa.func.now(), onupdate=sa.func.now())
+
+
+class EngagementSnapshot(Base):
+    __tablename__ = "engagement_snapshots"
+    __table_args__ = (
+        sa.Index("ix_engagement_snapshots_page_captured", "page_id", "captured_at"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    page_id = sa.Column(sa.String, nullable=False)
+    post_id = sa.Column(sa.String, nullable=False)
+    reactions = sa.Column(sa.Integer, default=0)
+    comments = sa.Column(sa.Integer, default=0)
+    shares = sa.Column(sa.Integer, default=0)
+    captured_at = sa.Column(sa.DateTime, server_default=sa.func.now())
+
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    # e.g. "posts:<page_id>" or "comments:<post_id>"
+    key = sa.Column(sa.String, primary_key=True)
+    high_water = sa.Column(sa.DateTime, nullable=True)
+    backfill_cursor = sa.Column(sa.String, nullable=True)
+    synced_at = sa.Column(sa.DateTime, nullable=True)
+
+
+class PageInsight(Base):
+    __tablename__ = "page_insights"
+    __table_args__ = (
+        sa.UniqueConstraint("page_id", "metric", "period", "end_time", name="uq_page_insights_point"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    page_id = sa.Column(sa.String, nullable=False)
+    metric = sa.Column(sa.String, nullable=False)
+    period = sa.Column(sa.String, nullable=False)
+    end_time = sa.Column(sa.DateTime, nullable=False)
+    value = sa.Column(sa.BigInteger, default=0)
+
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+    __table_args__ = (
+        sa.UniqueConstraint("account_id", "kind", name="uq_sync_jobs_account_kind"),
+        sa.Index("ix_sync_jobs_run_at", "run_at"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    account_id = sa.Column(sa.Integer, sa.ForeignKey("facebook_accounts.id", ondelete="CASCADE"), nullable=False)
+    # One of SYNC_JOB_KINDS
+    kind = sa.Column(sa.String, nullable=False)
+    run_at = sa.Column(sa.DateTime, nullable=False)
+    leased_by = sa.Column(sa.String, nullable=True)
+    leased_until = sa.Column(sa.DateTime, nullable=True)
+    # Failed runs in a row, for the retry backoff
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    last_error = sa.Column(sa.String, nullable=True)
+    finished_at = sa.Column(sa.DateTime, nullable=True)
+
+
+class CommentSyncRequest(Base):
+    __tablename__ = "comment_sync_requests"
+
+    # A post whose comments someone opened, synced by the account's next comments job
+    # even when it is not among the newest posts that job keeps current
+    account_id = sa.Column(sa.Integer, sa.ForeignKey("facebook_accounts.id", ondelete="CASCADE"), primary_key=True)
+    post_id = sa.Column(sa.String, primary_key=True)
+    requested_at = sa.Column(sa.DateTime, nullable=False)
+
+
+class ScheduledPost(Base):
+    __tablename__ = "scheduled_posts"
+    __table_args__ = (
+        # The dispatchers' claim: pending posts due soonest first
+        sa.Index("ix_scheduled_posts_status_due", "status", "due_at"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    account_id = sa.Column(sa.Integer, sa.ForeignKey("facebook_accounts.id", ondelete="CASCADE"), nullable=False)
+    page_id = sa.Column(sa.String, nullable=False)
+    message = sa.Column(sa.Text, nullable=False)
+    link = sa.Column(sa.String, nullable=True)
+    # Requested time; due_at starts there and moves on retries
+    publish_at = sa.Column(sa.DateTime, nullable=False)
+    due_at = sa.Column(sa.DateTime, nullable=False)
+    # Chosen by whoever schedules the post, so a resubmitted form queues it only once
+    idempotency_key = sa.Column(sa.String, nullable=False, unique=True)
+    # One of SCHEDULED_POST_STATUSES
+    status = sa.Column(sa.String, nullable=False, default="pending")
+    claimed_by = sa.Column(sa.String, nullable=True)
+    claimed_until = sa.Column(sa.DateTime, nullable=True)
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    # Committed before each call to Graph, so a retry knows an earlier call may have posted
+    attempted_at = sa.Column(sa.DateTime, nullable=True)
+    post_id = sa.Column(sa.String, nullable=True)
+    published_at = sa.Column(sa.DateTime, nullable=True)
+    last_error = sa.Column(sa.String, nullable=True)
+    created_at = sa.Column(sa.DateTime, server_default=sa.func.now())
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+
+    # Digest of a delivered feed change, so redeliveries are applied only once
+    key = sa.Column(sa.String, primary_key=True)
+    received_at = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    # One session token (by digest) revoked on logout, or with no digest every token
+    # of the user issued up to revoked_at, on a password change. Rows are useless
+    # once every token they cover has expired, which expires_at records.
+    id = sa.Column(sa.Integer, primary_key=True)
+    user_id = sa.Column(sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    token_hash = sa.Column(sa.String, nullable=True)
+    revoked_at = sa.Column(sa.DateTime, nullable=False)
+    expires_at = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String, nullable=False)
+    applied_at = sa.Column(sa.DateTime, server_default=sa.func.now())
+
+
+# Database initialization function - the schema is checked once per process,
+# not on every rerun; migrations are normally applied with `python -m migrations`
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
 def init_db():
-    try:
-        Base.metadata.create_all(bind=engine)
+    global _schema_ready
+    if _schema_ready:
         return True
-    except Exception as e:
-        st.error(f"Failed to initialize database: {e}")
-        return False
+    
+    with _schema_lock:
+        if _schema_ready:
+            return True
+        try:
+            import migrations
+            
+            with engine.connect() as connection:
+                pending = migrations.pending_migrations(connection)
+            
+            if pending and not DB_AUTO_MIGRATE:
+                st.error(
+                    f"Database schema is {len(pending)} migration(s) behind. "
+                    "Run `python -m migrations` to upgrade it."
+                )
+                return False
+            if pending:
+                migrations.upgrade(log=lambda message: None)
+            
+            _schema_ready = True
+            return True
+        except Exception as e:
+            st.error(f"Failed to initialize database: {e}")
+            return False
 
 
 # Helper functions for database operations
 def get_user_by_username(username):
-    db = SessionLocal()
+    db = _scope_session()
     try:
         return db.query(User).filter(User.username == username).first()
     finally:
@@ -64,15 +427,17 @@ def get_user_by_username(username):
 
 
 def get_user_by_id(user_id):
-    db = SessionLocal()
-    try:
-        return db.query(User).filter(User.id == user_id).first()
-    finally:
-        db.close()
+    def load():
+        db = _scope_session()
+        try:
+            return db.query(User).filter(User.id == user_id).first()
+        finally:
+            db.close()
+    return _memoized(("user", user_id), load)
 
 
 def create_user(username, password, email):
-    db = SessionLocal()
+    db = _scope_session()
     try:
         # Check if user already exists
         existing_user = db.query(User).filter(
@@ -83,7 +448,7 @@ def create_user(username, password, email):
             return None, "Username or email already exists"
         
         # Hash the password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = hash_password(password)
         
         # Create new user
         new_user = User(username=username, password_hash=password_hash, email=email)
@@ -99,17 +464,18 @@ def create_user(username, password, email):
 
 
 def update_password(user_id, new_password):
-    db = SessionLocal()
+    db = _scope_session()
     try:
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             return False, "User not found"
         
         # Hash the new password
-        password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = hash_password(new_password)
         
         user.password_hash = password_hash
         db.commit()
+        _forget("user")
         return True, None
     except Exception as e:
         db.rollback()
@@ -118,17 +484,54 @@ def update_password(user_id, new_password):
         db.close()
 
 
-def get_user_accounts(user_id):
-    db = SessionLocal()
+def revoke_tokens(user_id, expires_at, token_hash=None):
+    """Revoke one token of a user by digest, or all tokens issued so far without one"""
+    db = _scope_session()
+    try:
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        revocation = TokenRevocation(user_id=user_id, token_hash=token_hash, revoked_at=now, expires_at=expires_at)
+        db.add(revocation)
+        # Revocations are rare, so they also clear out the ones no token can hit anymore
+        db.query(TokenRevocation).filter(TokenRevocation.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+        return revocation.revoked_at, None
+    except Exception as e:
+        db.rollback()
+        return None, str(e)
+    finally:
+        db.close()
+
+
+def get_token_revocations(since=None):
+    """Unexpired revocations made at or after since (all of them without it)"""
+    db = _scope_session()
     try:
-        accounts = db.query(FacebookAccount).filter(FacebookAccount.user_id == user_id).all()
-        return accounts
+        query = db.query(
+            TokenRevocation.user_id, TokenRevocation.token_hash,
+            TokenRevocation.revoked_at, TokenRevocation.expires_at
+        ).filter(TokenRevocation.expires_at >= datetime.datetime.utcnow())
+        if since is not None:
+            query = query.filter(TokenRevocation.revoked_at >= since)
+        return query.all(), None
+    except Exception as e:
+        return [], str(e)
     finally:
         db.close()
 
 
+def get_user_accounts(user_id):
+    def load():
+        db = _scope_session()
+        try:
+            accounts = db.query(FacebookAccount).filter(FacebookAccount.user_id == user_id).all()
+            return accounts
+        finally:
+            db.close()
+    return _memoized(("accounts", user_id), load)
+
+
 def add_facebook_account(user_id, account_name, page_id, access_token, expires_at=None):
-    db = SessionLocal()
+    db = _scope_session()
     try:
         # Check if account already exists
         existing_account = db.query(FacebookAccount).filter(
@@ -150,8 +553,13 @@ def add_facebook_account(user_id, account_name, page_id, access_token, expires_a
         
         db.add(new_account)
         db.commit()
+        _forget("accounts")
         db.refresh(new_account)
         return new_account, None
+    except sa.exc.IntegrityError:
+        # Lost a race with a concurrent add of the same page
+        db.rollback()
+        return None, "Account already exists"
     except Exception as e:
         db.rollback()
         return None, str(e)
@@ -159,8 +567,8 @@ def add_facebook_account(user_id, account_name, page_id, access_token, expires_a
         db.close()
 
 
-def update_facebook_account(account_id, account_name=None, access_token=None, expires_at=None):
-    db = SessionLocal()
+def update_facebook_account(account_id, account_name=None, access_token=None, expires_at=None, sync_priority=None):
+    db = _scope_session()
     try:
         account = db.query(FacebookAccount).filter(FacebookAccount.id == account_id).first()
         
@@ -175,8 +583,12 @@ def update_facebook_account(account_id, account_name=None, access_token=None, ex
             
         if expires_at:
             account.expires_at = expires_at
+        
+        if sync_priority is not None:
+            account.sync_priority = sync_priority
             
         db.commit()
+        _forget("accounts")
         return True, None
     except Exception as e:
         db.rollback()
@@ -186,15 +598,19 @@ def update_facebook_account(account_id, account_name=None, access_token=None, ex
 
 
 def delete_facebook_account(account_id):
-    db = SessionLocal()
+    db = _scope_session()
     try:
         account = db.query(FacebookAccount).filter(FacebookAccount.id == account_id).first()
         
         if not account:
             return False, "Account not found"
         
+        db.query(SyncJob).filter(SyncJob.account_id == account_id).delete()
+        db.query(CommentSyncRequest).filter(CommentSyncRequest.account_id == account_id).delete()
+        db.query(ScheduledPost).filter(ScheduledPost.account_id == account_id).delete()
         db.delete(account)
         db.commit()
+        _forget("accounts")
         return True, None
     except Exception as e:
         db.rollback()
@@ -207,3 +623,938 @@ def delete_facebook_account(account_id):
 @st.cache_resource
 def get_db_connection():
     return engine
+
+
+def get_pool_metrics():
+    """Current pool state plus the checkout counters collected since startup"""
+    metrics = pool_metrics.snapshot()
+    pool = engine.pool
+    if isinstance(pool, sa.pool.QueuePool):
+        metrics.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow()
+        })
+    return metrics
+
+
+# Local post/comment store
+GRAPH_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+def parse_graph_time(value):
+    """Convert a Graph API timestamp into a naive UTC datetime"""
+    if not value:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    parsed = datetime.datetime.strptime(value, GRAPH_TIME_FORMAT)
+    return parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def format_graph_time(value):
+    """Convert a stored naive UTC datetime back into Graph API format"""
+    return value.strftime("%Y-%m-%dT%H:%M:%S+0000") if value else None
+
+
+def _post_record(post):
+    return ListPost(
+        id=post.id,
+        message=post.message or "",
+        created_time=format_graph_time(post.created_time),
+        comments=post.comments or 0,
+        reactions=post.reactions or 0,
+        shares=post.shares or 0,
+        permalink_url=post.permalink_url
+    )
+
+
+def _comment_record(comment):
+    return Comment(
+        id=comment.id,
+        message=comment.message or "",
+        created_time=format_graph_time(comment.created_time),
+        from_name=comment.from_name or "Unknown",
+        from_id=comment.from_id or "",
+        replies=comment.replies or 0,
+        has_attachment=bool(comment.has_attachment)
+    )
+
+
+def _record_fields(record):
+    """Field values of a record, or of a dict carrying only some fields (e.g. a webhook change)"""
+    return record._asdict() if isinstance(record, tuple) else record
+
+
+def _merge_posts(db, page_id, posts):
+    """Add or update posts in session db and snapshot their engagement"""
+    posts = [_record_fields(post) for post in posts]
+    ids = [post["id"] for post in posts]
+    existing = {post.id: post for post in db.query(FacebookPost).filter(FacebookPost.id.in_(ids)).all()}
+    
+    for post in posts:
+        stored = existing.get(post["id"])
+        if stored is None:
+            stored = FacebookPost(id=post["id"], page_id=page_id)
+            db.add(stored)
+            existing[post["id"]] = stored
+        
+        # Posts fetched with a narrower field profile only update what they carry
+        for column in ("message", "permalink_url", "shares", "reactions", "comments"):
+            if column in post:
+                setattr(stored, column, post[column])
+        if "created_time" in post:
+            stored.created_time = parse_graph_time(post["created_time"])
+        
+        if {"reactions", "comments", "shares"}.issubset(post):
+            db.add(EngagementSnapshot(
+                page_id=page_id,
+                post_id=post["id"],
+                reactions=post["reactions"],
+                comments=post["comments"],
+                shares=post["shares"]
+            ))
+
+
+def _merge_comments(db, page_id, post_id, comments):
+    """Add or update comments of a post in session db"""
+    comments = [_record_fields(comment) for comment in comments]
+    ids = [comment["id"] for comment in comments]
+    existing = {comment.id: comment for comment in db.query(FacebookComment).filter(FacebookComment.id.in_(ids)).all()}
+    
+    for comment in comments:
+        stored = existing.get(comment["id"])
+        if stored is None:
+            stored = FacebookComment(id=comment["id"], page_id=page_id, post_id=post_id, replies=0)
+            db.add(stored)
+            existing[comment["id"]] = stored
+        
+        # Partial records (e.g. an edit from a webhook) only update what they carry
+        for column in ("message", "from_name", "from_id", "replies", "has_attachment"):
+            if column in comment:
+                setattr(stored, column, comment[column])
+        if "created_time" in comment:
+            stored.created_time = parse_graph_time(comment["created_time"])
+
+
+def upsert_posts(page_id, posts):
+    """Insert or update posts in the local store and snapshot their engagement"""
+    if not posts:
+        return 0, None
+    
+    db = _scope_session()
+    try:
+        _merge_posts(db, page_id, posts)
+        db.commit()
+        return len(posts), None
+    except Exception as e:
+        db.rollback()
+        return 0, str(e)
+    finally:
+        db.close()
+
+
+def upsert_comments(page_id, post_id, comments):
+    """Insert or update comments of a post in the local store"""
+    if not comments:
+        return 0, None
+    
+    db = _scope_session()
+    try:
+        _merge_comments(db, page_id, post_id, comments)
+        db.commit()
+        return len(comments), None
+    except Exception as e:
+        db.rollback()
+        return 0, str(e)
+    finally:
+        db.close()
+
+
+def get_stored_posts(page_id, limit=25, offset=0):
+    """Get the newest stored posts of a page"""
+    db = _scope_session()
+    try:
+        posts = db.query(FacebookPost).filter(
+            FacebookPost.page_id == page_id
+        ).order_by(FacebookPost.created_time.desc()).offset(offset).limit(limit).all()
+        return [_post_record(post) for post in posts]
+    finally:
+        db.close()
+
+
+# Columns the paged post and comment tables can sort by
+POST_SORTS = {
+    "created_time": FacebookPost.created_time,
+    "reactions": FacebookPost.reactions,
+    "comments": FacebookPost.comments,
+    "shares": FacebookPost.shares,
+    "engagement": (
+        sa.func.coalesce(FacebookPost.reactions, 0)
+        + sa.func.coalesce(FacebookPost.comments, 0)
+        + sa.func.coalesce(FacebookPost.shares, 0)
+    )
+}
+
+COMMENT_SORTS = {
+    "created_time": FacebookComment.created_time,
+    "from_name": FacebookComment.from_name,
+    "replies": FacebookComment.replies
+}
+
+
+def _query_slice(query, order, tiebreak, descending, search_columns, search, offset, limit):
+    """One sorted, filtered page of query's rows, with the number of rows matching the filter"""
+    if search:
+        search = search.lower()
+        query = query.filter(sa.or_(*(
+            sa.func.lower(column).contains(search, autoescape=True) for column in search_columns
+        )))
+    total = query.count()
+    # The tiebreak keeps rows with equal sort values on the same page from one rerun to the next
+    ordering = (order.desc(), tiebreak.desc()) if descending else (order.asc(), tiebreak.asc())
+    return query.order_by(*ordering).offset(offset).limit(limit).all(), total
+
+
+def query_stored_posts(page_id, offset=0, limit=25, sort="created_time", descending=True, search=None):
+    """Get one page of a page's stored posts, returning (posts, total matching)"""
+    db = _scope_session()
+    try:
+        posts, total = _query_slice(
+            db.query(FacebookPost).filter(FacebookPost.page_id == page_id),
+            POST_SORTS[sort], FacebookPost.id, descending,
+            [FacebookPost.message], search, offset, limit
+        )
+        return [_post_record(post) for post in posts], total
+    finally:
+        db.close()
+
+
+def count_stored_posts(page_id):
+    db = _scope_session()
+    try:
+        return db.query(FacebookPost).filter(FacebookPost.page_id == page_id).count()
+    finally:
+        db.close()
+
+
+def get_stored_post(post_id):
+    db = _scope_session()
+    try:
+        post = db.query(FacebookPost).filter(FacebookPost.id == post_id).first()
+        return _post_record(post) if post else None
+    finally:
+        db.close()
+
+
+def update_stored_post(post_id, message):
+    db = _scope_session()
+    try:
+        db.query(FacebookPost).filter(FacebookPost.id == post_id).update({"message": message})
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def delete_stored_post(post_id):
+    db = _scope_session()
+    try:
+        db.query(FacebookComment).filter(FacebookComment.post_id == post_id).delete()
+        db.query(FacebookPost).filter(FacebookPost.id == post_id).delete()
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def query_stored_comments(post_id, offset=0, limit=25, sort="created_time", descending=True, search=None):
+    """Get one page of a post's stored comments, returning (comments, total matching)"""
+    db = _scope_session()
+    try:
+        comments, total = _query_slice(
+            db.query(FacebookComment).filter(FacebookComment.post_id == post_id),
+            COMMENT_SORTS[sort], FacebookComment.id, descending,
+            [FacebookComment.message, FacebookComment.from_name], search, offset, limit
+        )
+        return [_comment_record(comment) for comment in comments], total
+    finally:
+        db.close()
+
+
+# Full-text search over stored post and comment messages. On Postgres it uses
+# GIN expression indexes, which only serve queries built with the same text
+# search configuration; elsewhere (SQLite for tests and local runs) FTS5
+# tables that triggers keep in step with the base tables. Migration 0005
+# creates both, and every write path (syncs, webhooks, edits) updates them.
+# Migration 0009 keys the FTS5 tables on a search_rowid column of the base
+# tables (not described by the models), since VACUUM may renumber rowids.
+# "simple" does no stemming or stop words, so product names and non-English
+# pages match as typed.
+SEARCH_CONFIG = "simple"
+SEARCH_TABLES = {FacebookPost: "post_search", FacebookComment: "comment_search"}
+
+
+def _text_match(model, search):
+    """Filter clause matching rows of model whose message contains every word of search"""
+    if engine.dialect.name == "postgresql":
+        config = sa.literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+        return sa.func.to_tsvector(config, model.message).op("@@")(sa.func.websearch_to_tsquery(config, search))
+    
+    # Quoting each word makes FTS5 treat operators and punctuation in the input as plain text
+    match = " ".join('"' + word.replace('"', '""') + '"' for word in search.split())
+    search_table = SEARCH_TABLES[model]
+    return sa.literal_column(f"{model.__tablename__}.search_rowid").in_(
+        sa.select(sa.literal_column("rowid")).select_from(sa.table(search_table)).where(
+            sa.literal_column(search_table).op("MATCH")(match)
+        )
+    )
+
+
+def _search_hit(row):
+    comment = isinstance(row, FacebookComment)
+    return SearchHit(
+        id=row.id,
+        page_id=row.page_id,
+        post_id=row.post_id if comment else row.id,
+        message=row.message or "",
+        created_time=format_graph_time(row.created_time),
+        from_name=(row.from_name or "Unknown") if comment else ""
+    )
+
+
+def search_stored_messages(page_ids, search, kind="comments", limit=25, offset=0):
+    """Full-text search the stored comments (or posts) of pages, newest first
+
+    Returns (hits, more), more telling whether matches follow this page;
+    counting every match would cost more than finding the page.
+    """
+    if not page_ids or not search.strip():
+        return [], False
+    
+    model = FacebookComment if kind == "comments" else FacebookPost
+    db = _scope_session()
+    try:
+        rows = db.query(model).filter(
+            model.page_id.in_(page_ids),
+            _text_match(model, search)
+        ).order_by(model.created_time.desc(), model.id.desc()).offset(offset).limit(limit + 1).all()
+        return [_search_hit(row) for row in rows[:limit]], len(rows) > limit
+    finally:
+        db.close()
+
+
+def count_stored_comments(post_id):
+    db = _scope_session()
+    try:
+        return db.query(FacebookComment).filter(FacebookComment.post_id == post_id).count()
+    finally:
+        db.close()
+
+
+def update_stored_comment(comment_id, message):
+    db = _scope_session()
+    try:
+        db.query(FacebookComment).filter(FacebookComment.id == comment_id).update({"message": message})
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def delete_stored_comment(comment_id):
+    db = _scope_session()
+    try:
+        db.query(FacebookComment).filter(FacebookComment.id == comment_id).delete()
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def get_sync_state(key):
+    db = _scope_session()
+    try:
+        return db.query(SyncState).filter(SyncState.key == key).first()
+    finally:
+        db.close()
+
+
+def save_sync_state(key, **fields):
+    """Create or update the sync bookkeeping row for key"""
+    db = _scope_session()
+    try:
+        state = db.query(SyncState).filter(SyncState.key == key).first()
+        if state is None:
+            state = SyncState(key=key)
+            db.add(state)
+        
+        for name, value in fields.items():
+            setattr(state, name, value)
+        
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+# Insights time series
+def upsert_insights(page_id, period, points):
+    """Insert or update insight points given as dicts with metric, end_time and value"""
+    if not points:
+        return 0, None
+    
+    db = _scope_session()
+    try:
+        end_times = {parse_graph_time(point["end_time"]) for point in points}
+        existing = {
+            (row.metric, row.end_time): row
+            for row in db.query(PageInsight).filter(
+                PageInsight.page_id == page_id,
+                PageInsight.period == period,
+                PageInsight.end_time.in_(end_times)
+            ).all()
+        }
+        
+        for point in points:
+            end_time = parse_graph_time(point["end_time"])
+            row = existing.get((point["metric"], end_time))
+            if row is None:
+                row = PageInsight(page_id=page_id, metric=point["metric"], period=period, end_time=end_time)
+                db.add(row)
+                existing[(point["metric"], end_time)] = row
+            row.value = point["value"]
+        
+        db.commit()
+        return len(points), None
+    except Exception as e:
+        db.rollback()
+        return 0, str(e)
+    finally:
+        db.close()
+
+
+def get_insight_bounds(page_id, period):
+    """Get the (earliest, latest) stored end_time for a page and period"""
+    db = _scope_session()
+    try:
+        return db.query(sa.func.min(PageInsight.end_time), sa.func.max(PageInsight.end_time)).filter(
+            PageInsight.page_id == page_id,
+            PageInsight.period == period
+        ).one()
+    finally:
+        db.close()
+
+
+def get_insights_totals(page_id, period, start, end):
+    """Sum each metric over (start, end], taking the latest value for page_fans"""
+    db = _scope_session()
+    try:
+        window = (
+            (PageInsight.page_id == page_id) &
+            (PageInsight.period == period) &
+            (PageInsight.end_time > start) &
+            (PageInsight.end_time <= end)
+        )
+        totals = dict(
+            db.query(PageInsight.metric, sa.func.sum(PageInsight.value))
+            .filter(window, PageInsight.metric != "page_fans")
+            .group_by(PageInsight.metric)
+            .all()
+        )
+        
+        fans = db.query(PageInsight.value).filter(window, PageInsight.metric == "page_fans").order_by(
+            PageInsight.end_time.desc()
+        ).first()
+        if fans:
+            totals["page_fans"] = fans[0]
+        
+        return {metric: int(value or 0) for metric, value in totals.items()}
+    finally:
+        db.close()
+
+
+def get_insights_series(page_id, metric, period, start, end):
+    """Get the (end_time, value) points of one metric over (start, end] as a DataFrame"""
+    db = _scope_session()
+    try:
+        rows = db.query(PageInsight.end_time, PageInsight.value).filter(
+            PageInsight.page_id == page_id,
+            PageInsight.metric == metric,
+            PageInsight.period == period,
+            PageInsight.end_time > start,
+            PageInsight.end_time <= end
+        ).order_by(PageInsight.end_time).all()
+        return pd.DataFrame(rows, columns=["end_time", "value"])
+    finally:
+        db.close()
+
+
+# Background sync work queue
+SYNC_JOB_KINDS = ("posts", "comments", "insights")
+
+
+def schedule_sync_jobs():
+    """Create the missing (account, kind) jobs, due now, so every account gets synced"""
+    db = _scope_session()
+    try:
+        existing = set(db.query(SyncJob.account_id, SyncJob.kind).all())
+        now = datetime.datetime.utcnow()
+        created = 0
+        for (account_id,) in db.query(FacebookAccount.id).all():
+            for kind in SYNC_JOB_KINDS:
+                if (account_id, kind) not in existing:
+                    db.add(SyncJob(account_id=account_id, kind=kind, run_at=now))
+                    created += 1
+        db.commit()
+        return created, None
+    except sa.exc.IntegrityError:
+        # Another worker created them first
+        db.rollback()
+        return 0, None
+    except Exception as e:
+        db.rollback()
+        return 0, str(e)
+    finally:
+        db.close()
+
+
+def lease_sync_jobs(worker_id, limit=1, lease_seconds=WORKER_LEASE_SECONDS):
+    """Claim up to limit due jobs for worker_id, highest account priority first
+
+    On Postgres the candidate rows are locked with SKIP LOCKED so concurrent
+    workers pick different jobs; the conditional update makes the claim
+    safe on databases without row locks too. Returns a list of dicts.
+    """
+    now = datetime.datetime.utcnow()
+    unleased = sa.or_(SyncJob.leased_until.is_(None), SyncJob.leased_until < now)
+    db = _scope_session()
+    try:
+        candidates = (
+            db.query(SyncJob.id, SyncJob.kind, SyncJob.account_id, SyncJob.attempts, FacebookAccount.user_id)
+            .join(FacebookAccount, FacebookAccount.id == SyncJob.account_id)
+            .filter(SyncJob.run_at <= now, unleased)
+            .order_by(FacebookAccount.sync_priority.desc(), SyncJob.run_at)
+            .limit(limit)
+            .with_for_update(of=SyncJob, skip_locked=True)
+            .all()
+        )
+        
+        leased = []
+        for job in candidates:
+            claimed = db.execute(
+                sa.update(SyncJob)
+                .where(SyncJob.id == job.id, unleased)
+                .values(leased_by=worker_id, leased_until=now + datetime.timedelta(seconds=lease_seconds))
+            ).rowcount
+            if claimed:
+                leased.append(dict(job._mapping))
+        db.commit()
+        return leased
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def finish_sync_job(job_id, worker_id, next_run, error=None):
+    """Release a leased job and schedule its next run; errors count towards the backoff"""
+    db = _scope_session()
+    try:
+        values = {
+            "leased_by": None,
+            "leased_until": None,
+            "run_at": next_run,
+            "last_error": error,
+            "finished_at": datetime.datetime.utcnow(),
+            "attempts": SyncJob.attempts + 1 if error else 0
+        }
+        db.execute(
+            sa.update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.leased_by == worker_id)
+            .values(**values)
+        )
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def request_sync(account_id, kind=None):
+    """Make an account's jobs (or only those of kind) due now, e.g. for a Refresh button"""
+    db = _scope_session()
+    try:
+        query = db.query(SyncJob).filter(SyncJob.account_id == account_id)
+        if kind:
+            query = query.filter(SyncJob.kind == kind)
+        query.update({SyncJob.run_at: datetime.datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def request_comment_sync(account_id, post_id):
+    """Have the account's next comments job, made due now, also sync post_id"""
+    db = _scope_session()
+    try:
+        pending = db.query(CommentSyncRequest).filter(
+            CommentSyncRequest.account_id == account_id,
+            CommentSyncRequest.post_id == post_id
+        ).first()
+        if not pending:
+            now = datetime.datetime.utcnow()
+            db.add(CommentSyncRequest(account_id=account_id, post_id=post_id, requested_at=now))
+            db.query(SyncJob).filter(SyncJob.account_id == account_id, SyncJob.kind == "comments").update(
+                {SyncJob.run_at: now}, synchronize_session=False
+            )
+        db.commit()
+        return True, None
+    except sa.exc.IntegrityError:
+        # Requested at the same time by someone else
+        db.rollback()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def get_comment_sync_requests(account_id):
+    """Ids of the posts whose comments were requested for an account, oldest request first"""
+    db = _scope_session()
+    try:
+        rows = (
+            db.query(CommentSyncRequest.post_id)
+            .filter(CommentSyncRequest.account_id == account_id)
+            .order_by(CommentSyncRequest.requested_at)
+            .all()
+        )
+        return [post_id for (post_id,) in rows]
+    finally:
+        db.close()
+
+
+def finish_comment_sync_request(account_id, post_id):
+    """Drop a request once the post's comments are synced"""
+    db = _scope_session()
+    try:
+        db.query(CommentSyncRequest).filter(
+            CommentSyncRequest.account_id == account_id,
+            CommentSyncRequest.post_id == post_id
+        ).delete(synchronize_session=False)
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def get_sync_jobs(account_id):
+    """An account's jobs by kind, to show when it was last synced"""
+    db = _scope_session()
+    try:
+        return {job.kind: job for job in db.query(SyncJob).filter(SyncJob.account_id == account_id).all()}
+    finally:
+        db.close()
+
+
+SCHEDULED_POST_STATUSES = ("pending", "published", "failed", "cancelled")
+
+
+def schedule_post(account_id, page_id, message, publish_at, idempotency_key, link=None):
+    """Queue a post for publishing at publish_at (naive UTC), returning (id, error)
+
+    Scheduling again with the same idempotency key returns the post
+    already queued instead of adding another.
+    """
+    db = _scope_session()
+    try:
+        post = ScheduledPost(
+            account_id=account_id,
+            page_id=page_id,
+            message=message,
+            link=link,
+            publish_at=publish_at,
+            due_at=publish_at,
+            idempotency_key=idempotency_key,
+            status="pending",
+            attempts=0
+        )
+        db.add(post)
+        db.commit()
+        return post.id, None
+    except sa.exc.IntegrityError:
+        db.rollback()
+        existing = db.query(ScheduledPost.id).filter(ScheduledPost.idempotency_key == idempotency_key).scalar()
+        return (existing, None) if existing else (None, "Could not schedule the post")
+    except Exception as e:
+        db.rollback()
+        return None, str(e)
+    finally:
+        db.close()
+
+
+def cancel_scheduled_post(scheduled_id, account_id):
+    """Cancel a pending post; a dispatcher holding it checks again before publishing"""
+    db = _scope_session()
+    try:
+        cancelled = db.query(ScheduledPost).filter(
+            ScheduledPost.id == scheduled_id,
+            ScheduledPost.account_id == account_id,
+            ScheduledPost.status == "pending"
+        ).update({"status": "cancelled"}, synchronize_session=False)
+        db.commit()
+        return (True, None) if cancelled else (False, "The post is no longer pending")
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def get_scheduled_posts(account_id, statuses=("pending", "failed"), limit=100):
+    """An account's scheduled posts in the given statuses, soonest first"""
+    db = _scope_session()
+    try:
+        return db.query(ScheduledPost).filter(
+            ScheduledPost.account_id == account_id,
+            ScheduledPost.status.in_(statuses)
+        ).order_by(ScheduledPost.publish_at).limit(limit).all()
+    finally:
+        db.close()
+
+
+def claim_scheduled_posts(dispatcher_id, limit=1, lookahead=DISPATCH_LOOKAHEAD, lease_seconds=DISPATCH_LEASE_SECONDS):
+    """Claim up to limit pending posts due within lookahead seconds, soonest first
+
+    Claimed posts are held by the dispatcher until their exact time. Like
+    lease_sync_jobs, candidates are locked with SKIP LOCKED on Postgres
+    and claimed with a conditional update. A claim expires lookahead +
+    lease_seconds after it is made, so the posts of a crashed dispatcher
+    are picked up by another. Returns a list of dicts.
+    """
+    now = datetime.datetime.utcnow()
+    unclaimed = sa.or_(ScheduledPost.claimed_until.is_(None), ScheduledPost.claimed_until < now)
+    db = _scope_session()
+    try:
+        candidates = (
+            db.query(
+                ScheduledPost.id, ScheduledPost.account_id, FacebookAccount.user_id, ScheduledPost.page_id,
+                ScheduledPost.message, ScheduledPost.link, ScheduledPost.publish_at, ScheduledPost.due_at,
+                ScheduledPost.attempts, ScheduledPost.attempted_at
+            )
+            .join(FacebookAccount, FacebookAccount.id == ScheduledPost.account_id)
+            .filter(
+                ScheduledPost.status == "pending",
+                ScheduledPost.due_at <= now + datetime.timedelta(seconds=lookahead),
+                unclaimed
+            )
+            .order_by(ScheduledPost.due_at)
+            .limit(limit)
+            .with_for_update(of=ScheduledPost, skip_locked=True)
+            .all()
+        )
+        
+        claimed = []
+        for post in candidates:
+            if db.execute(
+                sa.update(ScheduledPost)
+                .where(ScheduledPost.id == post.id, ScheduledPost.status == "pending", unclaimed)
+                .values(
+                    claimed_by=dispatcher_id,
+                    claimed_until=now + datetime.timedelta(seconds=lookahead + lease_seconds)
+                )
+            ).rowcount:
+                claimed.append(dict(post._mapping))
+        db.commit()
+        return claimed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def start_publishing(scheduled_id, dispatcher_id):
+    """Record a publish attempt right before calling Graph
+
+    Returns False when the post was cancelled or another dispatcher took
+    over the claim in the meantime, in which case it must not be published.
+    """
+    db = _scope_session()
+    try:
+        started = db.execute(
+            sa.update(ScheduledPost)
+            .where(
+                ScheduledPost.id == scheduled_id,
+                ScheduledPost.status == "pending",
+                ScheduledPost.claimed_by == dispatcher_id
+            )
+            .values(attempted_at=datetime.datetime.utcnow(), attempts=ScheduledPost.attempts + 1)
+        ).rowcount
+        db.commit()
+        return bool(started)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def finish_scheduled_post(scheduled_id, dispatcher_id, post_id=None, error=None, retry_at=None, attempts=None):
+    """Release a claimed post: published with post_id, retried at retry_at, or failed
+
+    attempts, when given, is the number of rounds the post has had so far.
+    It is set rather than incremented, so a round that start_publishing
+    already counted is not counted twice.
+    """
+    db = _scope_session()
+    try:
+        values = {"claimed_by": None, "claimed_until": None, "last_error": error}
+        if attempts is not None:
+            values["attempts"] = attempts
+        if post_id:
+            values.update(status="published", post_id=post_id, published_at=datetime.datetime.utcnow())
+        elif retry_at:
+            values.update(due_at=retry_at)
+        else:
+            values.update(status="failed")
+        db.execute(
+            sa.update(ScheduledPost)
+            .where(ScheduledPost.id == scheduled_id, ScheduledPost.claimed_by == dispatcher_id)
+            .values(**values)
+        )
+        db.commit()
+        return True, None
+    except Exception as e:
+        db.rollback()
+        return False, str(e)
+    finally:
+        db.close()
+
+
+def get_publish_latency(since, account_id=None):
+    """Lateness of the posts published since `since` (of one account or all): count and p50/p95/max seconds"""
+    db = _scope_session()
+    try:
+        query = db.query(ScheduledPost.publish_at, ScheduledPost.published_at).filter(
+            ScheduledPost.status == "published",
+            ScheduledPost.published_at >= since
+        )
+        if account_id is not None:
+            query = query.filter(ScheduledPost.account_id == account_id)
+        rows = query.all()
+    finally:
+        db.close()
+    
+    if not rows:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    latencies = sorted((published - scheduled).total_seconds() for scheduled, published in rows)
+    return {
+        "count": len(latencies),
+        "p50": latencies[int(0.50 * (len(latencies) - 1))],
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "max": latencies[-1]
+    }
+
+
+def apply_feed_events(events, coalesce):
+    """Apply a batch of webhook feed events in a single transaction, skipping ones seen before
+
+    events are (key, page_id, change) tuples. The keys of applied events
+    are stored in the same transaction, so a redelivery is dropped even
+    after a restart or when it reaches another receiver. coalesce turns
+    the fresh (page_id, change) pairs into (posts, comments, removed_posts,
+    removed_comments, comment_counts, reply_counts): posts maps page_id to
+    post records, comments maps (page_id, post_id) to comment records and
+    the counts map a post or comment id to the change of its comments or
+    replies count. Returns (applied, error).
+    """
+    db = _scope_session()
+    try:
+        keys = {key for key, _, _ in events}
+        seen = {key for (key,) in db.query(WebhookEvent.key).filter(WebhookEvent.key.in_(keys)).all()}
+        
+        fresh = {}
+        for key, page_id, change in events:
+            if key not in seen and key not in fresh:
+                fresh[key] = (page_id, change)
+        if not fresh:
+            return 0, None
+        
+        now = datetime.datetime.utcnow()
+        db.add_all([WebhookEvent(key=key, received_at=now) for key in fresh])
+        
+        posts, comments, removed_posts, removed_comments, comment_counts, reply_counts = coalesce(fresh.values())
+        for page_id, records in posts.items():
+            _merge_posts(db, page_id, records)
+        for (page_id, post_id), records in comments.items():
+            _merge_comments(db, page_id, post_id, records)
+        db.flush()
+        
+        if removed_comments:
+            db.query(FacebookComment).filter(FacebookComment.id.in_(removed_comments)).delete(synchronize_session=False)
+        if removed_posts:
+            db.query(FacebookComment).filter(FacebookComment.post_id.in_(removed_posts)).delete(synchronize_session=False)
+            db.query(FacebookPost).filter(FacebookPost.id.in_(removed_posts)).delete(synchronize_session=False)
+        
+        for model, column, counts in (
+            (FacebookPost, FacebookPost.comments, comment_counts),
+            (FacebookComment, FacebookComment.replies, reply_counts)
+        ):
+            for item_id, delta in counts.items():
+                if delta:
+                    updated = sa.func.coalesce(column, 0) + delta
+                    db.query(model).filter(model.id == item_id).update(
+                        {column: sa.case((updated < 0, 0), else_=updated)},
+                        synchronize_session=False
+                    )
+        
+        db.commit()
+        return len(fresh), None
+    except Exception as e:
+        db.rollback()
+        return 0, str(e)
+    finally:
+        db.close()
+
+
+def prune_webhook_events(older_than):
+    """Forget delivered event keys received before older_than"""
+    db = _scope_session()
+    try:
+        deleted = db.query(WebhookEvent).filter(WebhookEvent.received_at < older_than).delete(synchronize_session=False)
+        db.commit()
+        return deleted, None
+    except Exception as e:
+        db.rollback()
+        return 0, str(e)
+    finally:
+        db.close()
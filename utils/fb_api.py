@@ -2,20 +2,145 @@ import facebook
 import streamlit as st
 import pandas as pd
 import datetime
-from utils.db import get_user_accounts
+from utils.db import get_user_accounts, GRAPH_TIME_FORMAT
+from utils.cache import create_cache, SingleFlight
+from utils.rate_limit import RateLimitScheduler, RateLimitedError, scope_of
+from utils.records import profile_fields, profile_record, Comment
+from config import (
+    CACHE_TTLS, CACHE_MAX_ENTRIES, CACHE_BACKEND, CACHE_URL,
+    RATE_LIMIT_CALLS_PER_SECOND, RATE_LIMIT_SLOWDOWN_AT, RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_MAX_WAIT
+)
+import requests
+import hashlib
+import json
 import re
+from urllib.parse import urlencode
+
+# Largest page size we ask Graph for in a single request
+GRAPH_PAGE_SIZE = 100
+
+# Graph accepts at most 50 operations in one batch request
+GRAPH_BATCH_LIMIT = 50
+
+COMMENT_FIELDS = "id,message,created_time,from,comment_count,attachment"
+
+# Page insight metrics shown on the dashboard
+INSIGHT_METRICS = [
+    "page_impressions",
+    "page_impressions_unique",
+    "page_engaged_users",
+    "page_post_engagements",
+    "page_fans",
+    "page_fan_adds",
+    "page_fan_removes"
+]
+
+# Cache for Graph API reads; it holds raw Graph responses (never API clients), so a
+# shared backend lets one replica's fetch serve the others
+graph_cache = create_cache(CACHE_BACKEND, CACHE_URL, max_entries=CACHE_MAX_ENTRIES, ttls=CACHE_TTLS)
+
+# Identical Graph reads running at the same time in this process share one fetch
+graph_flights = SingleFlight()
+
+# Process-wide pacing of Graph API calls, fed by the usage headers of every response
+graph_scheduler = RateLimitScheduler(
+    rate=RATE_LIMIT_CALLS_PER_SECOND,
+    slowdown_at=RATE_LIMIT_SLOWDOWN_AT,
+    max_retries=RATE_LIMIT_MAX_RETRIES,
+    backoff_base=RATE_LIMIT_BACKOFF_BASE,
+    max_wait=RATE_LIMIT_MAX_WAIT
+)
 
 # Create a cache for Facebook API clients to avoid recreating them
 @st.cache_resource(ttl=3600)  # Cache for 1 hour
 def get_facebook_api(access_token):
     """Get a Facebook Graph API client with the given access token"""
     try:
-        return facebook.GraphAPI(access_token=access_token, version="v18.0")
+        session = requests.Session()
+        session.hooks["response"].append(graph_scheduler.record_response)
+        return facebook.GraphAPI(access_token=access_token, version="v18.0", session=session)
     except Exception as e:
         st.error(f"Error initializing Facebook API: {str(e)}")
         return None
 
 
+def _token_scope(api):
+    """Identify the account behind an API client without keeping the raw token"""
+    return hashlib.sha256((api.access_token or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_key(api, endpoint, params):
+    return (_token_scope(api), endpoint, tuple(sorted(params.items())))
+
+
+def cached_read(api, endpoint, params, tags, fetch, tags_for=None):
+    """Read through the Graph cache keyed by (account, endpoint, params)
+
+    On a miss, concurrent callers with the same key wait for one fetch
+    instead of each walking the same Graph pages. A fetch overlapped by a
+    write to what it reads is not cached, since it may predate the write.
+    tags_for(value) adds tags that depend on what was fetched.
+    """
+    key = _cache_key(api, endpoint, params)
+    found, value = graph_cache.get(key)
+    if found:
+        return value
+    
+    def store(value):
+        entry_tags = [*tags, *tags_for(value)] if tags_for else tags
+        graph_cache.set(key, value, graph_cache.ttl_for(endpoint), entry_tags)
+    
+    return graph_flights.do(key, fetch, tags, store=store)
+
+
+def _object_tag(object_id):
+    # Post ids look like "<page>_<post>" and comment ids like "<post>_<comment>",
+    # so reads about an object are tagged with the last part of its id
+    return f"object:{str(object_id).split('_')[-1]}"
+
+
+def _post_list_tags(value):
+    # Lists carry the comment counts of their posts, so a write to a comment
+    # (tagged through its post's id) must drop them too
+    posts, _ = value
+    return [_object_tag(post["id"]) for post in posts]
+
+
+def invalidate_cache(*tags):
+    """Drop cached and in-flight reads carrying any of the given tags"""
+    graph_flights.forget(*tags)
+    return graph_cache.invalidate(*tags)
+
+
+def invalidate_object(object_id):
+    """Drop cached reads affected by a write to object_id"""
+    parts = str(object_id).split("_")
+    invalidate_cache(f"posts:{parts[0]}", *[f"object:{part}" for part in parts])
+
+
+def get_cache_stats():
+    return graph_cache.stats()
+
+
+def get_flight_stats():
+    """How many Graph reads ran and how many joined one already running"""
+    return graph_flights.stats()
+
+
+def get_rate_limit_status():
+    """Current Graph API usage per app/page, for display"""
+    return graph_scheduler.budget()
+
+
+def report_api_error(e):
+    """Show a Graph API error, telling throttling apart from other failures"""
+    if isinstance(e, RateLimitedError):
+        st.warning(f"Facebook is rate limiting requests right now. Please try again in about {e.retry_after:.0f} seconds.")
+    else:
+        st.error(f"Facebook API Error: {e}")
+
+
 def get_account_api(account_id, user_id):
     """Get a Facebook Graph API client for a specific account"""
     accounts = get_user_accounts(user_id)
@@ -27,40 +152,141 @@ def get_account_api(account_id, user_id):
     return None, None
 
 
-def get_page_posts(api, page_id, limit=25):
-    """Get posts from a Facebook page"""
-    try:
-        posts = api.get_connections(
-            id=page_id,
-            connection_name="posts",
-            fields="id,message,created_time,permalink_url,shares,reactions.summary(true),comments.summary(true)",
-            limit=limit
+def fetch_connection_page(api, object_id, connection_name, fields, max_items, after=None, page_size=GRAPH_PAGE_SIZE, **params):
+    """Fetch at most max_items from a Graph connection, returning (items, next_cursor)
+
+    Each request asks only for the items still missing, so the returned
+    cursor always points right after the last item handed back.
+    """
+    items = []
+    cursor = after
+
+    while len(items) < max_items:
+        args = dict(params, fields=fields, limit=min(page_size, max_items - len(items)))
+        if cursor:
+            args["after"] = cursor
+
+        response = graph_scheduler.call(
+            scope_of(object_id),
+            api.get_connections,
+            id=object_id,
+            connection_name=connection_name,
+            **args
         )
-        
-        post_list = []
-        while posts:
-            for post in posts["data"]:
-                post_data = {
-                    "id": post.get("id"),
-                    "message": post.get("message", ""),
-                    "created_time": post.get("created_time"),
-                    "permalink_url": post.get("permalink_url"),
-                    "shares": post.get("shares", {}).get("count", 0) if post.get("shares") else 0,
-                    "reactions": post.get("reactions", {}).get("summary", {}).get("total_count", 0) if post.get("reactions") else 0,
-                    "comments": post.get("comments", {}).get("summary", {}).get("total_count", 0) if post.get("comments") else 0
-                }
-                post_list.append(post_data)
-            
-            # Get next page if available
-            if "paging" in posts and "next" in posts["paging"]:
-                posts = api.get_object(posts["paging"]["next"])
-            else:
-                break
-                
-        return post_list
+        data = response.get("data", [])
+        items.extend(data)
+
+        # Only keep the cursor if Graph says there is another page
+        paging = response.get("paging", {})
+        cursor = paging.get("cursors", {}).get("after") if "next" in paging else None
+
+        if not cursor or not data:
+            cursor = None
+            break
+
+    return items, cursor
+
+
+def _edge_total(edge):
+    """total_count of a summary edge such as reactions.limit(0).summary(total_count)"""
+    return edge["summary"].get("total_count", 0) if edge and "summary" in edge else 0
+
+
+# How each post record field is read from a Graph post object
+POST_FIELD_READERS = {
+    "id": lambda post: post.get("id"),
+    "message": lambda post: post.get("message", ""),
+    "created_time": lambda post: post.get("created_time"),
+    "permalink_url": lambda post: post.get("permalink_url"),
+    "shares": lambda post: (post.get("shares") or {}).get("count", 0),
+    "reactions": lambda post: _edge_total(post.get("reactions")),
+    "comments": lambda post: _edge_total(post.get("comments"))
+}
+
+
+def parse_posts(posts, profile="list"):
+    """Turn a page of Graph post objects into records of the given field profile"""
+    record = profile_record(profile)
+    # Resolved once per page; only the fields the profile has are read
+    readers = [POST_FIELD_READERS[field] for field in record._fields]
+    return [record._make([read(post) for read in readers]) for post in posts]
+
+
+def parse_post(post, profile="list"):
+    """Flatten a Graph post object into the record type of the given field profile"""
+    return parse_posts([post], profile)[0]
+
+
+def fetch_page_posts(api, page_id, max_items=25, after=None, profile="list"):
+    """Like get_page_posts, but raises facebook.GraphAPIError instead of reporting it"""
+    fields = profile_fields(profile)
+    posts, cursor = cached_read(
+        api,
+        "posts",
+        {"page_id": page_id, "fields": fields, "max_items": max_items, "after": after},
+        [f"posts:{page_id}"],
+        lambda: fetch_connection_page(api, page_id, "posts", fields=fields, max_items=max_items, after=after),
+        tags_for=_post_list_tags
+    )
+    return parse_posts(posts, profile), cursor
+
+
+def get_page_posts(api, page_id, max_items=25, after=None, profile="list"):
+    """Get up to max_items posts from a Facebook page, returning (posts, next_cursor)
+
+    profile names the set of fields to request, see utils/records.py.
+    """
+    try:
+        return fetch_page_posts(api, page_id, max_items=max_items, after=after, profile=profile)
     except facebook.GraphAPIError as e:
-        st.error(f"Facebook API Error: {e}")
-        return []
+        report_api_error(e)
+        return [], None
+
+
+def iter_page_posts(api, page_id, max_items=None, after=None, page_size=25, profile="list"):
+    """Yield (posts, next_cursor) one Graph page at a time, up to max_items posts in total
+
+    Raises facebook.GraphAPIError like fetch_page_posts. Stop iterating to
+    stop fetching.
+    """
+    remaining = max_items
+    cursor = after
+    
+    while remaining is None or remaining > 0:
+        limit = page_size if remaining is None else min(page_size, remaining)
+        posts, cursor = fetch_page_posts(api, page_id, max_items=limit, after=cursor, profile=profile)
+        yield posts, cursor
+        
+        if remaining is not None:
+            remaining -= len(posts)
+        if not cursor or not posts:
+            return
+
+
+def get_post_details(api, post_id, profile="detail"):
+    """Get a single post object"""
+    fields = profile_fields(profile)
+    post = cached_read(
+        api,
+        "object",
+        {"id": post_id, "fields": fields},
+        [_object_tag(post_id)],
+        lambda: graph_scheduler.call(scope_of(post_id), api.get_object, id=post_id, fields=fields)
+    )
+    return parse_post(post, profile)
+
+
+def shorten_text(series, width=50):
+    """Cut each string to width characters, marking only the ones that were cut with "..." """
+    text = series.fillna("").astype(str)
+    short = text.str.slice(0, width)
+    return short.where(text.str.len() <= width, short + "...")
+
+
+def format_created_time(series):
+    """Render Graph timestamps as "YYYY-MM-DD HH:MM", parsing the whole column in one pass"""
+    parsed = pd.to_datetime(series, format=GRAPH_TIME_FORMAT, utc=True, errors="coerce")
+    return parsed.dt.strftime("%Y-%m-%d %H:%M").fillna("")
 
 
 def format_post_data(posts):
@@ -72,14 +298,15 @@ def format_post_data(posts):
     
     # Convert created_time to datetime and format
     if "created_time" in df.columns and not df.empty:
-        df["created_time"] = pd.to_datetime(df["created_time"]).dt.strftime("%Y-%m-%d %H:%M")
+        df["created_time"] = format_created_time(df["created_time"])
     
     # Add a shortened message column for display
     if "message" in df.columns and not df.empty:
-        df["short_message"] = df["message"].str[:50] + "..."
+        df["short_message"] = shorten_text(df["message"])
     
-    # Calculate engagement rate
-    df["engagement"] = df["reactions"] + df["comments"] + df["shares"]
+    # Calculate engagement rate, for profiles that carry all the counts
+    if {"reactions", "comments", "shares"}.issubset(df.columns):
+        df["engagement"] = df["reactions"] + df["comments"] + df["shares"]
     
     return df
 
@@ -92,12 +319,16 @@ def create_post(api, page_id, message, link=None):
         if link:
             post_data["link"] = link
             
-        response = api.put_object(
+        response = graph_scheduler.call(
+            page_id,
+            api.put_object,
             parent_object=page_id, 
             connection_name="feed",
+            idempotent=False,
             **post_data
         )
         
+        invalidate_cache(f"posts:{page_id}")
         return response.get("id"), None
     except facebook.GraphAPIError as e:
         return None, str(e)
@@ -106,11 +337,14 @@ def create_post(api, page_id, message, link=None):
 def edit_post(api, post_id, message):
     """Edit an existing Facebook post"""
     try:
-        api.put_object(
+        graph_scheduler.call(
+            scope_of(post_id),
+            api.put_object,
             parent_object=post_id,
             connection_name="",
             message=message
         )
+        invalidate_object(post_id)
         return True, None
     except facebook.GraphAPIError as e:
         return False, str(e)
@@ -119,46 +353,67 @@ def edit_post(api, post_id, message):
 def delete_post(api, post_id):
     """Delete a Facebook post"""
     try:
-        api.delete_object(post_id)
+        graph_scheduler.call(scope_of(post_id), api.delete_object, post_id)
+        invalidate_object(post_id)
         return True, None
     except facebook.GraphAPIError as e:
         return False, str(e)
 
 
-def get_post_comments(api, post_id, limit=100):
-    """Get comments for a specific post"""
-    try:
-        comments = api.get_connections(
-            id=post_id,
-            connection_name="comments",
-            fields="id,message,created_time,from,comment_count,attachment",
-            limit=limit
-        )
+def parse_comment(comment):
+    """Flatten a Graph comment object into a comment record"""
+    author = comment.get("from") or {}
+    return Comment(
+        comment.get("id"),
+        comment.get("message", ""),
+        comment.get("created_time"),
+        author.get("name", "Unknown"),
+        author.get("id", ""),
+        comment.get("comment_count", 0),
+        "attachment" in comment
+    )
+
+
+def fetch_post_comments(api, post_id, max_items=100, after=None, order=None):
+    """Like get_post_comments, but raises facebook.GraphAPIError instead of reporting it"""
+    params = {"order": order} if order else {}
+    comments, cursor = cached_read(
+        api,
+        "comments",
+        {"post_id": post_id, "fields": COMMENT_FIELDS, "max_items": max_items, "after": after, **params},
+        [_object_tag(post_id)],
+        lambda: fetch_connection_page(api, post_id, "comments", fields=COMMENT_FIELDS, max_items=max_items, after=after, **params)
+    )
+    return [parse_comment(comment) for comment in comments], cursor
+
+
+def iter_post_comments(api, post_id, max_items=None, after=None, page_size=25, order=None):
+    """Yield (comments, next_cursor) one Graph page at a time, up to max_items comments in total
+
+    Raises facebook.GraphAPIError like fetch_post_comments. Stop iterating
+    to stop fetching.
+    """
+    remaining = max_items
+    cursor = after
+    
+    while remaining is None or remaining > 0:
+        limit = page_size if remaining is None else min(page_size, remaining)
+        comments, cursor = fetch_post_comments(api, post_id, max_items=limit, after=cursor, order=order)
+        yield comments, cursor
         
-        comment_list = []
-        while comments:
-            for comment in comments["data"]:
-                comment_data = {
-                    "id": comment.get("id"),
-                    "message": comment.get("message", ""),
-                    "created_time": comment.get("created_time"),
-                    "from_name": comment.get("from", {}).get("name", "Unknown") if comment.get("from") else "Unknown",
-                    "from_id": comment.get("from", {}).get("id", "") if comment.get("from") else "",
-                    "replies": comment.get("comment_count", 0),
-                    "has_attachment": "attachment" in comment
-                }
-                comment_list.append(comment_data)
-            
-            # Get next page if available
-            if "paging" in comments and "next" in comments["paging"]:
-                comments = api.get_object(comments["paging"]["next"])
-            else:
-                break
-                
-        return comment_list
+        if remaining is not None:
+            remaining -= len(comments)
+        if not cursor or not comments:
+            return
+
+
+def get_post_comments(api, post_id, max_items=100, after=None, order=None):
+    """Get up to max_items comments for a specific post, returning (comments, next_cursor)"""
+    try:
+        return fetch_post_comments(api, post_id, max_items=max_items, after=after, order=order)
     except facebook.GraphAPIError as e:
-        st.error(f"Facebook API Error: {e}")
-        return []
+        report_api_error(e)
+        return [], None
 
 
 def format_comment_data(comments):
@@ -170,11 +425,11 @@ def format_comment_data(comments):
     
     # Convert created_time to datetime and format
     if "created_time" in df.columns and not df.empty:
-        df["created_time"] = pd.to_datetime(df["created_time"]).dt.strftime("%Y-%m-%d %H:%M")
+        df["created_time"] = format_created_time(df["created_time"])
     
     # Add a shortened message column for display
     if "message" in df.columns and not df.empty:
-        df["short_message"] = df["message"].apply(lambda x: str(x)[:50] + "..." if isinstance(x, str) and len(str(x)) > 50 else str(x))
+        df["short_message"] = shorten_text(df["message"])
     
     return df
 
@@ -182,11 +437,15 @@ def format_comment_data(comments):
 def reply_to_comment(api, comment_id, message):
     """Reply to a Facebook comment"""
     try:
-        response = api.put_object(
+        response = graph_scheduler.call(
+            scope_of(comment_id),
+            api.put_object,
             parent_object=comment_id,
             connection_name="comments",
+            idempotent=False,
             message=message
         )
+        invalidate_object(comment_id)
         return response.get("id"), None
     except facebook.GraphAPIError as e:
         return None, str(e)
@@ -195,11 +454,14 @@ def reply_to_comment(api, comment_id, message):
 def edit_comment(api, comment_id, message):
     """Edit a Facebook comment"""
     try:
-        api.put_object(
+        graph_scheduler.call(
+            scope_of(comment_id),
+            api.put_object,
             parent_object=comment_id,
             connection_name="",
             message=message
         )
+        invalidate_object(comment_id)
         return True, None
     except facebook.GraphAPIError as e:
         return False, str(e)
@@ -208,50 +470,207 @@ def edit_comment(api, comment_id, message):
 def delete_comment(api, comment_id):
     """Delete a Facebook comment"""
     try:
-        api.delete_object(comment_id)
+        graph_scheduler.call(scope_of(comment_id), api.delete_object, comment_id)
+        invalidate_object(comment_id)
         return True, None
     except facebook.GraphAPIError as e:
         return False, str(e)
 
 
-def get_page_insights(api, page_id, period="day", days=30):
-    """Get page insights for the specified period"""
-    try:
-        # Define the metrics to retrieve
-        metrics = [
-            "page_impressions",
-            "page_impressions_unique",
-            "page_engaged_users",
-            "page_post_engagements",
-            "page_fans",
-            "page_fan_adds",
-            "page_fan_removes"
-        ]
-        
-        # Get the insights
-        insights = api.get_connections(
+def fetch_page_insights(api, page_id, period="day", days=30):
+    """Like get_page_insights, but raises facebook.GraphAPIError instead of reporting it"""
+    # Get the insights
+    date_preset = "last_30d" if days == 30 else f"last_{days}d"
+    insights = cached_read(
+        api,
+        "insights",
+        {"page_id": page_id, "period": period, "date_preset": date_preset},
+        [f"insights:{page_id}"],
+        lambda: graph_scheduler.call(
+            page_id,
+            api.get_connections,
             id=page_id,
             connection_name="insights",
-            metric=",".join(metrics),
+            metric=",".join(INSIGHT_METRICS),
             period=period,
-            date_preset="last_30d" if days == 30 else f"last_{days}d"
+            date_preset=date_preset
         )
+    )
+    
+    return summarize_insights(insights)
+
+
+def fetch_page_insights_series(api, page_id, period, since, until):
+    """Fetch the insight points between two naive UTC datetimes, raising facebook.GraphAPIError
+
+    Returns a list of dicts with metric, end_time and value.
+    """
+    since_ts = int(since.replace(tzinfo=datetime.timezone.utc).timestamp())
+    until_ts = int(until.replace(tzinfo=datetime.timezone.utc).timestamp())
+    insights = cached_read(
+        api,
+        "insights",
+        {"page_id": page_id, "period": period, "since": since_ts, "until": until_ts},
+        [f"insights:{page_id}"],
+        lambda: graph_scheduler.call(
+            page_id,
+            api.get_connections,
+            id=page_id,
+            connection_name="insights",
+            metric=",".join(INSIGHT_METRICS),
+            period=period,
+            since=since_ts,
+            until=until_ts
+        )
+    )
+    
+    return [
+        {"metric": metric["name"], "end_time": point["end_time"], "value": point["value"]}
+        for metric in insights["data"]
+        for point in metric["values"]
+        if isinstance(point.get("value"), (int, float))
+    ]
+
+
+def summarize_insights(insights):
+    """Collapse a Graph insights response into one value per metric"""
+    insights_data = {}
+    
+    for metric in insights["data"]:
+        metric_name = metric["name"]
+        values = [point["value"] for point in metric["values"]]
         
-        # Process the insights data
-        insights_data = {}
-        
-        for metric in insights["data"]:
-            metric_name = metric["name"]
-            values = [point["value"] for point in metric["values"]]
-            
-            # For total metrics like page_fans, take the latest value
-            if metric_name == "page_fans":
-                insights_data[metric_name] = values[-1] if values else 0
-            else:
-                # For trend metrics, take the sum
-                insights_data[metric_name] = sum(values) if values else 0
-        
-        return insights_data
+        # For total metrics like page_fans, take the latest value
+        if metric_name == "page_fans":
+            insights_data[metric_name] = values[-1] if values else 0
+        else:
+            # For trend metrics, take the sum
+            insights_data[metric_name] = sum(values) if values else 0
+    
+    return insights_data
+
+
+def get_page_insights(api, page_id, period="day", days=30):
+    """Get page insights for the specified period"""
+    try:
+        return fetch_page_insights(api, page_id, period=period, days=days)
     except facebook.GraphAPIError as e:
-        st.error(f"Facebook API Error: {e}")
+        report_api_error(e)
         return {}
+
+
+def graph_batch(api, operations):
+    """Run Graph operations as batch requests, returning (result, error) per operation
+
+    Each operation is a dict with "method", "relative_url" and an optional
+    url-encoded "body". Operations are sent GRAPH_BATCH_LIMIT at a time.
+    """
+    results = []
+    
+    for start in range(0, len(operations), GRAPH_BATCH_LIMIT):
+        chunk = operations[start:start + GRAPH_BATCH_LIMIT]
+        try:
+            # Batches can hold replies, so they are not retried on transient errors
+            responses = graph_scheduler.call(
+                None,
+                api.request,
+                api.version + "/",
+                post_args={"batch": json.dumps(chunk), "include_headers": "false"},
+                idempotent=False
+            )
+        except facebook.GraphAPIError as e:
+            results.extend([(None, str(e))] * len(chunk))
+            continue
+        
+        for response in responses:
+            results.append(_parse_batch_response(response))
+    
+    return results
+
+
+def _parse_batch_response(response):
+    # Graph returns null for operations it did not get to before timing out
+    if response is None:
+        return None, "Request was not processed"
+    
+    try:
+        body = json.loads(response.get("body") or "null")
+    except ValueError:
+        body = response.get("body")
+    
+    if isinstance(body, dict) and body.get("error"):
+        return None, str(facebook.GraphAPIError(body))
+    if response.get("code") != 200:
+        return None, f"HTTP {response.get('code')}"
+    return body, None
+
+
+def get_comments_for_posts(api, post_ids, max_items=25, order=None):
+    """Get the first max_items comments of several posts in batch requests
+
+    Returns a dict of post_id -> ((comments, next_cursor), error).
+    """
+    params = {"fields": COMMENT_FIELDS, "limit": min(max_items, GRAPH_PAGE_SIZE)}
+    if order:
+        params["order"] = order
+    operations = [
+        {"method": "GET", "relative_url": f"{post_id}/comments?{urlencode(params)}"}
+        for post_id in post_ids
+    ]
+    
+    comments = {}
+    for post_id, (response, error) in zip(post_ids, graph_batch(api, operations)):
+        if error:
+            comments[post_id] = (None, error)
+            continue
+        data = response.get("data", [])
+        paging = response.get("paging", {})
+        cursor = paging.get("cursors", {}).get("after") if "next" in paging and data else None
+        comments[post_id] = (([parse_comment(comment) for comment in data], cursor), None)
+    
+    return comments
+
+
+def _run_writes(api, object_ids, operations):
+    """Run write operations in batches and invalidate the objects that changed"""
+    results = {}
+    for object_id, (response, error) in zip(object_ids, graph_batch(api, operations)):
+        if not error:
+            invalidate_object(object_id)
+        results[object_id] = (response, error)
+    return results
+
+
+def bulk_delete_comments(api, comment_ids):
+    """Delete several comments, returning a dict of comment_id -> (success, error)"""
+    operations = [{"method": "DELETE", "relative_url": comment_id} for comment_id in comment_ids]
+    results = _run_writes(api, comment_ids, operations)
+    return {comment_id: (error is None, error) for comment_id, (_, error) in results.items()}
+
+
+def bulk_hide_comments(api, comment_ids, hidden=True):
+    """Hide or unhide several comments, returning a dict of comment_id -> (success, error)"""
+    body = urlencode({"is_hidden": "true" if hidden else "false"})
+    operations = [
+        {"method": "POST", "relative_url": comment_id, "body": body}
+        for comment_id in comment_ids
+    ]
+    results = _run_writes(api, comment_ids, operations)
+    return {comment_id: (error is None, error) for comment_id, (_, error) in results.items()}
+
+
+def bulk_reply_to_comments(api, replies):
+    """Post several replies given as (comment_id, message) pairs
+
+    Returns a dict of comment_id -> (reply_id, error).
+    """
+    comment_ids = [comment_id for comment_id, _ in replies]
+    operations = [
+        {"method": "POST", "relative_url": f"{comment_id}/comments", "body": urlencode({"message": message})}
+        for comment_id, message in replies
+    ]
+    results = _run_writes(api, comment_ids, operations)
+    return {
+        comment_id: ((response or {}).get("id"), error)
+        for comment_id, (response, error) in results.items()
+    }
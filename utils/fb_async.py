@@ -0,0 +1,304 @@
+import asyncio
+import atexit
+import threading
+import aiohttp
+import facebook
+from utils.cache import TTLCache
+from utils.rate_limit import RateLimitedError, scope_of
+from utils.records import profile_fields
+from utils.fb_api import (
+    GRAPH_PAGE_SIZE, COMMENT_FIELDS, INSIGHT_METRICS,
+    graph_cache, graph_scheduler, _cache_key, _object_tag, _post_list_tags, invalidate_cache, invalidate_object,
+    parse_posts, parse_comment, summarize_insights
+)
+from config import ASYNC_POOL_SIZE, ASYNC_KEEPALIVE
+
+GRAPH_URL = "https://graph.facebook.com/v18.0/"
+
+
+async def _off_loop(fn, *args):
+    """Run a call touching the Graph cache without blocking the event loop
+
+    The SQLite and Redis backends do blocking I/O, so their calls run on
+    the loop's default executor. The in-process cache only takes a lock,
+    which is cheaper than the hop to another thread.
+    """
+    if isinstance(graph_cache, TTLCache):
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+class AsyncGraphClient:
+    """asyncio counterpart of the helpers in utils/fb_api.py
+
+    Clients share one aiohttp session, so every account reuses the same
+    pool of keep-alive connections. Reads go through the same cache as
+    the synchronous helpers and writes invalidate it the same way.
+    """
+
+    def __init__(self, access_token, session, base_url=GRAPH_URL):
+        self.access_token = access_token
+        self.session = session
+        self.base_url = base_url
+
+    async def request(self, method, path, params=None, data=None):
+        """Make a Graph call, raising facebook.GraphAPIError on failure
+
+        Connection failures and timeouts are raised as GraphAPIError too, so
+        the write methods can report every failure as (None, error).
+        """
+        params = dict(params or {})
+        if data is None:
+            params["access_token"] = self.access_token
+        else:
+            data = dict(data, access_token=self.access_token)
+        
+        # Share the synchronous helpers' budget, but never block the event loop waiting for it
+        scope = scope_of(path.split("/")[0])
+        wait = graph_scheduler.reserve(scope, graph_scheduler.max_wait)
+        if wait > graph_scheduler.max_wait:
+            raise RateLimitedError(wait)
+        await asyncio.sleep(wait)
+        
+        try:
+            async with self.session.request(method, self.base_url + path, params=params, data=data) as response:
+                graph_scheduler.record_headers(response.headers, scope)
+                try:
+                    result = await response.json(content_type=None)
+                except ValueError:
+                    raise facebook.GraphAPIError(f"Unexpected response (HTTP {response.status})")
+        except aiohttp.ClientError as e:
+            raise facebook.GraphAPIError(f"Connection failed: {e}")
+        except asyncio.TimeoutError:
+            raise facebook.GraphAPIError("Request timed out")
+        
+        if isinstance(result, dict) and result.get("error"):
+            raise facebook.GraphAPIError(result)
+        return result
+
+    async def _cached(self, endpoint, params, tags, fetch, tags_for=None):
+        key = _cache_key(self, endpoint, params)
+        found, value = await _off_loop(graph_cache.get, key)
+        if found:
+            return value
+        value = await fetch()
+        entry_tags = [*tags, *tags_for(value)] if tags_for else tags
+        await _off_loop(graph_cache.set, key, value, graph_cache.ttl_for(endpoint), entry_tags)
+        return value
+
+    async def fetch_connection_page(self, object_id, connection_name, fields, max_items, after=None, **params):
+        """Fetch at most max_items from a Graph connection, returning (items, next_cursor)"""
+        items = []
+        cursor = after
+        
+        while len(items) < max_items:
+            args = dict(params, fields=fields, limit=min(GRAPH_PAGE_SIZE, max_items - len(items)))
+            if cursor:
+                args["after"] = cursor
+            
+            response = await self.request("GET", f"{object_id}/{connection_name}", params=args)
+            data = response.get("data", [])
+            items.extend(data)
+            
+            paging = response.get("paging", {})
+            cursor = paging.get("cursors", {}).get("after") if "next" in paging else None
+            
+            if not cursor or not data:
+                cursor = None
+                break
+        
+        return items, cursor
+
+    async def get_page_posts(self, page_id, max_items=25, after=None, profile="list"):
+        fields = profile_fields(profile)
+        posts, cursor = await self._cached(
+            "posts",
+            {"page_id": page_id, "fields": fields, "max_items": max_items, "after": after},
+            [f"posts:{page_id}"],
+            lambda: self.fetch_connection_page(page_id, "posts", fields, max_items, after),
+            tags_for=_post_list_tags
+        )
+        return parse_posts(posts, profile), cursor
+
+    async def get_post_comments(self, post_id, max_items=100, after=None, order=None):
+        params = {"order": order} if order else {}
+        comments, cursor = await self._cached(
+            "comments",
+            {"post_id": post_id, "fields": COMMENT_FIELDS, "max_items": max_items, "after": after, **params},
+            [_object_tag(post_id)],
+            lambda: self.fetch_connection_page(post_id, "comments", COMMENT_FIELDS, max_items, after, **params)
+        )
+        return [parse_comment(comment) for comment in comments], cursor
+
+    async def get_page_insights(self, page_id, period="day", days=30):
+        date_preset = "last_30d" if days == 30 else f"last_{days}d"
+        insights = await self._cached(
+            "insights",
+            {"page_id": page_id, "period": period, "date_preset": date_preset},
+            [f"insights:{page_id}"],
+            lambda: self.request("GET", f"{page_id}/insights", params={
+                "metric": ",".join(INSIGHT_METRICS),
+                "period": period,
+                "date_preset": date_preset
+            })
+        )
+        return summarize_insights(insights)
+
+    async def _write(self, method, path, object_id, data=None):
+        """Make a write call and return (response, error) like the sync helpers"""
+        try:
+            response = await self.request(method, path, data=data)
+        except facebook.GraphAPIError as e:
+            return None, str(e)
+        await _off_loop(invalidate_object, object_id)
+        return response, None
+
+    async def create_post(self, page_id, message, link=None):
+        data = {"message": message}
+        if link:
+            data["link"] = link
+        response, error = await self._write("POST", f"{page_id}/feed", page_id, data)
+        if error:
+            return None, error
+        await _off_loop(invalidate_cache, f"posts:{page_id}")
+        return response.get("id"), None
+
+    async def edit_post(self, post_id, message):
+        _, error = await self._write("POST", post_id, post_id, {"message": message})
+        return error is None, error
+
+    async def delete_post(self, post_id):
+        _, error = await self._write("DELETE", post_id, post_id)
+        return error is None, error
+
+    async def reply_to_comment(self, comment_id, message):
+        response, error = await self._write("POST", f"{comment_id}/comments", comment_id, {"message": message})
+        return (response.get("id"), None) if not error else (None, error)
+
+    async def edit_comment(self, comment_id, message):
+        _, error = await self._write("POST", comment_id, comment_id, {"message": message})
+        return error is None, error
+
+    async def delete_comment(self, comment_id):
+        _, error = await self._write("DELETE", comment_id, comment_id)
+        return error is None, error
+
+
+async def gather_results(calls, timeout=None):
+    """Run coroutines concurrently, returning (result, error) for each in order
+
+    Calls still running after timeout seconds are cancelled and reported
+    as timed out, while finished ones keep their results.
+    """
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    if not tasks:
+        return []
+    
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    
+    results = []
+    for task in tasks:
+        if task in pending:
+            results.append((None, "Timed out"))
+        elif task.exception() is not None:
+            results.append((None, str(task.exception())))
+        else:
+            results.append((task.result(), None))
+    return results
+
+
+class _EventLoopThread:
+    """Background event loop that owns the shared aiohttp session"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+        self.thread = threading.Thread(target=self.loop.run_forever, name="graph-async", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=ASYNC_POOL_SIZE, keepalive_timeout=ASYNC_KEEPALIVE)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def close(self):
+        """Close the shared session so pooled connections shut down cleanly"""
+        if self.session is not None and not self.session.closed:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result(timeout=5)
+
+    def run(self, make_coro):
+        """Run make_coro(session) on the loop and wait for its result"""
+        async def runner():
+            return await make_coro(await self._get_session())
+        return asyncio.run_coroutine_threadsafe(runner(), self.loop).result()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def _get_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = _EventLoopThread()
+        return _runner
+
+
+class SyncGraphClient:
+    """Blocking facade over AsyncGraphClient for use from Streamlit pages
+
+    Methods mirror AsyncGraphClient. The *_many methods fan out over
+    several objects at once and return (result, error) per object.
+    """
+
+    def __init__(self, access_token, base_url=GRAPH_URL):
+        self.access_token = access_token
+        self.base_url = base_url
+
+    def _call(self, method_name, *args, **kwargs):
+        def make_coro(session):
+            client = AsyncGraphClient(self.access_token, session, self.base_url)
+            return getattr(client, method_name)(*args, **kwargs)
+        return _get_runner().run(make_coro)
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_") or not hasattr(AsyncGraphClient, method_name):
+            raise AttributeError(method_name)
+        return lambda *args, **kwargs: self._call(method_name, *args, **kwargs)
+
+    def get_many_page_posts(self, page_ids, max_items=25):
+        async def make_coro(session):
+            client = AsyncGraphClient(self.access_token, session, self.base_url)
+            return await gather_results([client.get_page_posts(page_id, max_items=max_items) for page_id in page_ids])
+        return dict(zip(page_ids, _get_runner().run(make_coro)))
+
+    def get_many_post_comments(self, post_ids, max_items=100):
+        async def make_coro(session):
+            client = AsyncGraphClient(self.access_token, session, self.base_url)
+            return await gather_results([client.get_post_comments(post_id, max_items=max_items) for post_id in post_ids])
+        return dict(zip(post_ids, _get_runner().run(make_coro)))
+
+
+def fetch_accounts_overview(accounts, max_posts=10, period="day", days=30, timeout=None):
+    """Fetch recent posts and insights for many accounts in one asyncio.gather
+
+    Returns a dict of account id -> {"posts": (result, error), "insights": (result, error)}.
+    """
+    async def make_coro(session):
+        calls = []
+        for account in accounts:
+            client = AsyncGraphClient(account.access_token, session)
+            calls.append(client.get_page_posts(account.page_id, max_items=max_posts, profile="dashboard"))
+            calls.append(client.get_page_insights(account.page_id, period=period, days=days))
+        return await gather_results(calls, timeout=timeout)
+    
+    outcomes = _get_runner().run(make_coro)
+    return {
+        account.id: {"posts": outcomes[2 * index], "insights": outcomes[2 * index + 1]}
+        for index, account in enumerate(accounts)
+    }
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.db import get_user_accounts
+from utils.fb_api import get_facebook_api, fetch_page_posts, fetch_page_insights
+from config import FETCH_MAX_WORKERS, FETCH_PER_TOKEN_LIMIT, FETCH_DEADLINE, GRAPH_BACKEND
+
+
+def _run_limited(semaphore, deadline, fetch, *args, **kwargs):
+    """Run fetch once a slot for its access token is free, unless the deadline passed first"""
+    if not semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+        raise TimeoutError("Timed out waiting for a free connection")
+    try:
+        return fetch(*args, **kwargs)
+    finally:
+        semaphore.release()
+
+
+def fetch_all_accounts(user_id, max_posts=10, period="day", days=30,
+                       max_workers=FETCH_MAX_WORKERS, per_token_limit=FETCH_PER_TOKEN_LIMIT,
+                       deadline=FETCH_DEADLINE):
+    """Fetch recent posts and insights for every account of a user in parallel
+
+    Returns (results, complete). results holds one dict per account with
+    "account", "posts", "insights" and "errors"; anything that failed or did
+    not finish before the deadline is None and has an entry in "errors".
+    """
+    accounts = get_user_accounts(user_id)
+    results = {
+        account.id: {"account": account, "posts": None, "insights": None, "errors": {}}
+        for account in accounts
+    }
+    if not accounts:
+        return [], True
+    
+    if GRAPH_BACKEND == "async":
+        return _fetch_all_async(accounts, results, max_posts, period, days, deadline)
+    
+    ends_at = time.monotonic() + deadline
+    semaphores = {}
+    futures = {}
+    
+    # Clients are created here so the Streamlit resource cache is only touched from the script thread
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for account in accounts:
+            api = get_facebook_api(account.access_token)
+            if api is None:
+                results[account.id]["errors"]["api"] = "Could not initialize the Facebook API client"
+                continue
+            
+            semaphore = semaphores.setdefault(account.access_token, threading.BoundedSemaphore(per_token_limit))
+            futures[pool.submit(_run_limited, semaphore, ends_at, fetch_page_posts, api, account.page_id, max_items=max_posts, profile="dashboard")] = (account.id, "posts")
+            futures[pool.submit(_run_limited, semaphore, ends_at, fetch_page_insights, api, account.page_id, period=period, days=days)] = (account.id, "insights")
+        
+        done, not_done = wait(futures, timeout=max(ends_at - time.monotonic(), 0))
+    finally:
+        # Don't wait on stragglers; their results are reported as timed out
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    for future in done:
+        account_id, kind = futures[future]
+        try:
+            value = future.result()
+        except Exception as e:
+            results[account_id]["errors"][kind] = str(e)
+            continue
+        results[account_id][kind] = value[0] if kind == "posts" else value
+    
+    for future in not_done:
+        account_id, kind = futures[future]
+        results[account_id]["errors"][kind] = "Timed out"
+    
+    complete = not not_done and all(not result["errors"] for result in results.values())
+    return list(results.values()), complete
+
+
+def _fetch_all_async(accounts, results, max_posts, period, days, deadline):
+    """Same as fetch_all_accounts, using the asyncio backend's single gather"""
+    from utils.fb_async import fetch_accounts_overview
+    
+    outcomes = fetch_accounts_overview(accounts, max_posts=max_posts, period=period, days=days, timeout=deadline)
+    for account_id, kinds in outcomes.items():
+        for kind, (value, error) in kinds.items():
+            if error:
+                results[account_id]["errors"][kind] = error
+            else:
+                results[account_id][kind] = value[0] if kind == "posts" else value
+    
+    complete = all(not result["errors"] for result in results.values())
+    return list(results.values()), complete
@@ -0,0 +1,59 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from config import BCRYPT_ROUNDS, PASSWORD_WORKERS, PASSWORD_QUEUE_TIMEOUT
+
+# Hashes queued or running per worker process before further logins wait for a slot
+PENDING_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(PASSWORD_WORKERS, 1) * PENDING_PER_WORKER)
+
+
+# Run in the worker processes, so they only take and return picklable bytes
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: forking the multi-threaded Streamlit server can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _run(function, *args):
+    """Run a bcrypt call in the process pool, waiting at most PASSWORD_QUEUE_TIMEOUT for a slot"""
+    if not PASSWORD_WORKERS:
+        return function(*args)
+    
+    if not _slots.acquire(timeout=PASSWORD_QUEUE_TIMEOUT):
+        raise TimeoutError("Too many sign-ins at once, please try again in a moment")
+    try:
+        return _get_pool().submit(function, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    """bcrypt hash of password at the configured cost"""
+    return _run(_hashpw, password.encode("utf-8"), rounds).decode("utf-8")
+
+
+def check_password(password, password_hash):
+    """Check password against a stored bcrypt hash"""
+    return _run(_checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with a cost other than the configured one"""
+    # bcrypt hashes read "$2b$<cost>$<salt and hash>"
+    return int(password_hash.split("$")[2]) != BCRYPT_ROUNDS
@@ -0,0 +1,196 @@
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import facebook
+import requests
+
+# Graph error codes that mean "slow down": app, user, page, custom and business use case limits
+THROTTLE_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+
+# Graph error codes for temporary server-side failures that are worth retrying
+TRANSIENT_CODES = {1, 2}
+
+
+class RateLimitedError(facebook.GraphAPIError):
+    """Raised when Facebook keeps throttling us, or our own budget says to wait too long"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Rate limited by Facebook, retry in {retry_after:.0f}s")
+
+
+class TokenBucket:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, rate):
+        """Take a token, returning how many seconds the caller must wait for it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / rate
+
+    def refund(self):
+        """Give back a token whose call was never made"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+def _usage_percent(entry):
+    """The highest of the call count / CPU / time percentages in a usage header entry"""
+    return max(
+        entry.get("call_count", 0) or 0,
+        entry.get("total_cputime", 0) or 0,
+        entry.get("total_time", 0) or 0
+    )
+
+
+def scope_of(object_id):
+    """The page a Graph object belongs to, as far as its id tells"""
+    return str(object_id).split("_")[0] if object_id else None
+
+
+class RateLimitScheduler:
+    """Paces Graph calls per app and per page and retries throttled ones
+
+    Usage reported in the X-App-Usage, X-Page-Usage and
+    X-Business-Use-Case-Usage headers shrinks the refill rate of the
+    matching token bucket once it passes slowdown_at percent, so we slow
+    down before Facebook starts rejecting calls.
+    """
+
+    def __init__(self, rate=10, slowdown_at=75, max_retries=3, backoff_base=1.0, max_wait=30):
+        self.rate = rate
+        self.slowdown_at = slowdown_at
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._usage = {}
+        self._blocked_until = {}
+
+    def _keys(self, scope):
+        return ["app", f"page:{scope}"] if scope else ["app"]
+
+    def _effective_rate(self, key):
+        usage = self._usage.get(key, 0)
+        if usage < self.slowdown_at:
+            return self.rate
+        headroom = max(100 - usage, 0) / (100 - self.slowdown_at)
+        return self.rate * max(headroom, 0.05)
+
+    def reserve(self, scope=None, max_wait=None):
+        """Reserve a call for scope, returning how many seconds to wait before making it
+
+        When the wait would exceed max_wait nothing is reserved, so callers
+        that give up do not push back the calls that follow.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = 0
+            buckets = []
+            for key in self._keys(scope):
+                wait = max(wait, self._blocked_until.get(key, 0) - now)
+                bucket = self._buckets.setdefault(key, TokenBucket(self.rate))
+                wait = max(wait, bucket.reserve(self._effective_rate(key)))
+                buckets.append(bucket)
+            
+            if max_wait is not None and wait > max_wait:
+                for bucket in buckets:
+                    bucket.refund()
+            return max(wait, 0)
+
+    def block(self, scope, seconds):
+        """Hold back every call for scope (and the app) for the given number of seconds"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            for key in self._keys(scope):
+                self._blocked_until[key] = max(self._blocked_until.get(key, 0), until)
+
+    def record_headers(self, headers, scope=None):
+        """Update usage from the rate limit headers of a Graph response"""
+        with self._lock:
+            app_usage = headers.get("x-app-usage")
+            if app_usage:
+                self._usage["app"] = _usage_percent(json.loads(app_usage))
+            
+            page_usage = headers.get("x-page-usage")
+            if page_usage and scope:
+                self._usage[f"page:{scope}"] = _usage_percent(json.loads(page_usage))
+            
+            business_usage = headers.get("x-business-use-case-usage")
+            if business_usage:
+                for object_id, entries in json.loads(business_usage).items():
+                    key = f"page:{object_id}"
+                    self._usage[key] = max(_usage_percent(entry) for entry in entries) if entries else 0
+                    # estimated_time_to_regain_access is given in minutes
+                    regain = max((entry.get("estimated_time_to_regain_access", 0) or 0 for entry in entries), default=0)
+                    if regain:
+                        self._blocked_until[key] = time.monotonic() + regain * 60
+
+    def record_response(self, response, *args, **kwargs):
+        """requests response hook feeding record_headers"""
+        try:
+            segments = urlparse(response.url).path.strip("/").split("/")
+            scope = scope_of(segments[1]) if len(segments) > 1 else None
+            self.record_headers(response.headers, scope)
+        except (ValueError, TypeError, AttributeError):
+            # Malformed usage headers must never break the actual call
+            pass
+
+    def call(self, scope, fn, *args, idempotent=True, **kwargs):
+        """Call fn once the budget allows it, retrying throttled and transient failures
+
+        Calls that create something pass idempotent=False: a transient error
+        may come after Facebook already applied them, so only throttling
+        rejections are retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            wait = self.reserve(scope, self.max_wait)
+            if wait > self.max_wait:
+                raise RateLimitedError(wait)
+            time.sleep(wait)
+            
+            try:
+                return fn(*args, **kwargs)
+            except facebook.GraphAPIError as e:
+                throttled = e.code in THROTTLE_CODES
+                if not throttled and (e.code not in TRANSIENT_CODES or not idempotent):
+                    raise
+                error = e
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent:
+                    raise
+                throttled = False
+                error = e
+            
+            # Full jitter exponential backoff
+            delay = random.uniform(0, self.backoff_base * 2 ** attempt)
+            if throttled:
+                self.block(scope, delay)
+            if attempt == self.max_retries:
+                break
+            time.sleep(delay)
+        
+        if throttled:
+            raise RateLimitedError(self.backoff_base * 2 ** self.max_retries)
+        raise error
+
+    def budget(self):
+        """Current usage and wait per app/page key, for display"""
+        with self._lock:
+            now = time.monotonic()
+            keys = set(self._usage) | set(self._buckets) | set(self._blocked_until)
+            return {
+                key: {
+                    "usage": self._usage.get(key, 0),
+                    "rate": self._effective_rate(key),
+                    "blocked_for": max(self._blocked_until.get(key, 0) - now, 0)
+                }
+                for key in sorted(keys)
+            }
@@ -0,0 +1,82 @@
+from typing import NamedTuple
+
+# Reaction and comment edges ask for the total count only; limit(0) stops Graph
+# from also building and returning the first page of individual reactions/comments
+_COUNTS = "reactions.limit(0).summary(total_count),comments.limit(0).summary(total_count)"
+
+
+# Records are NamedTuples: a tuple per item instead of a dict, so long lists of
+# posts/comments stay small, and pd.DataFrame takes the field names as columns
+class DetailPost(NamedTuple):
+    """Post header on the comments page"""
+    id: str
+    message: str
+    created_time: str
+    permalink_url: str
+
+
+class CommentPickerPost(NamedTuple):
+    """Row of the post picker on the comments page"""
+    id: str
+    message: str
+    created_time: str
+    comments: int
+
+
+class DashboardPost(NamedTuple):
+    """Row of the dashboard engagement chart and the accounts overview"""
+    id: str
+    message: str
+    created_time: str
+    comments: int
+    reactions: int
+    shares: int
+
+
+class ListPost(NamedTuple):
+    """Row of the posts page, which also shows details and links out; also what the local store returns"""
+    id: str
+    message: str
+    created_time: str
+    comments: int
+    reactions: int
+    shares: int
+    permalink_url: str
+
+
+class Comment(NamedTuple):
+    """A top-level comment of a post"""
+    id: str
+    message: str
+    created_time: str
+    from_name: str
+    from_id: str
+    replies: int
+    has_attachment: bool
+
+
+class SearchHit(NamedTuple):
+    """A stored post or comment matched by full-text search"""
+    id: str
+    page_id: str
+    post_id: str
+    message: str
+    created_time: str
+    from_name: str
+
+
+# Named field profiles: the Graph fields each view needs and the record it gets back
+POST_PROFILES = {
+    "list": ("id,message,created_time,permalink_url,shares," + _COUNTS, ListPost),
+    "detail": ("id,message,created_time,permalink_url", DetailPost),
+    "dashboard": ("id,message,created_time,shares," + _COUNTS, DashboardPost),
+    "comment_picker": ("id,message,created_time,comments.limit(0).summary(total_count)", CommentPickerPost)
+}
+
+
+def profile_fields(profile):
+    return POST_PROFILES[profile][0]
+
+
+def profile_record(profile):
+    return POST_PROFILES[profile][1]
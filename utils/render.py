@@ -0,0 +1,85 @@
+import math
+import streamlit as st
+
+
+def stream_table(placeholder, batches, format_data, columns, window):
+    """Render record batches into placeholder as they arrive
+
+    Only the first window rows are kept and drawn. Later batches are still
+    consumed, so a sync generator runs to the end, but they are dropped
+    right away. Returns the rows that were drawn.
+    """
+    rows = []
+    
+    for batch in batches:
+        if len(rows) >= window:
+            continue
+        
+        rows.extend(batch[:window - len(rows)])
+        df = format_data(rows)
+        if not df.empty:
+            placeholder.dataframe(df[columns], use_container_width=True, hide_index=True)
+    
+    return rows
+
+
+def paged_table(key, query, format_data, columns, page_size, sorts, stream=None, empty_message="No rows found."):
+    """Render one page of a query-backed table with filter, sort and paging controls
+
+    query(offset, limit, sort, descending, search) returns (records, total)
+    for the visible slice only, so just page_size rows are fetched,
+    formatted and drawn however large the table grows. sorts maps the
+    sortable columns to their labels, the first one being the default
+    order. Record batches from stream (e.g. a sync) preview the first page
+    while they arrive. Returns the visible records and their formatted frame.
+    """
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        search = st.text_input("Filter", key=f"{key}_search", placeholder="Search messages")
+    with col2:
+        sort = st.selectbox("Sort by", options=list(sorts), format_func=sorts.get, key=f"{key}_sort")
+    with col3:
+        descending = st.checkbox("Descending", value=True, key=f"{key}_descending")
+    
+    # A new filter or order starts over from the first page
+    view = (search, sort, descending)
+    paging = st.session_state.setdefault(f"{key}_paging", {"view": view, "page": 0})
+    if paging["view"] != view:
+        paging.update(view=view, page=0)
+    
+    table = st.empty()
+    if stream is not None:
+        if paging["page"] == 0 and view == ("", next(iter(sorts)), True):
+            stream_table(table, stream, format_data, columns, window=page_size)
+        else:
+            # Batches arrive newest first, so they only match the default first page
+            for _ in stream:
+                pass
+    
+    records, total = query(paging["page"] * page_size, page_size, sort, descending, search or None)
+    pages = max(math.ceil(total / page_size), 1)
+    if paging["page"] >= pages:
+        # Rows were deleted, or the page size grew, under the current page
+        paging["page"] = pages - 1
+        records, total = query(paging["page"] * page_size, page_size, sort, descending, search or None)
+    
+    df = format_data(records)
+    if df.empty:
+        table.info("Nothing matches the filter." if search else empty_message)
+    else:
+        table.dataframe(df[columns], use_container_width=True, hide_index=True)
+    
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 3, 1])
+        with col1:
+            if st.button("← Previous", key=f"{key}_previous", disabled=paging["page"] == 0, use_container_width=True):
+                paging["page"] -= 1
+                st.experimental_rerun()
+        with col2:
+            st.caption(f"Page {paging['page'] + 1} of {pages} ({total} rows)")
+        with col3:
+            if st.button("Next →", key=f"{key}_next", disabled=paging["page"] >= pages - 1, use_container_width=True):
+                paging["page"] += 1
+                st.experimental_rerun()
+    
+    return records, df
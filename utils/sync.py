@@ -0,0 +1,299 @@
+import datetime
+import facebook
+from utils.db import (
+    parse_graph_time, upsert_posts, upsert_comments,
+    count_stored_posts, count_stored_comments,
+    get_sync_state, save_sync_state, get_insight_bounds, upsert_insights, request_sync,
+    request_comment_sync
+)
+from utils.fb_api import (
+    invalidate_cache, invalidate_object, get_page_posts, get_post_comments, get_comments_for_posts,
+    iter_page_posts, iter_post_comments, fetch_page_insights_series, report_api_error
+)
+from config import SYNC_INTERVAL, INSIGHTS_SYNC_INTERVAL, SYNC_MODE
+
+# Number of items requested per Graph call while syncing
+SYNC_BATCH_SIZE = 25
+
+# Graph serves at most 93 days of insights per request
+INSIGHTS_CHUNK_DAYS = 90
+
+# Facebook can still revise the most recent insights days, so they are always refetched
+INSIGHTS_REVISION_DAYS = 2
+
+
+def background_sync():
+    """Check whether worker processes keep the local store current, so pages only read it"""
+    return SYNC_MODE == "worker"
+
+
+def _is_fresh(state, force, interval=SYNC_INTERVAL):
+    """Check whether a feed was synced recently enough to skip it"""
+    if force or state is None or state.synced_at is None:
+        return False
+    age = datetime.datetime.utcnow() - state.synced_at
+    return age.total_seconds() < interval
+
+
+def _iter_sync_newest(key, batches, store, initial_items, force):
+    """Fetch items newer than the stored high-water mark, upsert them and yield each batch
+
+    Graph returns both feeds newest first, so we stop at the first batch
+    that reaches an item we already have. The overlapping batch is still
+    upserted so the engagement counts of recent items stay current.
+    batches(max_items) yields (items, next_cursor) pages from the newest.
+    The generator returns (synced, error) when done.
+    """
+    state = get_sync_state(key)
+    if _is_fresh(state, force):
+        return 0, None
+    
+    high_water = state.high_water if state else None
+    backfill_cursor = state.backfill_cursor if state else None
+    newest = high_water
+    synced = 0
+    
+    try:
+        for items, after in batches(None if high_water else initial_items):
+            count, error = store(items)
+            if error:
+                return synced, error
+            synced += count
+            yield items
+            
+            times = [parse_graph_time(item.created_time) for item in items if item.created_time]
+            if times and (newest is None or max(times) > newest):
+                newest = max(times)
+            
+            if not high_water:
+                # First sync: remember where older items continue
+                backfill_cursor = after
+            elif any(time <= high_water for time in times):
+                break
+    except facebook.GraphAPIError as e:
+        report_api_error(e)
+        return synced, str(e)
+    
+    save_sync_state(
+        key,
+        high_water=newest,
+        backfill_cursor=backfill_cursor,
+        synced_at=datetime.datetime.utcnow()
+    )
+    return synced, None
+
+
+def _consume(batches):
+    """Run a sync generator to the end, returning its (synced, error) result"""
+    try:
+        while True:
+            next(batches)
+    except StopIteration as done:
+        return done.value
+
+
+def _backfill(key, fetch, store, count):
+    """Fetch up to count older items from the stored backfill cursor"""
+    state = get_sync_state(key)
+    if not state or not state.backfill_cursor:
+        return 0, None
+    
+    items, after = fetch(count, state.backfill_cursor)
+    stored, error = store(items)
+    if error:
+        return 0, error
+    
+    save_sync_state(key, backfill_cursor=after)
+    return stored, None
+
+
+def _posts_key(page_id, profile):
+    # Each field profile keeps its own high-water mark, so a narrow sync never
+    # makes a wider one skip posts whose extra fields were not fetched yet
+    return f"posts:{page_id}" if profile == "list" else f"posts:{page_id}:{profile}"
+
+
+def iter_sync_page_posts(api, page_id, initial_items=50, force=False, profile="list"):
+    """Sync new posts of a page into the local store, yielding each stored batch"""
+    if force:
+        # A forced sync is an explicit refresh, so skip cached Graph pages too
+        invalidate_cache(f"posts:{page_id}")
+    return _iter_sync_newest(
+        _posts_key(page_id, profile),
+        lambda max_items: iter_page_posts(api, page_id, max_items=max_items, page_size=SYNC_BATCH_SIZE, profile=profile),
+        lambda posts: upsert_posts(page_id, posts),
+        initial_items,
+        force
+    )
+
+
+def sync_page_posts(api, page_id, initial_items=50, force=False, profile="list"):
+    """Sync new posts of a page into the local store, fetching the fields of profile"""
+    return _consume(iter_sync_page_posts(api, page_id, initial_items, force, profile))
+
+
+def iter_sync_post_comments(api, page_id, post_id, initial_items=100, force=False):
+    """Sync new comments of a post into the local store, yielding each stored batch"""
+    if force:
+        invalidate_object(post_id)
+    return _iter_sync_newest(
+        f"comments:{post_id}",
+        lambda max_items: iter_post_comments(
+            api, post_id, max_items=max_items, page_size=SYNC_BATCH_SIZE, order="reverse_chronological"
+        ),
+        lambda comments: upsert_comments(page_id, post_id, comments),
+        initial_items,
+        force
+    )
+
+
+def sync_post_comments(api, page_id, post_id, initial_items=100, force=False):
+    """Sync new comments of a post into the local store"""
+    return _consume(iter_sync_post_comments(api, page_id, post_id, initial_items, force))
+
+
+def _continue_batches(first_page, fetch_rest):
+    """batches() for _iter_sync_newest whose first page was already fetched
+
+    fetch_rest(max_items, after) yields the pages after it.
+    """
+    def batches(max_items):
+        items, after = first_page
+        yield items, after
+        remaining = None if max_items is None else max_items - len(items)
+        if after and items and (remaining is None or remaining > 0):
+            yield from fetch_rest(remaining, after)
+    return batches
+
+
+def _sync_prefetched_comments(api, page_id, post_id, first_page, initial_items):
+    return _consume(_iter_sync_newest(
+        f"comments:{post_id}",
+        _continue_batches(first_page, lambda max_items, after: iter_post_comments(
+            api, post_id, max_items=max_items, after=after, page_size=SYNC_BATCH_SIZE, order="reverse_chronological"
+        )),
+        lambda comments: upsert_comments(page_id, post_id, comments),
+        initial_items,
+        # Freshness was checked before the batch request
+        True
+    ))
+
+
+def sync_posts_comments(api, page_id, post_ids, initial_items=100, force=False):
+    """Sync new comments of several posts, returning a dict of post_id -> (synced, error)
+
+    The first page of every post due for a sync comes from one batch
+    request; only posts with more new comments than that page go on to
+    fetch the rest by themselves.
+    """
+    due = [post_id for post_id in post_ids if not _is_fresh(get_sync_state(f"comments:{post_id}"), force)]
+    if force:
+        for post_id in due:
+            invalidate_object(post_id)
+    
+    results = {post_id: (0, None) for post_id in post_ids}
+    first_pages = get_comments_for_posts(api, due, max_items=SYNC_BATCH_SIZE, order="reverse_chronological")
+    for post_id in due:
+        first_page, error = first_pages[post_id]
+        if error:
+            results[post_id] = (0, error)
+        else:
+            results[post_id] = _sync_prefetched_comments(api, page_id, post_id, first_page, initial_items)
+    return results
+
+
+def ensure_stored_posts(api, page_id, count, profile="list"):
+    """Backfill older posts until at least count are stored, if Graph has them"""
+    missing = count - count_stored_posts(page_id)
+    if missing <= 0:
+        return 0, None
+    return _backfill(
+        _posts_key(page_id, profile),
+        lambda limit, after: get_page_posts(api, page_id, max_items=limit, after=after, profile=profile),
+        lambda posts: upsert_posts(page_id, posts),
+        missing
+    )
+
+
+def ensure_stored_comments(api, page_id, post_id, count):
+    """Backfill older comments until at least count are stored, if Graph has them"""
+    missing = count - count_stored_comments(post_id)
+    if missing <= 0:
+        return 0, None
+    return _backfill(
+        f"comments:{post_id}",
+        lambda limit, after: get_post_comments(api, post_id, max_items=limit, after=after, order="reverse_chronological"),
+        lambda comments: upsert_comments(page_id, post_id, comments),
+        missing
+    )
+
+
+def sync_page_insights(api, page_id, period="day", days=30, force=False):
+    """Fetch only the insights days of the last `days` days missing from the local store
+
+    The sync state remembers how far back the page was already covered
+    (backfill_cursor, as an ISO date), so widening the range fetches only
+    the older days, and the newest days are refetched at most every
+    INSIGHTS_SYNC_INTERVAL seconds.
+    """
+    key = f"insights:{page_id}:{period}"
+    state = get_sync_state(key)
+    now = datetime.datetime.utcnow()
+    start = now - datetime.timedelta(days=days)
+    _, latest = get_insight_bounds(page_id, period)
+    
+    covered_from = datetime.datetime.fromisoformat(state.backfill_cursor) if state and state.backfill_cursor else None
+    fetch_newest = not _is_fresh(state, force, INSIGHTS_SYNC_INTERVAL)
+    
+    ranges = []
+    if covered_from is None:
+        ranges.append((start, now))
+    else:
+        if start < covered_from:
+            ranges.append((start, covered_from))
+        if fetch_newest:
+            newest_from = latest - datetime.timedelta(days=INSIGHTS_REVISION_DAYS) if latest else covered_from
+            ranges.append((max(newest_from, start), now))
+    
+    synced = 0
+    try:
+        for since, until in ranges:
+            while since < until:
+                chunk_end = min(since + datetime.timedelta(days=INSIGHTS_CHUNK_DAYS), until)
+                points = fetch_page_insights_series(api, page_id, period, since, chunk_end)
+                count, error = upsert_insights(page_id, period, points)
+                if error:
+                    return synced, error
+                synced += count
+                since = chunk_end
+    except facebook.GraphAPIError as e:
+        report_api_error(e)
+        return synced, str(e)
+    
+    fields = {"backfill_cursor": min(start, covered_from or start).isoformat()}
+    if fetch_newest:
+        fields["synced_at"] = now
+    save_sync_state(key, **fields)
+    return synced, None
+
+
+def refresh_posts(api, account, profile="list"):
+    """Pick up a change to an account's posts: sync now, or queue it for the worker"""
+    if background_sync():
+        return request_sync(account.id, "posts")
+    return sync_page_posts(api, account.page_id, force=True, profile=profile)
+
+
+def refresh_comments(api, account, post_id):
+    """Pick up a change to a post's comments: sync now, or queue the post for the worker"""
+    if background_sync():
+        return request_comment_sync(account.id, post_id)
+    return sync_post_comments(api, account.page_id, post_id, force=True)
+
+
+def queue_unsynced_comments(account, post_id):
+    """Queue a post whose comments no worker has synced yet, returning whether it was"""
+    if get_sync_state(f"comments:{post_id}") is not None:
+        return False
+    request_comment_sync(account.id, post_id)
+    return True
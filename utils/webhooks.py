@@ -0,0 +1,250 @@
+import datetime
+import hashlib
+import hmac
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from utils.db import apply_feed_events, prune_webhook_events
+from config import WEBHOOK_BATCH_SIZE, WEBHOOK_FLUSH_INTERVAL, WEBHOOK_DEDUPE_HOURS
+
+# Feed items that are posts; everything else except comments (reactions, likes...) is ignored
+POST_ITEMS = {"status", "post", "photo", "video", "share", "link"}
+
+# Seconds between prunes of old delivered event keys
+PRUNE_INTERVAL = 3600
+
+# Attempts per batch; a retry skips events another receiver applied concurrently
+FLUSH_ATTEMPTS = 2
+
+# Seconds before a batch that could not be written is tried again, doubling up to the max
+RETRY_BASE = 1
+RETRY_MAX = 60
+
+
+def sign_payload(body, app_secret):
+    """X-Hub-Signature-256 header value for a raw request body"""
+    return "sha256=" + hmac.new(app_secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature, app_secret):
+    """Check a delivery's X-Hub-Signature-256 header against the raw body"""
+    if not app_secret or not signature:
+        return False
+    return hmac.compare_digest(signature, sign_payload(body, app_secret))
+
+
+def parse_feed_events(payload):
+    """Flatten a Page Webhooks payload into (event_key, page_id, change) for its feed changes"""
+    if payload.get("object") != "page":
+        return []
+
+    events = []
+    for entry in payload.get("entry", []):
+        for change in entry.get("changes", []):
+            if change.get("field") != "feed" or not isinstance(change.get("value"), dict):
+                continue
+            value = change["value"]
+            # Redeliveries repeat the change verbatim, so its content identifies it
+            key = hashlib.sha1(json.dumps([entry.get("id"), value], sort_keys=True).encode("utf-8")).hexdigest()
+            events.append((key, entry.get("id"), value))
+    return events
+
+
+def _event_time(value):
+    if not value.get("created_time"):
+        return None
+    created = value["created_time"]
+    if isinstance(created, (int, float)):
+        return datetime.datetime.fromtimestamp(created, datetime.timezone.utc).replace(tzinfo=None)
+    return created
+
+
+def _post_record(value):
+    record = {"id": value["post_id"]}
+    if "message" in value:
+        record["message"] = value["message"]
+    if _event_time(value):
+        record["created_time"] = _event_time(value)
+    return record
+
+
+def _comment_record(value):
+    record = {"id": value["comment_id"]}
+    if "message" in value:
+        record["message"] = value["message"]
+    if _event_time(value):
+        record["created_time"] = _event_time(value)
+    if value.get("from"):
+        record["from_name"] = value["from"].get("name", "Unknown")
+        record["from_id"] = value["from"].get("id", "")
+    if "photo" in value or "video" in value:
+        record["has_attachment"] = True
+    return record
+
+
+def coalesce_events(events):
+    """Reduce (page_id, change) pairs to the changes apply_feed_events writes
+
+    Changes to the same post or comment are merged in arrival order, so an
+    add followed by an edit becomes one upsert and an add followed by a
+    remove becomes a delete. Replies update their parent comment's count
+    instead of being stored, like the comment sync does.
+    """
+    posts = defaultdict(dict)
+    comments = defaultdict(dict)
+    removed_posts = set()
+    removed_comments = set()
+    comment_counts = defaultdict(int)
+    reply_counts = defaultdict(int)
+
+    for page_id, value in events:
+        item, verb = value.get("item"), value.get("verb")
+
+        if item in POST_ITEMS and value.get("post_id"):
+            post_id = value["post_id"]
+            if verb == "remove":
+                posts[page_id].pop(post_id, None)
+                removed_posts.add(post_id)
+            else:
+                merged = posts[page_id].get(post_id, {})
+                merged.update(_post_record(value))
+                posts[page_id][post_id] = merged
+                removed_posts.discard(post_id)
+
+        elif item == "comment" and value.get("comment_id") and value.get("post_id"):
+            comment_id, post_id = value["comment_id"], value["post_id"]
+            step = {"add": 1, "remove": -1}.get(verb, 0)
+
+            if value.get("parent_id", post_id) != post_id:
+                reply_counts[value["parent_id"]] += step
+            elif verb == "remove":
+                comments[(page_id, post_id)].pop(comment_id, None)
+                removed_comments.add(comment_id)
+                comment_counts[post_id] += step
+            else:
+                merged = comments[(page_id, post_id)].get(comment_id, {})
+                merged.update(_comment_record(value))
+                comments[(page_id, post_id)][comment_id] = merged
+                removed_comments.discard(comment_id)
+                comment_counts[post_id] += step
+
+    return (
+        {page_id: list(records.values()) for page_id, records in posts.items() if records},
+        {key: list(records.values()) for key, records in comments.items() if records},
+        removed_posts,
+        removed_comments,
+        dict(comment_counts),
+        dict(reply_counts)
+    )
+
+
+class FeedBatcher:
+    """Collect feed events from the request threads and write them in batches
+
+    One writer thread drains the queue and applies up to batch_size events
+    per transaction, waiting at most flush_interval seconds for a batch to
+    fill. Redeliveries are dropped by apply_feed_events. Deliveries are
+    acknowledged before they are written, so Facebook never sends them
+    again: a batch that fails is kept and retried with backoff, ahead of
+    newer events, until the database takes it.
+    """
+
+    def __init__(self, batch_size=WEBHOOK_BATCH_SIZE, flush_interval=WEBHOOK_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="feed-batcher", daemon=True)
+        self._lock = threading.Lock()
+        self._last_prune = None
+        self._failed_batch = None
+        self.received = 0
+        self.duplicates = 0
+        self.applied = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, events):
+        with self._lock:
+            self.received += len(events)
+        for event in events:
+            self._queue.put(event)
+
+    def stop(self, timeout=None):
+        """Write whatever is still queued, then stop the writer thread
+
+        While the database is unreachable this keeps retrying, so without
+        a timeout it waits for the database to come back.
+        """
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "received": self.received,
+                "duplicates": self.duplicates,
+                "applied": self.applied,
+                "batches": self.batches,
+                "errors": self.errors,
+                "queued": self._queue.qsize(),
+                "retrying": len(self._failed_batch or ()),
+                "last_error": self.last_error
+            }
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        delay = RETRY_BASE
+        while not (self._stopping.is_set() and self._queue.empty() and self._failed_batch is None):
+            batch = self._failed_batch or self._next_batch()
+            if batch:
+                _, error = self.flush(batch)
+                if error:
+                    with self._lock:
+                        self._failed_batch = batch
+                    time.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX)
+                    continue
+                with self._lock:
+                    self._failed_batch = None
+                delay = RETRY_BASE
+            if self._last_prune is None or time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                prune_webhook_events(datetime.datetime.utcnow() - datetime.timedelta(hours=WEBHOOK_DEDUPE_HOURS))
+                self._last_prune = time.monotonic()
+
+    def flush(self, batch):
+        """Apply one batch of (event_key, page_id, change) events, returning (applied, error)"""
+        for _ in range(FLUSH_ATTEMPTS):
+            applied, error = apply_feed_events(batch, coalesce_events)
+            if not error:
+                break
+
+        with self._lock:
+            self.batches += 1
+            if error:
+                # Counts failed writes; the batch itself is retried by the writer thread
+                self.errors += 1
+                self.last_error = error
+            else:
+                self.applied += applied
+                self.duplicates += len(batch) - applied
+        return applied, error
@@ -0,0 +1,192 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import requests
+from utils.db import init_db
+from utils.webhooks import FeedBatcher, parse_feed_events, verify_signature, sign_payload
+from config import (
+    FACEBOOK_APP_SECRET, WEBHOOK_VERIFY_TOKEN, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_BODY
+)
+
+logger = logging.getLogger("webhooks")
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Page Webhooks endpoint: subscription handshake on GET, signed deliveries on POST"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs stall keep-alive clients
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        # Both the handshake and the batcher stats (which carry raw database errors) need the verify token
+        authorized = bool(WEBHOOK_VERIFY_TOKEN) and params.get("hub.verify_token") == WEBHOOK_VERIFY_TOKEN
+        if authorized and params.get("hub.mode") == "subscribe":
+            self._reply(200, params.get("hub.challenge", "").encode("utf-8"))
+        elif authorized and url.path == "/stats":
+            self._reply(200, json.dumps(self.server.batcher.stats()).encode("utf-8"))
+        else:
+            self._reply(403)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > WEBHOOK_MAX_BODY:
+            # The body is left unread, so the connection cannot carry another request
+            self.close_connection = True
+            self._reply(413)
+            return
+        body = self.rfile.read(length)
+
+        if not verify_signature(body, self.headers.get("X-Hub-Signature-256"), FACEBOOK_APP_SECRET):
+            logger.warning("Rejected delivery with a bad signature from %s", self.client_address[0])
+            self._reply(403)
+            return
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self._reply(400)
+            return
+
+        if self.server.recorder:
+            self.server.recorder.write(payload)
+
+        # Acknowledge right away; the batcher writes the changes shortly after
+        self.server.batcher.submit(parse_feed_events(payload))
+        self._reply(200, b"EVENT_RECEIVED")
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.client_address[0], format % args)
+
+
+class PayloadRecorder:
+    """Append verified delivery payloads to a JSON lines file for `replay`"""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, payload):
+        with self._lock:
+            self._file.write(json.dumps(payload, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def serve(host, port, record=None):
+    if not FACEBOOK_APP_SECRET:
+        logger.error("Set facebook.app_secret in the secrets; deliveries cannot be verified without it")
+        return 1
+    if not init_db():
+        logger.error("Database is not ready; run `python -m migrations` first")
+        return 1
+
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.daemon_threads = True
+    server.batcher = FeedBatcher().start()
+    server.recorder = PayloadRecorder(record) if record else None
+
+    logger.info("Listening for Page Webhooks on %s:%s", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.stop()
+        if server.recorder:
+            server.recorder.close()
+        logger.info("Stopped: %s", server.batcher.stats())
+    return 0
+
+
+def replay(path, url, rate=0, repeat=1, concurrency=8):
+    """POST recorded payloads to a receiver, signed like Facebook would, and report throughput"""
+    if not FACEBOOK_APP_SECRET:
+        logger.error("Set facebook.app_secret in the secrets to sign the replayed deliveries")
+        return 1
+
+    with open(path, encoding="utf-8") as f:
+        bodies = [line.strip().encode("utf-8") for line in f if line.strip()]
+    bodies = bodies * repeat
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def send(body):
+        response = session.post(url, data=body, headers={
+            "Content-Type": "application/json",
+            "X-Hub-Signature-256": sign_payload(body, FACEBOOK_APP_SECRET)
+        })
+        return response.status_code
+
+    started = time.perf_counter()
+    statuses = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for i, body in enumerate(bodies):
+            if rate:
+                # Pace submissions to the requested deliveries per second
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(executor.submit(send, body))
+        for future in futures:
+            try:
+                status = future.result()
+            except requests.RequestException as e:
+                status = type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+
+    elapsed = time.perf_counter() - started
+    print(f"Sent {len(bodies)} deliveries in {elapsed:.2f}s ({len(bodies) / elapsed:.0f}/s): {statuses}")
+    return 0 if set(statuses) == {200} else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m webhooks", description="Receive or replay Page Webhooks")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subcommands.add_parser("serve", help="run the receiver")
+    serve_parser.add_argument("--host", default=WEBHOOK_HOST)
+    serve_parser.add_argument("--port", type=int, default=WEBHOOK_PORT)
+    serve_parser.add_argument("--record", metavar="FILE", help="append received payloads to FILE for replay")
+
+    replay_parser = subcommands.add_parser("replay", help="send recorded payloads to a receiver")
+    replay_parser.add_argument("file", help="JSON lines file, one payload per line")
+    replay_parser.add_argument("--url", default=f"http://127.0.0.1:{WEBHOOK_PORT}/")
+    replay_parser.add_argument("--rate", type=float, default=0, help="deliveries per second (default: as fast as possible)")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="send the file this many times")
+    replay_parser.add_argument("--concurrency", type=int, default=8)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    if args.command == "serve":
+        return serve(args.host, args.port, args.record)
+    return replay(args.file, args.url, args.rate, args.repeat, args.concurrency)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import argparse
+import datetime
+import logging
+import os
+import socket
+import sys
+import time
+from utils.db import (
+    init_db, schedule_sync_jobs, lease_sync_jobs, finish_sync_job, get_stored_posts,
+    get_comment_sync_requests, finish_comment_sync_request
+)
+from utils.fb_api import get_account_api
+from utils.sync import sync_page_posts, sync_posts_comments, sync_page_insights
+from config import (
+    WORKER_POLL_INTERVAL, WORKER_SCHEDULE_INTERVAL, WORKER_BATCH_SIZE, WORKER_INTERVALS,
+    WORKER_COMMENT_POSTS, WORKER_INSIGHTS_DAYS, WORKER_RETRY_BASE
+)
+
+logger = logging.getLogger("worker")
+
+# Every insights aggregation the dashboard offers
+INSIGHTS_PERIODS = ("day", "week", "days_28")
+
+
+# Job handlers - each returns (synced, error) like the sync functions it wraps.
+# The queue decides when a job is due, so the syncs are forced past their own freshness check.
+def sync_posts_job(api, account):
+    # "list" is the widest post profile, so every page can be served from what it stores
+    return sync_page_posts(api, account.page_id, force=True, profile="list")
+
+
+def sync_comments_job(api, account):
+    # Posts opened in the UI first, then the newest ones, which are kept current
+    requested = get_comment_sync_requests(account.id)
+    newest = [post.id for post in get_stored_posts(account.page_id, limit=WORKER_COMMENT_POSTS)]
+    results = sync_posts_comments(api, account.page_id, list(dict.fromkeys(requested + newest)), force=True)
+    synced = 0
+    first_error = None
+    for post_id, (count, error) in results.items():
+        synced += count
+        if error:
+            first_error = first_error or error
+        elif post_id in requested:
+            finish_comment_sync_request(account.id, post_id)
+    return synced, first_error
+
+
+def sync_insights_job(api, account):
+    synced = 0
+    for period in INSIGHTS_PERIODS:
+        count, error = sync_page_insights(api, account.page_id, period=period, days=WORKER_INSIGHTS_DAYS, force=True)
+        if error:
+            return synced, error
+        synced += count
+    return synced, None
+
+
+JOB_HANDLERS = {
+    "posts": sync_posts_job,
+    "comments": sync_comments_job,
+    "insights": sync_insights_job
+}
+
+
+def run_job(job):
+    """Run one leased job, returning (synced, error)"""
+    api, account = get_account_api(job["account_id"], job["user_id"])
+    if not api or not account:
+        return 0, "Account not found or access token missing"
+    try:
+        return JOB_HANDLERS[job["kind"]](api, account)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+        return 0, str(e)
+
+
+def next_run_at(job, error):
+    """Regular interval after a success, exponential backoff (capped at the interval) after a failure"""
+    interval = WORKER_INTERVALS[job["kind"]]
+    if error:
+        interval = min(interval, WORKER_RETRY_BASE * 2 ** job["attempts"])
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=interval)
+
+
+def work(worker_id, once=False):
+    """Lease and run due jobs until interrupted, or until the queue is drained with once"""
+    last_schedule = None
+    while True:
+        if last_schedule is None or time.monotonic() - last_schedule >= WORKER_SCHEDULE_INTERVAL:
+            created, error = schedule_sync_jobs()
+            if error:
+                logger.error("Could not schedule jobs: %s", error)
+            elif created:
+                logger.info("Scheduled %d new job(s)", created)
+            last_schedule = time.monotonic()
+
+        jobs = lease_sync_jobs(worker_id, limit=WORKER_BATCH_SIZE)
+        for job in jobs:
+            started = time.perf_counter()
+            synced, error = run_job(job)
+            finish_sync_job(job["id"], worker_id, next_run_at(job, error), error)
+            if error:
+                logger.warning("%s sync of account %s failed: %s", job["kind"], job["account_id"], error)
+            else:
+                logger.info(
+                    "%s sync of account %s: %d item(s) in %.1fs",
+                    job["kind"], job["account_id"], synced, time.perf_counter() - started
+                )
+
+        if not jobs:
+            if once:
+                return
+            time.sleep(WORKER_POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m worker", description="Sync Facebook data in the background")
+    parser.add_argument("--id", default=f"{socket.gethostname()}:{os.getpid()}", help="worker name shown on leased jobs")
+    parser.add_argument("--once", action="store_true", help="exit once no job is due instead of polling")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    if not init_db():
+        logger.error("Database is not ready; run `python -m migrations` first")
+        return 1
+
+    logger.info("Worker %s started", args.id)
+    try:
+        work(args.id, once=args.once)
+    except KeyboardInterrupt:
+        logger.info("Worker %s stopped", args.id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())